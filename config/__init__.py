@@ -9,22 +9,98 @@ __all__ = [
     "US_MARKET_SUMMER_END",
     "US_MARKET_WINTER_START",
     "US_MARKET_WINTER_END",
+    "US_MARKET_LOCAL_OPEN",
+    "US_MARKET_LOCAL_CLOSE",
+    "US_MARKET_LOCAL_HALF_DAY_CLOSE",
+    "TW_TIMEZONE",
+    "US_TIMEZONE",
+    "TW_HOLIDAYS",
+    "US_HOLIDAYS",
+    "US_HALF_DAYS",
     "MARKET_TW",
     "MARKET_US",
     "TWO_SUFFIX",
     "TPE_SUFFIX",
     "NASDAQ_SUFFIX",
-    "FINMIND_API_URL",
+    "STOCK_LIST_PATH",
+    "PRICE_UPDATE_PATH",
+    "PRICE_BATCH_PATH",
     "DATASETS",
     "DATE_FORMAT",
+    "DATETIME_FORMAT",
     "TIME_FORMAT",
     "SCHEDULER_TIMEZONE",
     "UPDATE_INTERVAL",
+    "POLLING_CRON",
+    "POLLING_ADAPTIVE",
+    "TW_BULK_LOOKBACK_DAYS",
+    "UPDATE_STATUS_SUCCESS",
+    "UPDATE_STATUS_FAILED",
+    "UPDATE_STATUS_UNCHANGED",
+    "UPDATE_STATUS_QUOTA_SKIPPED",
+    "UPDATE_STATUS_STALE",
+    "RUN_STATUS_PENDING",
+    "RUN_STATUS_RUNNING",
+    "RUN_STATUS_COMPLETED",
+    "RUN_STATUS_FAILED",
+    "PRIORITY_SCHEDULED",
+    "PRIORITY_MANUAL",
+    "PRIORITY_ADHOC",
+    "PRIORITY_BACKFILL",
+    "QUOTA_RESERVE_RATIOS",
+    "COORDINATION_NONE",
+    "COORDINATION_LEADER",
+    "COORDINATION_SHARD",
     # settings
     "API_BASE_URL",
     "FINMIND_TOKEN",
+    "FINMIND_API_URL",
     "HOST",
     "PORT",
     "LOG_LEVEL",
     "LOG_FORMAT",
+    "LOG_ASYNC",
+    "LOG_STRUCTURED",
+    "LOG_STOCK_SAMPLE_RATE",
+    "FETCH_WORKERS",
+    "WRITE_WORKERS",
+    "TW_BULK_FETCH",
+    "HTTP_POOL_SIZE",
+    "HTTP_CONNECT_TIMEOUT",
+    "HTTP_READ_TIMEOUT",
+    "HTTP_MAX_RETRIES",
+    "HTTP_BACKOFF_FACTOR",
+    "HTTP_BACKOFF_JITTER",
+    "PRICE_BATCH_ENABLED",
+    "PRICE_BATCH_SIZE",
+    "STREAM_BATCH_SIZE",
+    "STREAM_BATCH_DELAY",
+    "PRICE_CACHE_PATH",
+    "WRITE_SKIP_EPSILON",
+    "STOCK_LIST_TTL",
+    "BAR_STORE_PATH",
+    "FINMIND_HOURLY_QUOTA",
+    "CIRCUIT_FAILURE_THRESHOLD",
+    "CIRCUIT_SLOW_CALL_SECONDS",
+    "CIRCUIT_OPEN_SECONDS",
+    "FINMIND_HEDGE_ENABLED",
+    "FINMIND_HEDGE_QUANTILE",
+    "FINMIND_HEDGE_MIN_DELAY",
+    "FINMIND_CACHE_TTL",
+    "COORDINATION_MODE",
+    "COORDINATION_DB_PATH",
+    "COORDINATION_LEASE_TTL",
+    "SHARD_COUNT",
+    "SHARD_INDEX",
+    "POLLING_MODE",
+    "POLL_BASE_INTERVAL",
+    "POLL_MIN_INTERVAL",
+    "POLL_MAX_INTERVAL",
+    "POLL_TARGET_MOVE",
+    "POLL_QUOTA_SHARE",
+    "BACKFILL_MANIFEST_PATH",
+    "BACKFILL_WORKERS",
+    "RUN_HISTORY_PATH",
+    "RUN_HISTORY_MAX_RUNS",
+    "RUN_HISTORY_RETENTION_DAYS",
 ]
@@ -5,6 +5,46 @@ US_MARKET_SUMMER_START = "21:30"
 US_MARKET_SUMMER_END = "04:00"
 US_MARKET_WINTER_START = "22:30"
 US_MARKET_WINTER_END = "05:00"
+# 美股交易時段（紐約當地時間）
+US_MARKET_LOCAL_OPEN = "09:30"
+US_MARKET_LOCAL_CLOSE = "16:00"
+US_MARKET_LOCAL_HALF_DAY_CLOSE = "13:00"
+
+# Market Timezones
+TW_TIMEZONE = "Asia/Taipei"
+US_TIMEZONE = "America/New_York"
+
+# Market Holidays（平日休市日，每年需依交易所公告更新；未列出的年份只排除週末）
+TW_HOLIDAYS = (
+    # 2025
+    "2025-01-01", "2025-01-23", "2025-01-24", "2025-01-27", "2025-01-28",
+    "2025-01-29", "2025-01-30", "2025-01-31", "2025-02-28", "2025-04-03",
+    "2025-04-04", "2025-05-01", "2025-05-30", "2025-09-29", "2025-10-06",
+    "2025-10-10", "2025-10-24", "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-02-12", "2026-02-13", "2026-02-16", "2026-02-17",
+    "2026-02-18", "2026-02-19", "2026-02-20", "2026-02-27", "2026-04-03",
+    "2026-04-06", "2026-05-01", "2026-06-19", "2026-09-25", "2026-09-28",
+    "2026-10-09", "2026-10-26", "2026-12-25",
+)  # fmt: skip
+US_HOLIDAYS = (
+    # 2025
+    "2025-01-01", "2025-01-09", "2025-01-20", "2025-02-17", "2025-04-18",
+    "2025-05-26", "2025-06-19", "2025-07-04", "2025-09-01", "2025-11-27",
+    "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25",
+    "2026-06-19", "2026-07-03", "2026-09-07", "2026-11-26", "2026-12-25",
+    # 2027
+    "2027-01-01", "2027-01-18", "2027-02-15", "2027-03-26", "2027-05-31",
+    "2027-06-18", "2027-07-05", "2027-09-06", "2027-11-25", "2027-12-24",
+)  # fmt: skip
+# 美股提前收盤日（13:00 紐約時間收盤）
+US_HALF_DAYS = (
+    "2025-07-03", "2025-11-28", "2025-12-24",
+    "2026-11-27", "2026-12-24",
+    "2027-11-26",
+)  # fmt: skip
 
 # Market Types
 MARKET_TW = "TW"
@@ -16,7 +56,9 @@ TPE_SUFFIX = ":TPE"
 NASDAQ_SUFFIX = ":NASDAQ"
 
 # API Endpoints
-FINMIND_API_URL = "https://api.finmindtrade.com/api/v4/data"
+STOCK_LIST_PATH = "/api/stocks/minimal"
+PRICE_UPDATE_PATH = "/api/stocks/id/{stock_id}/price"
+PRICE_BATCH_PATH = "/api/stocks/prices/batch"
 DATASETS = {
     "US_MINUTE": "USStockPriceMinute",
     "US_DAILY": "USStockPrice",
@@ -26,7 +68,46 @@ DATASETS = {
 # Time Formats
 DATE_FORMAT = "%Y-%m-%d"
 TIME_FORMAT = "%H:%M"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # Scheduler Settings
 SCHEDULER_TIMEZONE = "Asia/Taipei"
 UPDATE_INTERVAL = "*/5"  # 每5分鐘
+
+# Polling Modes
+POLLING_CRON = "cron"  # 每 UPDATE_INTERVAL 更新全部股票
+POLLING_ADAPTIVE = "adaptive"  # 每支股票依波動度與重要性各自排定下次更新時間
+
+# Bulk Fetch Settings
+TW_BULK_LOOKBACK_DAYS = 5  # 全市場查詢最多往前回溯的天數
+
+# Update Status
+UPDATE_STATUS_SUCCESS = "更新成功"
+UPDATE_STATUS_FAILED = "更新失敗"
+UPDATE_STATUS_UNCHANGED = "未變動略過"
+UPDATE_STATUS_QUOTA_SKIPPED = "配額不足略過"
+UPDATE_STATUS_STALE = "沿用快取價格"
+
+# Run Status
+RUN_STATUS_PENDING = "pending"
+RUN_STATUS_RUNNING = "running"
+RUN_STATUS_COMPLETED = "completed"
+RUN_STATUS_FAILED = "failed"
+
+# FinMind Quota Priorities（數字越小越優先）
+PRIORITY_SCHEDULED = 0  # 排程更新
+PRIORITY_MANUAL = 1  # 手動觸發 /trigger
+PRIORITY_ADHOC = 2  # 臨時查詢，例如 /test_minute
+PRIORITY_BACKFILL = 3  # 歷史資料回補
+# 各優先等級不可動用的保留額度比例，保留給更高優先等級使用
+QUOTA_RESERVE_RATIOS = {
+    PRIORITY_SCHEDULED: 0.0,
+    PRIORITY_MANUAL: 0.1,
+    PRIORITY_ADHOC: 0.2,
+    PRIORITY_BACKFILL: 0.3,
+}
+
+# Multi-worker Coordination Modes
+COORDINATION_NONE = "none"  # 每個行程各自執行排程
+COORDINATION_LEADER = "leader"  # 只有持有 lease 的行程執行排程
+COORDINATION_SHARD = "shard"  # 依股票代碼雜湊分片，每個行程只處理自己的分片
@@ -7,6 +7,10 @@ load_dotenv()
 # API Settings
 API_BASE_URL = os.getenv("API_BASE_URL")
 FINMIND_TOKEN = os.getenv("FINMIND_TOKEN")
+# 離線測試時可指向模擬的 FinMind 伺服器
+FINMIND_API_URL = os.getenv(
+    "FINMIND_API_URL", "https://api.finmindtrade.com/api/v4/data"
+)
 
 # Server Settings
 HOST = "0.0.0.0"
@@ -15,3 +19,96 @@ PORT = int(os.getenv("PORT", 8000))
 # Logging Settings
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# 由背景執行緒輸出日誌，呼叫端不會因寫入 stdout 而阻塞
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+# 以 key=value 格式輸出日誌
+LOG_STRUCTURED = os.getenv("LOG_STRUCTURED", "false").lower() == "true"
+# 個股 INFO 日誌的抽樣比例（1 為全部保留）
+LOG_STOCK_SAMPLE_RATE = float(os.getenv("LOG_STOCK_SAMPLE_RATE", 1.0))
+
+# Concurrency Settings
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", 8))
+WRITE_WORKERS = int(os.getenv("WRITE_WORKERS", 4))
+
+# FinMind Fetch Settings
+TW_BULK_FETCH = os.getenv("TW_BULK_FETCH", "true").lower() == "true"
+
+# HTTP Client Settings
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 30))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", 3))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", 0.5))
+HTTP_BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", 0.5))
+
+# Price Write Settings
+PRICE_BATCH_ENABLED = os.getenv("PRICE_BATCH_ENABLED", "true").lower() == "true"
+PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", 100))
+# 串流更新時較小的批次，並在等待超過 STREAM_BATCH_DELAY 秒時先送出已累積的價格
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 10))
+STREAM_BATCH_DELAY = float(os.getenv("STREAM_BATCH_DELAY", 0.5))
+
+# Write Suppression Settings
+PRICE_CACHE_PATH = os.getenv("PRICE_CACHE_PATH")  # 未設定時只保留在記憶體中
+WRITE_SKIP_EPSILON = float(os.getenv("WRITE_SKIP_EPSILON", 1e-6))
+
+# Stock List Cache Settings
+STOCK_LIST_TTL = int(os.getenv("STOCK_LIST_TTL", 3600))  # 秒
+
+# Local Bar Store Settings
+# 設為 ":memory:" 時只在行程內保留資料
+BAR_STORE_PATH = os.getenv("BAR_STORE_PATH", "data/bars.sqlite3")
+
+# FinMind Quota Settings
+FINMIND_HOURLY_QUOTA = int(os.getenv("FINMIND_HOURLY_QUOTA", 600))
+
+# FinMind Circuit Breaker Settings（每個資料集各自計算）
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+# 耗時超過此秒數的請求也視為失敗
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", 10))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", 60))
+
+# FinMind Hedged Request Settings
+# 請求耗時超過近期延遲分位數時，再送出一次備援請求並採用先回應的結果
+FINMIND_HEDGE_ENABLED = os.getenv("FINMIND_HEDGE_ENABLED", "false").lower() == "true"
+FINMIND_HEDGE_QUANTILE = float(os.getenv("FINMIND_HEDGE_QUANTILE", 0.95))
+FINMIND_HEDGE_MIN_DELAY = float(os.getenv("FINMIND_HEDGE_MIN_DELAY", 0.5))  # 秒
+
+# FinMind Response Cache Settings
+# 相同參數的成功回應保留的秒數，設為 0 時只合併同時進行的請求
+FINMIND_CACHE_TTL = float(os.getenv("FINMIND_CACHE_TTL", 10))
+
+# Multi-worker Coordination Settings
+# none / leader / shard，多個 worker 或副本共用同一份股票列表時使用
+COORDINATION_MODE = os.getenv("COORDINATION_MODE", "none").lower()
+# 同一台機器上的 worker 透過這個 SQLite 檔案協調 lease
+COORDINATION_DB_PATH = os.getenv("COORDINATION_DB_PATH", "data/coordination.sqlite3")
+COORDINATION_LEASE_TTL = float(os.getenv("COORDINATION_LEASE_TTL", 30))  # 秒
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 1))
+# 指定時固定處理該分片（例如跨主機的副本），未指定時由 lease 自動分配
+_shard_index = os.getenv("SHARD_INDEX")
+SHARD_INDEX = int(_shard_index) if _shard_index else None
+
+# Adaptive Polling Settings（POLLING_MODE=adaptive 時使用）
+POLLING_MODE = os.getenv("POLLING_MODE", "cron").lower()
+POLL_BASE_INTERVAL = float(os.getenv("POLL_BASE_INTERVAL", 300))  # 秒
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", 60))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", 1800))
+# 兩次查詢之間的價格變動達到此比例時以 POLL_BASE_INTERVAL 更新
+POLL_TARGET_MOVE = float(os.getenv("POLL_TARGET_MOVE", 0.002))
+# 輪詢可使用的 FinMind 每小時額度比例，其餘留給手動觸發與臨時查詢
+POLL_QUOTA_SHARE = float(os.getenv("POLL_QUOTA_SHARE", 0.8))
+
+# Historical Backfill Settings
+# 已完成的 (資料集, 股票, 月份) 區段逐行記錄在此檔案，中斷後從這裡接續
+BACKFILL_MANIFEST_PATH = os.getenv(
+    "BACKFILL_MANIFEST_PATH", "data/backfill_manifest.jsonl"
+)
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", FETCH_WORKERS))
+
+# Run History Settings
+# 每次更新的耗時與各股票結果保存在此 SQLite 檔案，設為空字串時停用
+RUN_HISTORY_PATH = os.getenv("RUN_HISTORY_PATH", "data/run_history.sqlite3")
+# 超過筆數或天數的舊紀錄會被刪除，預設約為每 5 分鐘一次更新的 7 天份
+RUN_HISTORY_MAX_RUNS = int(os.getenv("RUN_HISTORY_MAX_RUNS", 2016))
+RUN_HISTORY_RETENTION_DAYS = float(os.getenv("RUN_HISTORY_RETENTION_DAYS", 7))
@@ -1,6 +1,19 @@
-from .market import MarketTimeChecker
-from .api import StockAPI
-from .scheduler import StockScheduler
-from .updater import StockPriceUpdater
+import importlib
+
+# 延後到第一次存取時才載入，匯入 core 的子模組時不會連帶載入全部元件
+_EXPORTS = {
+    "MarketTimeChecker": ".market",
+    "StockAPI": ".api",
+    "StockScheduler": ".scheduler",
+    "StockPriceUpdater": ".updater",
+}
 
 __all__ = ["MarketTimeChecker", "StockAPI", "StockScheduler", "StockPriceUpdater"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
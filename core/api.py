@@ -1,291 +1,810 @@
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict, Tuple
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import threading
+import time
 import requests
-import pandas as pd
-from FinMind.data import DataLoader
 from datetime import datetime, timedelta
 from config.constants import (
-    FINMIND_API_URL,
+    STOCK_LIST_PATH,
+    PRICE_UPDATE_PATH,
+    PRICE_BATCH_PATH,
     DATASETS,
     DATE_FORMAT,
-    TWO_SUFFIX,
-    TPE_SUFFIX,
+    MARKET_TW,
+    MARKET_US,
+    TW_BULK_LOOKBACK_DAYS,
+)
+from config.settings import (
+    API_BASE_URL,
+    FETCH_WORKERS,
+    FINMIND_API_URL,
+    FINMIND_CACHE_TTL,
+    FINMIND_HEDGE_ENABLED,
+    FINMIND_HEDGE_MIN_DELAY,
+    FINMIND_HEDGE_QUANTILE,
+    FINMIND_TOKEN,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    PRICE_BATCH_ENABLED,
+    PRICE_BATCH_SIZE,
+    WRITE_WORKERS,
+    STOCK_LIST_TTL,
 )
-from config.settings import API_BASE_URL, FINMIND_TOKEN
+from utils.http import create_session
 from utils.logger import get_logger
+from utils.metrics import metrics
+from utils.single_flight import SOURCE_CACHE, SOURCE_LOADED, SingleFlightCache
 from utils.time_utils import get_current_time
 from core.market import MarketTimeChecker
-import pytz
+from core.trading_calendar import trading_calendar
+from core.universe import StockUniverse
+from core.bar_store import Bar, BarStore
+from core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from core.minute_cache import MinuteBarCache, MinuteSeries
+from core.rate_limiter import QuotaExceededError, finmind_rate_limiter
+from zoneinfo import ZoneInfo
 
 
 logger = get_logger(__name__)
 
+# 計算備援請求延遲時保留的近期耗時筆數，以及開始送出備援請求所需的最少筆數
+HEDGE_LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+FINMIND_LATENCY = metrics.histogram(
+    "finmind_request_duration_seconds", "FinMind 請求耗時（秒）", ("dataset",)
+)
+FINMIND_REQUESTS = metrics.counter(
+    "finmind_requests_total", "FinMind 請求次數", ("dataset", "outcome")
+)
+FINMIND_COALESCED = metrics.counter(
+    "finmind_coalesced_requests_total",
+    "未送出而共用其他請求結果的 FinMind 查詢，source 為 cache 或 inflight",
+    ("dataset", "source"),
+)
+FINMIND_HEDGED = metrics.counter(
+    "finmind_hedged_requests_total",
+    "FinMind 請求逾時送出的備援請求，winner 為先回應的一方",
+    ("dataset", "winner"),
+)
+PORTFOLIO_WRITE_LATENCY = metrics.histogram(
+    "portfolio_write_duration_seconds", "價格寫回 API 的請求耗時（秒）", ("mode",)
+)
+PORTFOLIO_WRITES = metrics.counter(
+    "portfolio_writes_total", "價格寫回 API 的請求次數", ("mode", "outcome")
+)
+
+
+def _tw_bar(record: Dict) -> Bar:
+    """將 TaiwanStockPrice 的資料轉為 K 線"""
+    return (
+        record["date"],
+        record.get("open"),
+        record.get("max"),
+        record.get("min"),
+        record["close"],
+        record.get("Trading_Volume"),
+    )
+
 
 class StockAPI:
     def __init__(self):
         self.base_url = API_BASE_URL
         self.finmind_token = FINMIND_TOKEN
+        self.finmind_url = FINMIND_API_URL
         self.market_checker = MarketTimeChecker()
-        self.api = self.initialize_api()  # 修正方法名稱，移除底線
+        # 每個上游主機各自維護一組 keep-alive 連線池；FinMind 每次送達的請求
+        # 都會消耗額度，只重試連線錯誤，429/5xx 交由額度限制器與斷路器處理
+        self.finmind_session = create_session(connect_only=True)
+        self.portfolio_session = create_session()
+        self.timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        # None 表示尚未確認後端是否支援批次價格更新
+        self._price_batch_supported: Optional[bool] = None
         # 添加時區物件
-        self.taipei_tz = pytz.timezone("Asia/Taipei")
-        self.ny_tz = pytz.timezone("America/New_York")
-
-    def initialize_api(self) -> Optional[DataLoader]:
-        """初始化 FinMind API"""
-        if not self.finmind_token:
-            logger.error("找不到 FINMIND_TOKEN 環境變數")
-            return None
+        self.taipei_tz = ZoneInfo("Asia/Taipei")
+        self.ny_tz = ZoneInfo("America/New_York")
+        # 所有 FinMind 請求共用的額度限制器
+        self.rate_limiter = finmind_rate_limiter
+        # 每個資料集各自的斷路器，FinMind 異常時快速失敗
+        self.circuit_breakers = {
+            dataset: CircuitBreaker(dataset) for dataset in DATASETS.values()
+        }
+        # 各資料集近期成功請求的耗時，用來決定何時送出備援請求
+        self._latencies: Dict[str, deque] = {
+            dataset: deque(maxlen=HEDGE_LATENCY_WINDOW) for dataset in DATASETS.values()
+        }
+        self._latency_lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        # 相同參數的 FinMind 請求只送出一次，成功的回應短暫快取；
+        # 額度與斷路判斷依各呼叫端的優先等級進行，等待中的呼叫端不沿用這兩種錯誤
+        self._finmind_responses: SingleFlightCache[Optional[Dict]] = SingleFlightCache(
+            FINMIND_CACHE_TTL, private_errors=(QuotaExceededError, CircuitOpenError)
+        )
+        if FINMIND_HEDGE_ENABLED:
+            self._hedge_pool = ThreadPoolExecutor(
+                max_workers=max(FETCH_WORKERS, 1) * 2,
+                thread_name_prefix="finmind-hedge",
+            )
+        # 本機日線資料庫
+        self.bar_store = BarStore()
+        # 美股分鐘 K 線快取
+        self.minute_cache = MinuteBarCache()
+        # 股票列表快取
+        self._universe: Optional[StockUniverse] = None
+        self._universe_lock = threading.Lock()
+        # 全市場台股收盤價快照 {stock_id: close}
+        self._tw_price_snapshot: Dict[str, float] = {}
+        self._tw_snapshot_lock = threading.Lock()
+
+    def get_stock_list(self, force_refresh: bool = False) -> List[Dict]:
+        """從API獲取股票列表（使用快取）"""
+        universe = self.get_stock_universe(force_refresh=force_refresh)
+        return universe.all_stocks if universe else []
+
+    def get_stock_universe(
+        self, force_refresh: bool = False
+    ) -> Optional[StockUniverse]:
+        """獲取已分類的股票列表
+
+        快取在 STOCK_LIST_TTL 秒內直接使用；過期後以 ETag/Last-Modified
+        發送條件式請求，伺服器回應 304 時沿用快取。
 
-        api = DataLoader()
-        try:
-            api.login_by_token(api_token=self.finmind_token)
-            logger.info("FinMind API Token 登入成功")
-            return api
-        except Exception as e:
-            logger.error(f"FinMind API 登入失敗: {e}")
-            return None
+        Args:
+            force_refresh: 是否忽略快取並重新下載完整列表
 
-    def get_stock_list(self) -> List[Dict]:
-        """從API獲取股票列表"""
-        url = f"{self.base_url}/api/stocks/minimal"
+        Returns:
+            Optional[StockUniverse]: 股票列表，無法取得時為 None
+        """
+        with self._universe_lock:
+            universe = self._universe
+            is_fresh = universe is not None and universe.is_fresh(STOCK_LIST_TTL)
+            if is_fresh and not force_refresh:
+                return universe
+
+            self._universe = self._fetch_stock_universe(
+                None if force_refresh else universe
+            )
+            return self._universe
+
+    def invalidate_stock_list(self) -> None:
+        """清除股票列表快取，下次取用時重新下載"""
+        with self._universe_lock:
+            self._universe = None
+        logger.info("已清除股票列表快取")
+
+    def _fetch_stock_universe(
+        self, cached: Optional[StockUniverse]
+    ) -> Optional[StockUniverse]:
+        """從 API 下載股票列表，失敗時沿用既有快取"""
+        url = f"{self.base_url}{STOCK_LIST_PATH}"
         logger.info(f"開始獲取股票列表，請求網址: {url}")
 
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
         try:
-            response = requests.get(url)
+            response = self.portfolio_session.get(
+                url, headers=headers, timeout=self.timeout
+            )
             logger.info(f"股票列表 API 回應狀態碼: {response.status_code}")
 
+            if response.status_code == 304 and cached is not None:
+                logger.info(f"股票列表未變動，沿用快取共 {len(cached)} 支")
+                cached.touch()
+                return cached
+
             response.raise_for_status()
             stocks = response.json()
 
             logger.info(f"獲取到原始股票資料數量: {len(stocks)}")
 
             # 分類股票
-            tw_stocks = [
-                s for s in stocks if s["name"].endswith((TPE_SUFFIX, TWO_SUFFIX))
-            ]
-            us_stocks = [
-                s for s in stocks if not s["name"].endswith((TPE_SUFFIX, TWO_SUFFIX))
-            ]
+            universe = StockUniverse(
+                stocks,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
 
             # 記錄詳細統計資訊
-            logger.info(f"找到台股共 {len(tw_stocks)} 支")
-            logger.info(f"找到美股共 {len(us_stocks)} 支")
+            logger.info(f"找到台股共 {len(universe.tw_stocks)} 支")
+            logger.info(f"找到美股共 {len(universe.us_stocks)} 支")
 
-            if us_stocks:
-                logger.info(
-                    "美股代碼範例: " + ", ".join(s["name"] for s in us_stocks[:3])
-                )
+            if universe.us_stocks:
+                sample = ", ".join(s["name"] for s in universe.us_stocks[:3])
+                logger.info(f"美股代碼範例: {sample}")
 
-            all_stocks = tw_stocks + us_stocks
-            logger.info(f"返回股票總數: {len(all_stocks)}")
+            logger.info(f"返回股票總數: {len(universe)}")
 
-            return all_stocks
+            return universe
         except requests.exceptions.RequestException as e:
             logger.error(f"獲取股票列表請求失敗: {str(e)}")
             if hasattr(e, "response") and e.response is not None:
                 logger.error(f"API 錯誤回應: {e.response.text}")
-            return []
         except Exception as e:
             logger.error(f"獲取股票列表時發生未預期錯誤: {str(e)}")
             logger.exception("詳細錯誤資訊:")
-            return []
+
+        if cached is not None:
+            logger.warning(f"沿用過期的股票列表快取共 {len(cached)} 支")
+        return cached
 
     def update_stock_price(self, stock_id: str, price: float) -> bool:
         """更新股票價格到 API"""
-        url = f"{self.base_url}/api/stocks/id/{stock_id}/price"
+        url = f"{self.base_url}{PRICE_UPDATE_PATH.format(stock_id=stock_id)}"
         headers = {"Accept": "application/json"}
         params = {"newPrice": price}
 
         try:
-            response = requests.put(url, headers=headers, params=params)
+            with PORTFOLIO_WRITE_LATENCY.time(mode="single"):
+                response = self.portfolio_session.put(
+                    url, headers=headers, params=params, timeout=self.timeout
+                )
             response.raise_for_status()
+            PORTFOLIO_WRITES.inc(mode="single", outcome="success")
             return True
         except Exception as e:
             logger.error(f"更新股票價格失敗: {e}")
+            PORTFOLIO_WRITES.inc(mode="single", outcome="error")
             return False
 
-    def get_taiwan_stock_price(self, stock_id: str) -> Optional[float]:
-        """獲取台股價格"""
-        if not self.api:
-            return None
+    @property
+    def price_batch_available(self) -> bool:
+        """是否使用批次價格更新端點（後端不支援時會自動停用）"""
+        return PRICE_BATCH_ENABLED and self._price_batch_supported is not False
 
-        current_time = get_current_time()
-        end_date = current_time.strftime(DATE_FORMAT)
-        start_date = (current_time - timedelta(days=5)).strftime(DATE_FORMAT)
+    def update_stock_prices(self, prices: Dict[str, float]) -> Dict[str, bool]:
+        """批次更新多支股票價格到 API
+
+        依 PRICE_BATCH_SIZE 分段送至批次端點；後端沒有批次端點時，
+        改以平行的單筆 PUT 更新剩餘股票。
+
+        Args:
+            prices: 股票 _id 對應的新價格
+
+        Returns:
+            Dict[str, bool]: 各股票 _id 的更新結果
+        """
+        results: Dict[str, bool] = {}
+        items = list(prices.items())
+
+        if self.price_batch_available:
+            batch_size = max(PRICE_BATCH_SIZE, 1)
+            for offset in range(0, len(items), batch_size):
+                end = offset + batch_size
+                chunk = items[offset:end]
+                batch_success = self._put_price_batch(chunk)
+                if batch_success is None:
+                    break
+                results.update((stock_id, batch_success) for stock_id, _ in chunk)
+
+        remaining = [
+            (stock_id, price) for stock_id, price in items if stock_id not in results
+        ]
+        if remaining:
+            with ThreadPoolExecutor(
+                max_workers=max(min(WRITE_WORKERS, len(remaining)), 1),
+                thread_name_prefix="price-write-single",
+            ) as executor:
+                outcomes = executor.map(
+                    lambda item: self.update_stock_price(*item), remaining
+                )
+                results.update(
+                    (stock_id, success)
+                    for (stock_id, _), success in zip(remaining, outcomes)
+                )
+
+        return results
+
+    def _put_price_batch(self, chunk: List[Tuple[str, float]]) -> Optional[bool]:
+        """送出一批價格更新
+
+        Returns:
+            Optional[bool]: 更新是否成功；後端不支援批次端點時返回 None
+        """
+        url = f"{self.base_url}{PRICE_BATCH_PATH}"
+        headers = {"Accept": "application/json"}
+        payload = {
+            "prices": [
+                {"id": stock_id, "newPrice": float(price)} for stock_id, price in chunk
+            ]
+        }
 
         try:
-            df = self.api.taiwan_stock_daily(
-                stock_id=stock_id, start_date=start_date, end_date=end_date
-            )
-            return df.iloc[-1]["close"] if not df.empty else None
+            with PORTFOLIO_WRITE_LATENCY.time(mode="batch"):
+                response = self.portfolio_session.put(
+                    url, headers=headers, json=payload, timeout=self.timeout
+                )
+            if response.status_code in (404, 405, 501):
+                logger.warning(
+                    f"後端不支援批次價格更新 (狀態碼 {response.status_code})，改用單筆更新"
+                )
+                self._price_batch_supported = False
+                return None
+
+            response.raise_for_status()
+            self._price_batch_supported = True
+            PORTFOLIO_WRITES.inc(mode="batch", outcome="success")
+            logger.info(f"批次更新 {len(chunk)} 支股票價格成功")
+            return True
         except Exception as e:
-            logger.error(f"獲取台股 {stock_id} 價格失敗: {e}")
+            logger.error(f"批次更新股票價格失敗: {e}")
+            PORTFOLIO_WRITES.inc(mode="batch", outcome="error")
+            return False
+
+    def load_taiwan_price_snapshot(self) -> Dict[str, float]:
+        """以單次全市場 TaiwanStockPrice 查詢載入台股最新收盤價
+
+        從今天往前找最近一個有資料的交易日，結果以 stock_id 建立索引，
+        之後 get_taiwan_stock_price 會優先從快照取價。
+
+        Returns:
+            Dict[str, float]: 股票代碼對應收盤價，失敗時為空字典
+        """
+        snapshot: Dict[str, float] = {}
+        snapshot_date = None
+
+        if self.finmind_token:
+            current_time = get_current_time()
+            for offset in range(TW_BULK_LOOKBACK_DAYS + 1):
+                day = current_time - timedelta(days=offset)
+                if not trading_calendar.is_trading_day(MARKET_TW, day.date()):
+                    continue
+
+                trade_date = day.strftime(DATE_FORMAT)
+                try:
+                    records = self._load_tw_daily("", trade_date, trade_date)
+                except Exception as e:
+                    logger.error(f"獲取台股全市場價格失敗: {e}")
+                    break
+                if records is None:
+                    logger.error("獲取台股全市場價格失敗")
+                    break
+
+                if not records:
+                    logger.info(f"{trade_date} 沒有台股全市場資料，往前一日查詢")
+                    continue
+
+                snapshot = {str(r["stock_id"]): r["close"] for r in records}
+                snapshot_date = trade_date
+                self.bar_store.upsert_many(
+                    DATASETS["TW_DAILY"],
+                    ((str(r["stock_id"]),) + _tw_bar(r) for r in records),
+                )
+                break
+
+        with self._tw_snapshot_lock:
+            self._tw_price_snapshot = snapshot
+
+        if snapshot:
+            logger.info(f"已載入 {snapshot_date} 台股全市場價格，共 {len(snapshot)} 支")
+        return snapshot
+
+    def get_taiwan_stock_price(self, stock_id: str) -> Optional[float]:
+        """獲取台股價格，優先使用全市場快照，缺漏時才逐檔查詢"""
+        with self._tw_snapshot_lock:
+            snapshot_price = self._tw_price_snapshot.get(stock_id)
+        if snapshot_price is not None:
+            return snapshot_price
+
+        if not self.finmind_token:
             return None
 
+        # 日線在收盤後才會產生，查詢到最近一個已收盤的交易日即可
+        end_date = trading_calendar.last_closed_trade_date(MARKET_TW).strftime(
+            DATE_FORMAT
+        )
+        return self._get_daily_close(
+            DATASETS["TW_DAILY"], stock_id, end_date, self._fetch_tw_daily_bars
+        )
+
     def get_us_stock_price(self, stock_id: str) -> Optional[float]:
         """獲取美股最新價格"""
         clean_stock_id = stock_id.split(":")[0]
-        logger.info(f"正在獲取美股 {clean_stock_id} 的價格...")
+        log_fields = {"stock": clean_stock_id}
+        logger.info("正在獲取美股 %s 的價格...", clean_stock_id, extra=log_fields)
 
         current_time = get_current_time()
-        logger.info(f"當前時間: {current_time}")
+        logger.info("當前時間: %s", current_time, extra=log_fields)
 
         trade_date = self._get_us_trade_date(current_time)
         is_trading_hours = self.market_checker.is_us_market_hours()
 
-        if is_trading_hours:
-            logger.info("當前為美股交易時段，使用分鐘數據...")
-            dataset = DATASETS["US_MINUTE"]
-            start_date = trade_date
-            end_date = trade_date
-        else:
-            logger.info("當前為美股非交易時段，使用日線數據...")
-            dataset = DATASETS["US_DAILY"]
-            end_date = trade_date
-            start_date = (
-                datetime.strptime(trade_date, DATE_FORMAT) - timedelta(days=5)
-            ).strftime(DATE_FORMAT)
+        if not is_trading_hours:
+            logger.info("當前為美股非交易時段，使用日線數據...", extra=log_fields)
+            return self._get_daily_close(
+                DATASETS["US_DAILY"],
+                clean_stock_id,
+                trade_date,
+                self._fetch_us_daily_bars,
+            )
 
-        parameter = {
-            "dataset": dataset,
-            "data_id": clean_stock_id,
-            "start_date": start_date,
-            "end_date": end_date,
-            "token": self.finmind_token,
-        }
+        logger.info("當前為美股交易時段，使用分鐘數據...", extra=log_fields)
+        series = self._refresh_minute_bars(clean_stock_id, trade_date)
+        if series is None:
+            return None
 
+        latest = series.latest()
+        if latest is None:
+            logger.warning("未找到 %s 的價格數據", clean_stock_id, extra=log_fields)
+            return None
+
+        latest_date, latest_price = latest
+        logger.info(
+            "獲取到的數據範圍: %s 到 %s",
+            series.first_date(),
+            latest_date,
+            extra=log_fields,
+        )
         logger.info(
-            f"API 請求參數: dataset={dataset}, data_id={clean_stock_id}, "
-            f"start_date={start_date}, end_date={end_date}"
+            "獲取到 %s 在 %s 的收盤價: %s",
+            clean_stock_id,
+            latest_date,
+            latest_price,
+            extra=log_fields,
         )
+        return latest_price
 
-        try:
-            response = requests.get(FINMIND_API_URL, params=parameter)
-            logger.info(f"API 請求網址: {response.url}")
-            logger.info(f"API 回應狀態碼: {response.status_code}")
+    def _refresh_minute_bars(
+        self, stock_id: str, trade_date: str
+    ) -> Optional[MinuteSeries]:
+        """查詢美股分鐘數據並併入分鐘 K 線快取
 
-            response.raise_for_status()
-            data = response.json()
+        FinMind 的分鐘資料只能以日期查詢，每次仍會取得當日全部資料，
+        但只有比快取中最後一根更新的 K 線會被解析並附加。
 
-            if "data" not in data:
-                logger.error(f"API 回應中沒有 data 欄位: {data}")
-                return None
+        Returns:
+            Optional[MinuteSeries]: 合併後的分鐘 K 線，查詢失敗時為 None
+        """
+        data = self._request_finmind(
+            DATASETS["US_MINUTE"], stock_id, trade_date, trade_date
+        )
+        if data is None:
+            return None
 
-            df = pd.DataFrame(data["data"])
-            if df.empty:
-                logger.warning(
-                    f"未找到 {clean_stock_id} 的價格數據，API 回應內容: {data}"
-                )
-                return None
+        if data.get("msg", "success") != "success":
+            logger.error(f"API 回應異常: {data}")
+            return None
 
-            df["date"] = pd.to_datetime(df["date"])
-            df = df.sort_values("date", ascending=False)
-            logger.info(f"獲取到的數據範圍: {df['date'].min()} 到 {df['date'].max()}")
+        try:
+            return self.minute_cache.merge(stock_id, trade_date, data["data"])
+        except Exception as e:
+            logger.error(f"解析 {stock_id} 分鐘數據失敗: {str(e)}")
+            logger.exception("詳細錯誤資訊:")
+            return None
 
-            price_column = "close" if is_trading_hours else "Close"
-            latest_price = df.iloc[0][price_column]
-            latest_date = df.iloc[0]["date"]
+    def _get_daily_close(
+        self,
+        dataset: str,
+        stock_id: str,
+        end_date: str,
+        fetch_bars: Callable[[str, str, str], Optional[List[Bar]]],
+    ) -> Optional[float]:
+        """從本機日線資料庫取得最新收盤價
 
+        只向 FinMind 查詢資料庫中最後一根 K 線之後的日期，
+        資料庫沒有資料時才查詢最近 5 天。
+
+        Args:
+            dataset: 資料集名稱
+            stock_id: 股票代碼
+            end_date: 查詢的最後日期 (YYYY-MM-DD)
+            fetch_bars: 向 FinMind 查詢 K 線的函式 (stock_id, start_date, end_date)
+
+        Returns:
+            Optional[float]: 最新收盤價，查詢失敗時為 None
+        """
+        last_date = self.bar_store.last_date(dataset, stock_id)
+        if last_date:
+            start = datetime.strptime(last_date, DATE_FORMAT) + timedelta(days=1)
+        else:
+            start = datetime.strptime(end_date, DATE_FORMAT) - timedelta(days=5)
+        start_date = start.strftime(DATE_FORMAT)
+
+        if start_date <= end_date:
+            bars = fetch_bars(stock_id, start_date, end_date)
+            if bars is None:
+                return None
+            self.bar_store.upsert(dataset, stock_id, bars)
+        else:
             logger.info(
-                f"獲取到 {clean_stock_id} 在 {latest_date} 的收盤價: {latest_price}"
+                "%s %s 已有 %s 的資料，略過查詢",
+                dataset,
+                stock_id,
+                last_date,
+                extra={"stock": stock_id, "dataset": dataset},
             )
-            return latest_price
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API 請求失敗: {str(e)}")
-            if hasattr(e.response, "text"):
-                logger.error(f"API 錯誤回應: {e.response.text}")
+        latest = self.bar_store.latest_bar(dataset, stock_id)
+        if latest is None:
+            logger.warning(
+                "未找到 %s 的 %s 價格數據",
+                stock_id,
+                dataset,
+                extra={"stock": stock_id, "dataset": dataset},
+            )
             return None
+
+        latest_date, latest_price = latest[0], latest[4]
+        logger.info(
+            "獲取到 %s 在 %s 的收盤價: %s",
+            stock_id,
+            latest_date,
+            latest_price,
+            extra={"stock": stock_id, "dataset": dataset},
+        )
+        return latest_price
+
+    def fetch_daily_bars(
+        self, market: str, stock_id: str, start_date: str, end_date: str
+    ) -> Optional[List[Bar]]:
+        """查詢日期區間內的日線，不經過本機日線資料庫（供歷史資料回補使用）
+
+        Raises:
+            QuotaExceededError: FinMind 額度不足，未送出請求
+        """
+        if market == MARKET_TW:
+            return self._fetch_tw_daily_bars(stock_id, start_date, end_date)
+        return self._fetch_us_daily_bars(stock_id, start_date, end_date)
+
+    def _fetch_tw_daily_bars(
+        self, stock_id: str, start_date: str, end_date: str
+    ) -> Optional[List[Bar]]:
+        """查詢台股日線"""
+        try:
+            records = self._load_tw_daily(stock_id, start_date, end_date)
+        except (QuotaExceededError, CircuitOpenError):
+            raise
         except Exception as e:
-            logger.error(f"獲取美股價格失敗: {str(e)}")
-            logger.exception("詳細錯誤資訊:")
+            logger.error(f"獲取台股 {stock_id} 價格失敗: {e}")
             return None
 
-    def get_us_stock_minute_price(self, stock_id: str) -> Optional[dict]:
-        """獲取美股分鐘數據，正確處理美股交易日期"""
-        clean_stock_id = stock_id.split(":")[0]
-        logger.info(f"開始獲取 {clean_stock_id} 的分鐘數據...")
+        if records is None:
+            return None
+        return [_tw_bar(record) for record in records]
+
+    def _load_tw_daily(
+        self, stock_id: str, start_date: str, end_date: str
+    ) -> Optional[List[Dict]]:
+        """查詢 TaiwanStockPrice，stock_id 為空字串時查詢全市場"""
+        data = self._request_finmind(
+            DATASETS["TW_DAILY"], stock_id, start_date, end_date
+        )
+        return None if data is None else data["data"]
+
+    def _fetch_us_daily_bars(
+        self, stock_id: str, start_date: str, end_date: str
+    ) -> Optional[List[Bar]]:
+        """查詢美股日線"""
+        data = self._request_finmind(
+            DATASETS["US_DAILY"], stock_id, start_date, end_date
+        )
+        if data is None:
+            return None
+
+        return [
+            (
+                record["date"],
+                record.get("Open"),
+                record.get("High"),
+                record.get("Low"),
+                record["Close"],
+                record.get("Volume"),
+            )
+            for record in data["data"]
+        ]
 
-        # 獲取當前台北時間
-        taipei_time = get_current_time()
-        logger.info(f"當前台北時間: {taipei_time}")
+    def _request_finmind(
+        self, dataset: str, data_id: str, start_date: str, end_date: str
+    ) -> Optional[Dict]:
+        """向 FinMind API 查詢資料，合併相同參數的並行請求
 
-        # 將台北時間轉換為紐約時間
-        taipei_tz = pytz.timezone("Asia/Taipei")
-        ny_tz = pytz.timezone("America/New_York")
-        taipei_time_aware = taipei_tz.localize(taipei_time.replace(tzinfo=None))
-        ny_time = taipei_time_aware.astimezone(ny_tz)
+        以 (dataset, data_id, start_date, end_date) 為 key：同一時間只送出一個請求，
+        其他呼叫端共用其結果；成功的回應在 FINMIND_CACHE_TTL 秒內直接重複使用，
+        不再消耗額度。回應由呼叫端共用，不可修改。
+        送出請求的呼叫端額度不足或遇到斷路時，等待中的呼叫端以自己的優先等級重新嘗試。
 
-        logger.info(f"對應的紐約時間: {ny_time}")
+        Returns:
+            Optional[Dict]: 含 data 欄位的 API 回應，失敗時為 None
 
-        # 如果紐約時間還在今天的美股盤前（以上午 9:30 為市場開盤時間參考）
-        # 或者如果是紐約時間的周六周日，我們應該使用最近的一個交易日
-        ny_date = ny_time.date()
-        if ny_time.hour < 9 or (ny_time.hour == 9 and ny_time.minute < 30):
-            ny_date = ny_date - timedelta(days=1)
-            logger.info("紐約仍在盤前，使用前一個交易日")
+        Raises:
+            QuotaExceededError: FinMind 額度不足，未送出請求
+            CircuitOpenError: 該資料集斷路中，未送出請求
+        """
+        data, source = self._finmind_responses.get(
+            (dataset, data_id, start_date, end_date),
+            lambda: self._send_finmind_request(dataset, data_id, start_date, end_date),
+        )
+        if source != SOURCE_LOADED:
+            FINMIND_COALESCED.inc(dataset=dataset, source=source)
+            logger.debug(
+                "%s %s %s~%s 共用%s的回應",
+                dataset,
+                data_id,
+                start_date,
+                end_date,
+                "快取" if source == SOURCE_CACHE else "進行中請求",
+                extra={"dataset": dataset},
+            )
+        return data
 
-        # 處理周末情況
-        while ny_date.weekday() in [5, 6]:  # 5 是周六，6 是周日
-            ny_date = ny_date - timedelta(days=1)
-            logger.info("紐約時間為周末，往前調整至最近的工作日")
+    def _send_finmind_request(
+        self, dataset: str, data_id: str, start_date: str, end_date: str
+    ) -> Optional[Dict]:
+        """實際送出 FinMind API 請求
 
-        trade_date = ny_date.strftime(DATE_FORMAT)
-        logger.info(f"使用美股交易日期: {trade_date}")
+        每次請求都會先向共用的額度限制器取得額度，
+        額度不足時拋出 QuotaExceededError 而不送出請求。
+        請求結果會回報給該資料集的斷路器，斷路期間拋出 CircuitOpenError。
 
+        Returns:
+            Optional[Dict]: 含 data 欄位的 API 回應，失敗時為 None
+
+        Raises:
+            QuotaExceededError: FinMind 額度不足，未送出請求
+            CircuitOpenError: 該資料集斷路中，未送出請求
+        """
         parameter = {
-            "dataset": DATASETS["US_MINUTE"],
-            "data_id": clean_stock_id,
-            "start_date": trade_date,
-            "end_date": trade_date,
+            "dataset": dataset,
+            "data_id": data_id,
+            "start_date": start_date,
+            "end_date": end_date,
             "token": self.finmind_token,
         }
 
+        log_fields = {"dataset": dataset}
+        if data_id:
+            log_fields["stock"] = data_id
+        logger.info(
+            "API 請求參數: dataset=%s, data_id=%s, start_date=%s, end_date=%s",
+            dataset,
+            data_id,
+            start_date,
+            end_date,
+            extra=log_fields,
+        )
+        breaker = self.circuit_breakers[dataset]
+        breaker.allow()
         try:
-            logger.info(
-                f"發送請求參數: dataset={DATASETS['US_MINUTE']}, "
-                f"data_id={clean_stock_id}, start_date={trade_date}, "
-                f"end_date={trade_date}"
-            )
+            self.rate_limiter.acquire(f"{dataset} {data_id}")
+        except QuotaExceededError:
+            breaker.release()
+            raise
 
-            response = requests.get(FINMIND_API_URL, params=parameter)
-            logger.info(f"API 請求 URL: {response.url}")
-            logger.info(f"回應狀態碼: {response.status_code}")
+        started = time.perf_counter()
+        try:
+            with FINMIND_LATENCY.time(dataset=dataset):
+                response = self._get_finmind(dataset, parameter, log_fields)
+            elapsed = time.perf_counter() - started
+            # 網址含有 token，只在 DEBUG 等級輸出
+            logger.debug("API 請求網址: %s", response.url, extra=log_fields)
+            logger.info("API 回應狀態碼: %s", response.status_code, extra=log_fields)
 
             response.raise_for_status()
             data = response.json()
 
-            if data.get("msg") != "success":
-                logger.error(f"API 回應異常: {data}")
-                return None
-
-            if not data.get("data"):
-                logger.warning(f"API 回應成功但無數據: {data}")
+            if "data" not in data:
+                logger.error(f"API 回應中沒有 data 欄位: {data}")
+                FINMIND_REQUESTS.inc(dataset=dataset, outcome="error")
+                breaker.record(False)
                 return None
 
-            # 記錄獲取到的數據時間範圍
-            df = pd.DataFrame(data["data"])
-            if not df.empty:
-                df["date"] = pd.to_datetime(df["date"])
-                time_range = f"從 {df['date'].min()} 到 {df['date'].max()}"
-                logger.info(
-                    f"成功獲取數據，時間範圍: {time_range}，資料筆數: {len(df)}"
-                )
-            else:
-                logger.warning("獲取到的數據為空")
-
+            FINMIND_REQUESTS.inc(dataset=dataset, outcome="success")
+            breaker.record(True, elapsed)
+            with self._latency_lock:
+                self._latencies[dataset].append(elapsed)
             return data
 
         except requests.exceptions.RequestException as e:
+            FINMIND_REQUESTS.inc(dataset=dataset, outcome="error")
+            breaker.record(False, time.perf_counter() - started)
             logger.error(f"API 請求失敗: {str(e)}")
-            if hasattr(e, "response") and e.response is not None:
+            if hasattr(e.response, "text"):
                 logger.error(f"API 錯誤回應: {e.response.text}")
             return None
         except Exception as e:
-            logger.error(f"處理數據時發生錯誤: {str(e)}")
-            logger.exception("詳細錯誤信息:")
+            FINMIND_REQUESTS.inc(dataset=dataset, outcome="error")
+            breaker.record(False)
+            logger.error(f"解析 API 回應失敗: {str(e)}")
+            logger.exception("詳細錯誤資訊:")
+            return None
+
+    def _hedge_delay(self, dataset: str) -> Optional[float]:
+        """送出備援請求前等待的秒數，未啟用或樣本不足時為 None"""
+        if self._hedge_pool is None:
+            return None
+        with self._latency_lock:
+            samples = sorted(self._latencies[dataset])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        index = min(int(len(samples) * FINMIND_HEDGE_QUANTILE), len(samples) - 1)
+        return max(samples[index], FINMIND_HEDGE_MIN_DELAY)
+
+    def _get_finmind(
+        self, dataset: str, parameter: Dict, log_fields: Dict
+    ) -> requests.Response:
+        """送出 FinMind GET 請求
+
+        啟用 FINMIND_HEDGE_ENABLED 時，請求超過近期耗時分位數仍未回應，
+        且還有額度可用，會再送出一次相同的請求，採用先成功回應的一方。
+        """
+
+        def send() -> requests.Response:
+            return self.finmind_session.get(
+                self.finmind_url, params=parameter, timeout=self.timeout
+            )
+
+        hedge_delay = self._hedge_delay(dataset)
+        if hedge_delay is None:
+            return send()
+
+        primary = self._hedge_pool.submit(send)
+        try:
+            return primary.result(timeout=hedge_delay)
+        except FutureTimeoutError:
+            pass
+
+        # 備援請求同樣消耗額度，額度不足時只等待原請求
+        if not self.rate_limiter.try_acquire():
+            return primary.result()
+        backup = self._hedge_pool.submit(send)
+        logger.info(
+            "%s 請求超過 %.2f 秒未回應，送出備援請求",
+            dataset,
+            hedge_delay,
+            extra=log_fields,
+        )
+
+        pending = {primary, backup}
+        fallback: Optional[requests.Response] = None
+        error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    error = e
+                    continue
+                if response.ok:
+                    winner = "backup" if future is backup else "primary"
+                    FINMIND_HEDGED.inc(dataset=dataset, winner=winner)
+                    return response
+                fallback = fallback or response
+
+        FINMIND_HEDGED.inc(dataset=dataset, winner="none")
+        if fallback is not None:
+            return fallback
+        raise error
+
+    def get_us_stock_minute_price(self, stock_id: str) -> Optional[dict]:
+        """獲取美股分鐘數據，正確處理美股交易日期
+
+        資料經由分鐘 K 線快取回傳，與交易時段的價格查詢共用同一份快取。
+        """
+        clean_stock_id = stock_id.split(":")[0]
+        logger.info(f"開始獲取 {clean_stock_id} 的分鐘數據...")
+
+        trade_date = self._get_us_trade_date()
+        logger.info(f"使用美股交易日期: {trade_date}")
+
+        series = self._refresh_minute_bars(clean_stock_id, trade_date)
+        if series is None:
             return None
 
+        if not len(series):
+            logger.warning(f"{clean_stock_id} 在 {trade_date} 沒有分鐘數據")
+            return None
+
+        time_range = f"從 {series.first_date()} 到 {series.last_date}"
+        logger.info(f"成功獲取數據，時間範圍: {time_range}，資料筆數: {len(series)}")
+        return {"msg": "success", "status": 200, "data": series.to_records()}
+
     def _get_us_trade_date(self, current_time=None) -> str:
         """計算美股交易日期
 
@@ -298,23 +817,8 @@ class StockAPI:
         if current_time is None:
             current_time = get_current_time()
 
-        # 轉換為紐約時間
-        taipei_tz = pytz.timezone("Asia/Taipei")
-        ny_tz = pytz.timezone("America/New_York")
-        taipei_time_aware = taipei_tz.localize(current_time.replace(tzinfo=None))
-        ny_time = taipei_time_aware.astimezone(ny_tz)
-
-        logger.info(f"台北時間: {current_time}, 紐約時間: {ny_time}")
-
-        # 計算交易日期
-        ny_date = ny_time.date()
-        if ny_time.hour < 9 or (ny_time.hour == 9 and ny_time.minute < 30):
-            ny_date = ny_date - timedelta(days=1)
-            logger.info("紐約仍在盤前，使用前一個交易日")
-
-        # 處理周末情況
-        while ny_date.weekday() in [5, 6]:
-            ny_date = ny_date - timedelta(days=1)
-            logger.info("紐約時間為周末，往前調整至最近的工作日")
+        # 紐約尚未開盤、週末或休市日時使用前一個交易日
+        ny_date = trading_calendar.last_trade_date(MARKET_US, current_time)
+        logger.debug("台北時間: %s, 美股交易日期: %s", current_time, ny_date)
 
         return ny_date.strftime(DATE_FORMAT)
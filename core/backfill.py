@@ -0,0 +1,374 @@
+"""歷史日線回補
+
+依目前的股票列表與指定日期區間，將 TaiwanStockPrice / USStockPrice 日線
+切成每支股票每月一個區段，在 FinMind 額度內平行查詢並寫入本機日線資料庫。
+各股票每月已回補的日期範圍與失敗的區段記錄在 manifest，中斷或部分失敗後重新執行
+只會查詢尚未完成的區段；當月只查詢上次回補之後的日期。
+回補在獨立的行程中以自己的額度限制器計算 FinMind 額度，與服務的限制器互不相通，
+執行時需以 FINMIND_HOURLY_QUOTA 指定服務讓出的額度。
+
+使用方式:
+    python -m core.backfill --start 2020-01-01
+    python -m core.backfill --start 2024-01-01 --end 2024-06-30 --market us --symbols AAPL,NVDA
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from config.constants import (
+    DATASETS,
+    DATE_FORMAT,
+    MARKET_TW,
+    MARKET_US,
+    PRIORITY_BACKFILL,
+)
+from config.settings import BACKFILL_MANIFEST_PATH, BACKFILL_WORKERS
+from core.api import StockAPI
+from core.circuit_breaker import CircuitOpenError
+from core.rate_limiter import QuotaExceededError, use_priority
+from core.trading_calendar import trading_calendar
+from utils.logger import get_logger
+from utils.time_utils import get_current_time
+
+logger = get_logger(__name__)
+
+MARKET_DATASETS = {MARKET_TW: DATASETS["TW_DAILY"], MARKET_US: DATASETS["US_DAILY"]}
+
+
+class Chunk(NamedTuple):
+    """單一股票一個月內的回補區段"""
+
+    market: str
+    symbol: str
+    start_date: str
+    end_date: str
+
+    @property
+    def dataset(self) -> str:
+        return MARKET_DATASETS[self.market]
+
+    @property
+    def key(self) -> str:
+        """以資料集、股票與月份為鍵，當月區段每天延長也沿用同一個鍵"""
+        return f"{self.dataset}|{self.symbol}|{self.start_date[:7]}"
+
+
+def _shift_date(value: str, days: int) -> str:
+    return (_parse_date(value) + timedelta(days=days)).strftime(DATE_FORMAT)
+
+
+def month_ranges(start: date, end: date) -> Iterator[Tuple[date, date]]:
+    """將日期區間依月份切開，產生 (區段開始, 區段結束)"""
+    current = start
+    while current <= end:
+        next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        yield current, min(next_month - timedelta(days=1), end)
+        current = next_month
+
+
+class BackfillManifest:
+    """以 JSON Lines 記錄各區段已回補的日期範圍與失敗的區段
+
+    每完成或失敗一個區段附加一行，同一個鍵以最後一行為準，
+    行程被中止時最多只會遺失寫到一半的最後一行。載入時若有被取代的舊行會重寫檔案，
+    每月每支股票只保留一行。失敗的區段不算完成，下次執行時重新查詢。
+    """
+
+    def __init__(self, path: str = BACKFILL_MANIFEST_PATH):
+        self.path = path
+        # 已回補的日期範圍 {key: (開始日, 結束日)}
+        self._done: Dict[str, Tuple[str, str]] = {}
+        # 尚未成功過的失敗區段 {key: 最近一次的錯誤}
+        self._failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        """從檔案載入已完成與失敗的區段"""
+        if not os.path.exists(self.path):
+            return
+
+        lines = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    key = entry["key"]
+                except (ValueError, KeyError):
+                    continue  # 中斷時寫到一半的行
+                lines += 1
+                parts = key.split("|")
+                if len(parts) == 4:
+                    # 舊版以區段起訖日為鍵
+                    key = "|".join(parts[:2] + [parts[2][:7]])
+                    entry.setdefault("start", parts[2])
+                    entry.setdefault("end", parts[3])
+                if entry.get("failed"):
+                    self._failed[key] = entry.get("error", "")
+                elif "start" in entry and "end" in entry:
+                    self._done[key] = (entry["start"], entry["end"])
+                    self._failed.pop(key, None)
+        logger.info(
+            f"已載入回補紀錄 {len(self._done)} 個已完成、"
+            f"{len(self._failed)} 個失敗的區段: {self.path}"
+        )
+        if lines > len(self._done) + len(self._failed):
+            self._compact()
+
+    def _compact(self) -> None:
+        """以目前的狀態重寫檔案，每個鍵只保留一行"""
+        entries = [
+            {"key": key, "start": start, "end": end}
+            for key, (start, end) in self._done.items()
+        ]
+        entries += [
+            {"key": key, "failed": True, "error": error}
+            for key, error in self._failed.items()
+        ]
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+
+    def reset(self) -> None:
+        """清除所有紀錄，重新回補全部區段"""
+        with self._lock:
+            self._done.clear()
+            self._failed.clear()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def remaining(self, chunk: Chunk) -> Optional[Chunk]:
+        """區段中尚未回補的部分，全部已回補時為 None
+
+        已回補的範圍涵蓋區段開頭時，只需從已回補的最後一天之後開始查詢。
+        """
+        with self._lock:
+            covered = self._done.get(chunk.key)
+        if covered is None or covered[0] > chunk.start_date:
+            return chunk
+        if covered[1] >= chunk.end_date:
+            return None
+        resume = _shift_date(covered[1], 1)
+        if resume < chunk.start_date:
+            return chunk
+        return chunk._replace(start_date=resume)
+
+    def is_done(self, chunk: Chunk) -> bool:
+        return self.remaining(chunk) is None
+
+    def has_failed(self, chunk: Chunk) -> bool:
+        """區段之前是否失敗過且尚未成功"""
+        with self._lock:
+            return chunk.key in self._failed
+
+    def mark_done(self, chunk: Chunk, bars: int) -> None:
+        """記錄完成的區段並立即寫入檔案，與相鄰或重疊的已回補範圍合併"""
+        with self._lock:
+            start, end = chunk.start_date, chunk.end_date
+            covered = self._done.get(chunk.key)
+            # 與已回補的範圍重疊或相鄰時合併，否則以本次的範圍取代
+            if covered is not None and covered[0] <= _shift_date(end, 1):
+                if start <= _shift_date(covered[1], 1):
+                    start, end = min(start, covered[0]), max(end, covered[1])
+            self._append({"key": chunk.key, "start": start, "end": end, "bars": bars})
+            self._done[chunk.key] = (start, end)
+            self._failed.pop(chunk.key, None)
+
+    def mark_failed(self, chunk: Chunk, error: str) -> None:
+        """記錄失敗的區段並立即寫入檔案，下次執行時重試"""
+        with self._lock:
+            self._append({"key": chunk.key, "failed": True, "error": error})
+            self._failed[chunk.key] = error
+
+    def _append(self, entry: Dict) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class HistoryBackfill:
+    """平行回補歷史日線
+
+    每個區段在取得 FinMind 額度後才送出請求，額度不足時等待回補後重試；
+    查詢失敗或發生非預期錯誤的區段記為失敗並繼續處理其他區段，下次執行時重新查詢。
+    """
+
+    def __init__(
+        self,
+        api: Optional[StockAPI] = None,
+        manifest: Optional[BackfillManifest] = None,
+        workers: int = BACKFILL_WORKERS,
+    ):
+        self.api = api or StockAPI()
+        self.manifest = manifest or BackfillManifest()
+        self.workers = max(workers, 1)
+        self._stop = threading.Event()
+
+    def plan(
+        self,
+        start: date,
+        end: date,
+        markets: Optional[List[str]] = None,
+        symbols: Optional[Set[str]] = None,
+    ) -> List[Chunk]:
+        """依股票列表與日期區間建立尚未完成的區段"""
+        universe = self.api.get_stock_universe()
+        if universe is None:
+            raise RuntimeError("無法取得股票列表")
+
+        chunks = []
+        skipped = 0
+        retried = 0
+        for market in markets or [MARKET_TW, MARKET_US]:
+            # 只回補到最近一個已收盤的交易日
+            market_end = min(end, trading_calendar.last_closed_trade_date(market))
+            for stock in universe.for_market(market):
+                symbol = stock["name"].split(":")[0]
+                if symbols and symbol not in symbols:
+                    continue
+                for chunk_start, chunk_end in month_ranges(start, market_end):
+                    chunk = Chunk(
+                        market,
+                        symbol,
+                        chunk_start.strftime(DATE_FORMAT),
+                        chunk_end.strftime(DATE_FORMAT),
+                    )
+                    remaining = self.manifest.remaining(chunk)
+                    if remaining is None:
+                        skipped += 1
+                    else:
+                        retried += self.manifest.has_failed(chunk)
+                        chunks.append(remaining)
+
+        logger.info(
+            f"回補區段共 {len(chunks) + skipped} 個，已完成 {skipped} 個，"
+            f"重試上次失敗的 {retried} 個"
+        )
+        return chunks
+
+    def run(self, chunks: List[Chunk]) -> Dict[str, int]:
+        """平行處理區段，返回各結果的數量"""
+        summary = {"done": 0, "failed": 0, "bars": 0}
+        if not chunks:
+            return summary
+
+        started = time.monotonic()
+        self._stop.clear()
+        pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="backfill"
+        )
+        try:
+            futures = {pool.submit(self._process, chunk): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    bars = future.result()
+                except Exception as e:
+                    # 單一區段的非預期錯誤不中止整個回補
+                    logger.exception(f"回補區段 {chunk.key} 發生錯誤: {e}")
+                    self.manifest.mark_failed(chunk, f"{type(e).__name__}: {e}")
+                    bars = None
+                if bars is None:
+                    summary["failed"] += 1
+                else:
+                    summary["done"] += 1
+                    summary["bars"] += bars
+
+                finished = summary["done"] + summary["failed"]
+                if finished % 100 == 0 or finished == len(chunks):
+                    logger.info(
+                        f"回補進度 {finished}/{len(chunks)}，"
+                        f"失敗 {summary['failed']}，"
+                        f"已寫入 {summary['bars']} 根 K 線，"
+                        f"耗時 {time.monotonic() - started:.0f} 秒"
+                    )
+        except KeyboardInterrupt:
+            logger.warning("回補已中斷，下次執行時會從未完成的區段接續")
+            raise
+        finally:
+            self._stop.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+        return summary
+
+    def _process(self, chunk: Chunk) -> Optional[int]:
+        """查詢並寫入單一區段，返回寫入的 K 線數，失敗時為 None"""
+        limiter = self.api.rate_limiter
+        with use_priority(PRIORITY_BACKFILL):
+            while not self._stop.is_set():
+                # 額度不足時等到回補後再送出，不放棄這個區段
+                delay = limiter.wait_time()
+                if delay > 0:
+                    self._stop.wait(delay)
+                    continue
+                try:
+                    bars = self.api.fetch_daily_bars(
+                        chunk.market, chunk.symbol, chunk.start_date, chunk.end_date
+                    )
+                    break
+                except QuotaExceededError:
+                    continue  # 其他執行緒先用掉了額度
+                except CircuitOpenError:
+                    # FinMind 斷路中，記為失敗，下次執行時重試
+                    self.manifest.mark_failed(chunk, "circuit_open")
+                    return None
+            else:
+                return None  # 回補已停止，不記錄
+
+        if bars is None:
+            self.manifest.mark_failed(chunk, "request_failed")
+            return None
+
+        self.api.bar_store.upsert(chunk.dataset, chunk.symbol, bars)
+        self.manifest.mark_done(chunk, len(bars))
+        return len(bars)
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回補歷史日線到本機日線資料庫")
+    parser.add_argument("--start", required=True, type=_parse_date, help="YYYY-MM-DD")
+    parser.add_argument(
+        "--end", type=_parse_date, help="YYYY-MM-DD，預設為最近一個已收盤的交易日"
+    )
+    parser.add_argument(
+        "--market", choices=["tw", "us"], help="只回補指定市場，預設為全部"
+    )
+    parser.add_argument("--symbols", help="只回補指定股票代碼，以逗號分隔")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    parser.add_argument("--manifest", default=BACKFILL_MANIFEST_PATH)
+    parser.add_argument("--reset", action="store_true", help="忽略既有紀錄重新回補")
+    args = parser.parse_args()
+
+    manifest = BackfillManifest(args.manifest)
+    if args.reset:
+        manifest.reset()
+
+    end = args.end or get_current_time().date()
+    markets = [args.market.upper()] if args.market else None
+    symbols = set(args.symbols.split(",")) if args.symbols else None
+
+    backfill = HistoryBackfill(manifest=manifest, workers=args.workers)
+    chunks = backfill.plan(args.start, end, markets, symbols)
+    summary = backfill.run(chunks)
+    logger.info(
+        f"回補完成: 成功 {summary['done']} 個區段，失敗 {summary['failed']} 個，"
+        f"寫入 {summary['bars']} 根 K 線"
+    )
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
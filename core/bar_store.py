@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+from config.settings import BAR_STORE_PATH
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# (date, open, high, low, close, volume)
+Bar = Tuple[str, float, float, float, float, float]
+
+
+def _to_float(value) -> Optional[float]:
+    """轉成 SQLite 可儲存的 float（包含 numpy 數值型別）"""
+    return None if value is None else float(value)
+
+
+class BarStore:
+    """本機日線資料庫，以 (dataset, symbol, date) 為鍵儲存 K 線"""
+
+    def __init__(self, path: str = BAR_STORE_PATH):
+        self.path = path
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bars (
+                    dataset TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL,
+                    high REAL,
+                    low REAL,
+                    close REAL NOT NULL,
+                    volume REAL,
+                    PRIMARY KEY (dataset, symbol, date)
+                ) WITHOUT ROWID
+                """
+            )
+        logger.info(f"日線資料庫已開啟: {path}")
+
+    def last_date(self, dataset: str, symbol: str) -> Optional[str]:
+        """取得已儲存的最後一個日期"""
+        latest = self.latest_bar(dataset, symbol)
+        return latest[0] if latest else None
+
+    def latest_bar(self, dataset: str, symbol: str) -> Optional[Bar]:
+        """取得最新一根 K 線"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT date, open, high, low, close, volume FROM bars "
+                "WHERE dataset = ? AND symbol = ? ORDER BY date DESC LIMIT 1",
+                (dataset, symbol),
+            ).fetchone()
+
+    def get_bars(
+        self, dataset: str, symbol: str, start_date: str, end_date: str
+    ) -> List[Bar]:
+        """取得日期區間內的 K 線（依日期遞增）"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT date, open, high, low, close, volume FROM bars "
+                "WHERE dataset = ? AND symbol = ? AND date BETWEEN ? AND ? "
+                "ORDER BY date",
+                (dataset, symbol, start_date, end_date),
+            ).fetchall()
+
+    def upsert(self, dataset: str, symbol: str, bars: Iterable[Bar]) -> int:
+        """寫入單一股票的 K 線，同日期的資料會被覆蓋"""
+        return self.upsert_many(dataset, ((symbol, *bar) for bar in bars))
+
+    def upsert_many(
+        self,
+        dataset: str,
+        rows: Iterable[Tuple[str, str, float, float, float, float, float]],
+    ) -> int:
+        """寫入多支股票的 K 線
+
+        Args:
+            dataset: 資料集名稱
+            rows: (symbol, date, open, high, low, close, volume)
+
+        Returns:
+            int: 寫入筆數
+        """
+        records = [
+            (dataset, str(symbol), str(date), *(_to_float(v) for v in values))
+            for symbol, date, *values in rows
+        ]
+        if not records:
+            return 0
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bars "
+                "(dataset, symbol, date, open, high, low, close, volume) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                records,
+            )
+        return len(records)
+
+    def close(self) -> None:
+        """關閉資料庫連線"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Optional
+from config.settings import (
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_SLOW_CALL_SECONDS,
+)
+from utils.logger import get_logger
+from utils.metrics import metrics
+
+logger = get_logger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# 指標輸出的狀態數值
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+CIRCUIT_STATE = metrics.gauge(
+    "finmind_circuit_state",
+    "FinMind 各資料集的斷路器狀態（0 正常、1 試探中、2 斷路）",
+    ("dataset",),
+)
+CIRCUIT_REJECTED = metrics.counter(
+    "finmind_circuit_rejected_total", "斷路期間直接拒絕的 FinMind 請求", ("dataset",)
+)
+CIRCUIT_OPENED = metrics.counter(
+    "finmind_circuit_opened_total", "斷路器由正常或試探轉為斷路的次數", ("dataset",)
+)
+
+
+class CircuitOpenError(Exception):
+    """斷路器開啟中，請求未送出"""
+
+
+class CircuitBreaker:
+    """單一資料集的斷路器
+
+    連續 failure_threshold 次失敗（包含耗時超過 slow_call_seconds 的請求）後斷路，
+    斷路期間的請求立即以 CircuitOpenError 失敗；open_seconds 秒後放行一個試探請求，
+    成功則恢復正常，失敗則再次斷路。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        slow_call_seconds: float = CIRCUIT_SLOW_CALL_SECONDS,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+    ):
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(STATE_VALUES[self.state], dataset=name)
+
+    def allow(self) -> None:
+        """檢查是否可以送出請求
+
+        Raises:
+            CircuitOpenError: 斷路中，或試探請求尚未完成
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return
+            if self.state == STATE_OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._reject()
+                self._set_state(STATE_HALF_OPEN)
+            if self._probing:
+                self._reject()
+            self._probing = True
+
+    def release(self) -> None:
+        """allow 之後請求未送出（例如額度不足）時呼叫，讓下一個請求可以試探"""
+        with self._lock:
+            self._probing = False
+
+    def _reject(self) -> None:
+        CIRCUIT_REJECTED.inc(dataset=self.name)
+        raise CircuitOpenError(f"FinMind {self.name} 斷路中，略過請求")
+
+    def record(self, success: bool, elapsed: Optional[float] = None) -> None:
+        """記錄請求結果，耗時超過 slow_call_seconds 的成功請求也視為失敗"""
+        slow = elapsed is not None and elapsed > self.slow_call_seconds
+        with self._lock:
+            self._probing = False
+            if success and not slow:
+                self._failures = 0
+                if self.state != STATE_CLOSED:
+                    self._set_state(STATE_CLOSED)
+                    logger.info(f"FinMind {self.name} 已恢復，關閉斷路器")
+                return
+
+            self._failures += 1
+            if self.state == STATE_HALF_OPEN or (
+                self.state == STATE_CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._set_state(STATE_OPEN)
+                CIRCUIT_OPENED.inc(dataset=self.name)
+                reason = f"耗時 {elapsed:.1f} 秒" if slow else "請求失敗"
+                logger.warning(
+                    f"FinMind {self.name} 連續 {self._failures} 次失敗（最近一次{reason}），"
+                    f"斷路 {self.open_seconds:.0f} 秒"
+                )
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state], dataset=self.name)
@@ -0,0 +1,370 @@
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+from config.constants import COORDINATION_LEADER, COORDINATION_NONE, COORDINATION_SHARD
+from config.settings import (
+    COORDINATION_DB_PATH,
+    COORDINATION_LEASE_TTL,
+    COORDINATION_MODE,
+    SHARD_COUNT,
+    SHARD_INDEX,
+)
+from utils.logger import get_logger
+from utils.metrics import metrics
+
+logger = get_logger(__name__)
+
+LEADER_LEASE = "scheduler-leader"
+SHARD_LEASE_PREFIX = "shard-"
+# shard 模式下每個存活的行程都持有一個成員 lease，用來計算每個行程應負責的分片數
+MEMBER_LEASE_PREFIX = "member-"
+
+COORDINATION_LEADER_GAUGE = metrics.gauge(
+    "coordination_is_leader", "此行程是否持有排程 leader lease（1 為是）"
+)
+COORDINATION_SHARD_GAUGE = metrics.gauge(
+    "coordination_shard_index",
+    "此行程負責的第一個分片編號（-1 表示尚未取得分片）",
+)
+COORDINATION_SHARDS_HELD = metrics.gauge(
+    "coordination_shards_held", "此行程目前負責的分片數"
+)
+COORDINATION_UNOWNED_SHARDS = metrics.gauge(
+    "coordination_unowned_shards",
+    "沒有任何行程持有 lease 的分片數（只在 shard 模式統計）",
+)
+
+# (負責的分片編號, 分片數)
+Shard = Tuple[Tuple[int, ...], int]
+
+
+def shard_of(symbol: str, shard_count: int) -> int:
+    """股票代碼所屬的分片，不同行程與重啟之間結果一致"""
+    return zlib.crc32(symbol.encode("utf-8")) % shard_count
+
+
+def in_shard(symbol: str, shard: Optional[Shard]) -> bool:
+    """股票是否屬於指定的 (分片編號, 分片數)，未指定分片時一律屬於"""
+    if shard is None:
+        return True
+    indexes, count = shard
+    return shard_of(symbol, count) in indexes
+
+
+def _shard_lease(index: int) -> str:
+    return f"{SHARD_LEASE_PREFIX}{index}"
+
+
+def _shard_index(lease: str) -> int:
+    return int(lease.rsplit("-", 1)[1])
+
+
+class LeaseStore:
+    """以 SQLite 儲存的 lease，同一台機器上的多個行程共用同一個檔案
+
+    lease 到期前只有持有者可以續約；持有者停止續約（例如行程結束）後，
+    其他行程在到期後即可取得。
+    """
+
+    def __init__(self, path: str = COORDINATION_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=10, check_same_thread=False, isolation_level=None
+        )
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """取得或續約 lease，成功時有效期限延長為 ttl 秒"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET "
+                "owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (name, owner, now + ttl, now),
+            )
+            return cursor.rowcount == 1
+
+    def release(self, name: str, owner: str) -> None:
+        """釋放自己持有的 lease，其他行程不需等待到期"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner)
+            )
+
+    def holders(self) -> Dict[str, Tuple[str, float]]:
+        """目前所有未到期的 lease: {名稱: (持有者, 到期時間)}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, owner, expires_at FROM leases WHERE expires_at >= ?",
+                (time.time(),),
+            ).fetchall()
+        return {name: (owner, expires_at) for name, owner, expires_at in rows}
+
+    def close(self) -> None:
+        """關閉資料庫連線"""
+        with self._lock:
+            self._conn.close()
+
+
+class Coordinator:
+    """協調多個 worker 或副本之間的排程工作
+
+    - none: 不協調，每個行程都執行全部排程（單一行程部署）
+    - leader: 只有持有 leader lease 的行程執行排程，其他行程待命，
+      leader 停止續約後由其他行程在 lease 到期時接手
+    - shard: 依股票代碼的穩定雜湊分成 SHARD_COUNT 片，每個行程只處理自己的分片；
+      未指定 SHARD_INDEX 時以 lease 自動分配分片。每個行程負責 ceil(分片數 / 存活行程數)
+      片，worker 結束或分片數多於 worker 數時，沒有行程持有的分片由其他行程接手，
+      有新的行程加入時，負責過多分片的行程會釋放多出的分片
+
+    lease 由背景執行緒每 ttl/3 秒續約一次。
+    """
+
+    def __init__(
+        self,
+        mode: str = COORDINATION_MODE,
+        path: str = COORDINATION_DB_PATH,
+        ttl: float = COORDINATION_LEASE_TTL,
+        shard_count: int = SHARD_COUNT,
+        shard_index: Optional[int] = SHARD_INDEX,
+    ):
+        if mode not in (COORDINATION_NONE, COORDINATION_LEADER, COORDINATION_SHARD):
+            raise ValueError(f"不支援的協調模式 {mode}")
+        if mode == COORDINATION_SHARD and shard_count < 1:
+            raise ValueError(f"分片數必須至少為 1，收到 {shard_count}")
+        if shard_index is not None and not 0 <= shard_index < shard_count:
+            raise ValueError(f"分片編號 {shard_index} 超出範圍 0-{shard_count - 1}")
+
+        self.mode = mode
+        self.path = path
+        self.ttl = ttl
+        self.shard_count = shard_count
+        self.fixed_shard_index = shard_index
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._store: Optional[LeaseStore] = None
+        self._started_at = 0.0
+        self._member_lease = f"{MEMBER_LEASE_PREFIX}{self.owner}"
+        # 持有的 lease 與各自的到期時間
+        self._leases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        COORDINATION_LEADER_GAUGE.set_function(lambda: int(self.is_leader()))
+        COORDINATION_SHARD_GAUGE.set_function(
+            lambda: -1 if self.shard() is None else self.shard()[0][0]
+        )
+        COORDINATION_SHARDS_HELD.set_function(
+            lambda: 0 if self.shard() is None else len(self.shard()[0])
+        )
+
+    @property
+    def uses_lease(self) -> bool:
+        if self.mode == COORDINATION_LEADER:
+            return True
+        return self.mode == COORDINATION_SHARD and self.fixed_shard_index is None
+
+    def start(self) -> None:
+        """開始取得並定期續約 lease"""
+        if not self.uses_lease:
+            logger.info(f"協調模式: {self.mode}，分片: {self.shard()}")
+            return
+
+        self._store = LeaseStore(self.path)
+        self._started_at = time.time()
+        self._renew()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._renew_loop, name="coordination-lease", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"協調模式: {self.mode}，行程識別: {self.owner}")
+
+    def stop(self) -> None:
+        """停止續約並釋放持有的 lease"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._store is None:
+            return
+
+        with self._lock:
+            leases, self._leases = list(self._leases), {}
+        for lease in leases:
+            self._store.release(lease, self.owner)
+        if self.mode == COORDINATION_SHARD:
+            self._store.release(self._member_lease, self.owner)
+        if leases:
+            logger.info(f"已釋放 lease {leases}")
+        self._store.close()
+        self._store = None
+
+    def _renew_loop(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                self._renew()
+            except sqlite3.Error as e:
+                logger.error(f"續約 lease 時發生錯誤: {e}")
+
+    def _renew(self) -> None:
+        """續約持有的 lease；shard 模式下再依存活行程數調整負責的分片"""
+        with self._lock:
+            current = list(self._leases)
+        if self.mode == COORDINATION_LEADER:
+            held = self._acquire_all([LEADER_LEASE])
+        else:
+            self._store.acquire(self._member_lease, self.owner, self.ttl)
+            held = self._acquire_all(current)
+            held.update(self._balance_shards(held))
+
+        with self._lock:
+            self._leases = held
+        lost = [name for name in current if name not in held]
+        gained = [name for name in held if name not in current]
+        if lost:
+            logger.warning(f"已失去 lease {lost}，由其他行程接手")
+        if gained:
+            logger.info(f"已取得 lease {gained}")
+
+    def _acquire_all(self, names: List[str]) -> Dict[str, float]:
+        """取得或續約多個 lease，返回成功者與到期時間"""
+        held = {}
+        for name in names:
+            started = time.time()
+            if self._store.acquire(name, self.owner, self.ttl):
+                held[name] = started + self.ttl
+        return held
+
+    def _balance_shards(self, held: Dict[str, float]) -> Dict[str, float]:
+        """依存活行程數釋放多出的分片，並接手沒有行程持有的分片
+
+        每個行程負責 ceil(分片數 / 存活行程數) 片。還有行程沒有分片時，
+        負責過多的行程釋放多出的分片讓它接手；所有行程都已有分片時，
+        沒有行程持有的分片（例如 worker 結束）由目前的行程接手，不會無人更新。
+
+        Returns:
+            Dict[str, float]: 本次新取得的分片 lease
+        """
+        holders = self._store.holders()
+        members = sum(name.startswith(MEMBER_LEASE_PREFIX) for name in holders) or 1
+        fair_share = math.ceil(self.shard_count / members)
+        shard_owners = {
+            owner
+            for name, (owner, _) in holders.items()
+            if name.startswith(SHARD_LEASE_PREFIX) and owner != self.owner
+        }
+        idle_members = members - len(shard_owners) - (1 if held else 0)
+
+        mine = sorted(held, key=_shard_index)
+        if idle_members > 0 and len(mine) > fair_share:
+            for name in mine[fair_share:]:
+                self._store.release(name, self.owner)
+                del held[name]
+                logger.info(f"有行程尚未負責分片，釋放 {name}")
+
+        gained: Dict[str, float] = {}
+        for index in range(self.shard_count):
+            name = _shard_lease(index)
+            if name in holders or name in held:
+                continue
+            # 有閒置的行程時只補足自己的份額，其餘留給閒置的行程
+            if idle_members > 0 and len(held) + len(gained) >= fair_share:
+                break
+            gained.update(self._acquire_all([name]))
+
+        self._check_unowned_shards(set(holders) | set(held) | set(gained))
+        return gained
+
+    def _check_unowned_shards(self, owned: set) -> None:
+        """統計沒有行程持有的分片
+
+        正常情況下沒有行程持有的分片會在下一次續約時被接手，
+        持續存在（例如 lease 資料庫無法寫入）且啟動超過一個 ttl 時才發出警告。
+        """
+        unowned = [i for i in range(self.shard_count) if _shard_lease(i) not in owned]
+        COORDINATION_UNOWNED_SHARDS.set(len(unowned))
+        if unowned and time.time() - self._started_at > self.ttl:
+            logger.warning(f"分片 {unowned} 沒有行程負責，這些股票不會更新")
+
+    def _held_leases(self) -> List[str]:
+        """目前持有且尚未到期的 lease"""
+        now = time.time()
+        with self._lock:
+            return [name for name, expires in self._leases.items() if now < expires]
+
+    def is_leader(self) -> bool:
+        """此行程是否持有 leader lease"""
+        return LEADER_LEASE in self._held_leases()
+
+    def is_active(self) -> bool:
+        """此行程是否應該執行排程工作，待命中的行程略過排程"""
+        if self.mode == COORDINATION_LEADER:
+            return self.is_leader()
+        return self.shard() is not None
+
+    def shard(self) -> Optional[Shard]:
+        """此行程負責的 (分片編號, 分片數)
+
+        none 與 leader 模式回傳 ((0,), 1)，表示處理全部股票；
+        shard 模式下尚未取得分片時回傳 None。
+        """
+        if self.mode != COORDINATION_SHARD:
+            return (0,), 1
+        if self.fixed_shard_index is not None:
+            return (self.fixed_shard_index,), self.shard_count
+
+        indexes = sorted(
+            _shard_index(name)
+            for name in self._held_leases()
+            if name.startswith(SHARD_LEASE_PREFIX)
+        )
+        if not indexes:
+            return None
+        return tuple(indexes), self.shard_count
+
+    def status(self) -> Dict:
+        """目前的協調狀態"""
+        shard = self.shard()
+        status = {
+            "mode": self.mode,
+            "owner": self.owner,
+            "active": self.is_active(),
+            "shard": (
+                None
+                if shard is None
+                else {"indexes": list(shard[0]), "count": shard[1]}
+            ),
+        }
+        if self._store is not None:
+            status["leases"] = {
+                name: {"owner": owner, "expires_at": expires_at}
+                for name, (owner, expires_at) in self._store.holders().items()
+            }
+        return status
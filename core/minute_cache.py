@@ -0,0 +1,154 @@
+import math
+import threading
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.constants import DATETIME_FORMAT
+from utils.logger import get_logger
+from utils.price_parse import records_after
+
+logger = get_logger(__name__)
+
+# 分鐘 K 線的數值欄位，依序儲存在各自的 array 中
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+def _to_timestamp(value: str) -> int:
+    """將 FinMind 的分鐘時間字串轉為秒數（不做時區轉換）"""
+    # fromisoformat 解析固定格式的時間字串比 strptime 快一個數量級
+    parsed = datetime.fromisoformat(value)
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
+
+
+def _format_timestamp(value: int) -> str:
+    return datetime.fromtimestamp(value, timezone.utc).strftime(DATETIME_FORMAT)
+
+
+def _to_float(value) -> float:
+    return math.nan if value is None else float(value)
+
+
+class MinuteSeries:
+    """單一股票單一交易日的分鐘 K 線，以 array 逐欄儲存"""
+
+    def __init__(self, symbol: str, trade_date: str):
+        self.symbol = symbol
+        self.trade_date = trade_date
+        self.timestamps = array("q")
+        self.columns = {field: array("d") for field in PRICE_FIELDS}
+        # 最後一根 K 線的原始時間字串，與 FinMind 回應直接比較即可判斷新舊
+        self.last_date: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, records: Iterable[Dict]) -> int:
+        """附加比最後一根 K 線更新的資料
+
+        Returns:
+            int: 新增的 K 線數量
+        """
+        new_records = records_after(records, self.last_date)
+        if not new_records:
+            return 0
+
+        for record in new_records:
+            self.timestamps.append(_to_timestamp(record["date"]))
+            for field in PRICE_FIELDS:
+                self.columns[field].append(_to_float(record.get(field)))
+        self.last_date = new_records[-1]["date"]
+        return len(new_records)
+
+    def latest(self) -> Optional[Tuple[str, float]]:
+        """最新一根有收盤價的 K 線的 (時間, 收盤價)，收盤價缺漏的 K 線會略過"""
+        closes = self.columns["close"]
+        for i in range(len(closes) - 1, -1, -1):
+            if math.isnan(closes[i]):
+                continue
+            if i == len(closes) - 1:
+                return self.last_date, closes[i]
+            return _format_timestamp(self.timestamps[i]), closes[i]
+        return None
+
+    def first_date(self) -> Optional[str]:
+        return _format_timestamp(self.timestamps[0]) if self.timestamps else None
+
+    def snapshot(self) -> "MinuteSeries":
+        """複製目前的資料，之後的 append 不會影響複本"""
+        copy = MinuteSeries(self.symbol, self.trade_date)
+        copy.timestamps = self.timestamps[:]
+        copy.columns = {field: values[:] for field, values in self.columns.items()}
+        copy.last_date = self.last_date
+        return copy
+
+    def to_records(self) -> List[Dict]:
+        """轉回 FinMind 回應的 data 格式"""
+        records = []
+        for i, timestamp in enumerate(self.timestamps):
+            record = {"date": _format_timestamp(timestamp), "stock_id": self.symbol}
+            for field in PRICE_FIELDS:
+                value = self.columns[field][i]
+                record[field] = None if math.isnan(value) else value
+            records.append(record)
+        return records
+
+
+class MinuteBarCache:
+    """美股分鐘 K 線快取，以 (股票代碼, 交易日) 為鍵
+
+    每次查詢只附加比快取中最後一根更新的 K 線，
+    寫入較新的交易日時會移除較舊交易日的資料。
+    get 與 merge 回傳在鎖內複製的快照，其他執行緒同時附加資料時讀取端不會看到寫到一半的 K 線。
+    """
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], MinuteSeries] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, trade_date: str) -> Optional[MinuteSeries]:
+        """取得已快取的分鐘 K 線快照"""
+        with self._lock:
+            series = self._series.get((symbol, trade_date))
+            return None if series is None else series.snapshot()
+
+    def merge(self, symbol: str, trade_date: str, records: List[Dict]) -> MinuteSeries:
+        """將 FinMind 回應的資料併入快取
+
+        Args:
+            symbol: 股票代碼
+            trade_date: 交易日 (YYYY-MM-DD)
+            records: FinMind 回應中的 data 欄位
+
+        Returns:
+            MinuteSeries: 合併後的分鐘 K 線快照
+        """
+        key = (symbol, trade_date)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = MinuteSeries(symbol, trade_date)
+                self._series[key] = series
+                self._evict_before(trade_date)
+            appended = series.append(records)
+            snapshot = series.snapshot()
+
+        logger.info(
+            "%s %s 分鐘資料新增 %d 筆，快取共 %d 筆",
+            symbol,
+            trade_date,
+            appended,
+            len(snapshot),
+            extra={"stock": symbol},
+        )
+        return snapshot
+
+    def _evict_before(self, trade_date: str) -> None:
+        stale = [key for key in self._series if key[1] < trade_date]
+        for key in stale:
+            del self._series[key]
+        if stale:
+            logger.info(f"已移除 {len(stale)} 組 {trade_date} 之前的分鐘資料快取")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._series)
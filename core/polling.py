@@ -0,0 +1,379 @@
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from config.constants import (
+    MARKET_TW,
+    MARKET_US,
+    PRIORITY_SCHEDULED,
+    UPDATE_STATUS_QUOTA_SKIPPED,
+    UPDATE_STATUS_STALE,
+)
+from config.settings import (
+    FETCH_WORKERS,
+    POLL_BASE_INTERVAL,
+    POLL_MAX_INTERVAL,
+    POLL_MIN_INTERVAL,
+    POLL_QUOTA_SHARE,
+    POLL_TARGET_MOVE,
+    TW_BULK_FETCH,
+)
+from core.coordination import Coordinator, in_shard
+from core.rate_limiter import use_priority
+from core.trading_calendar import trading_calendar
+from utils.logger import get_logger
+from utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from core.updater import StockPriceUpdater
+
+logger = get_logger(__name__)
+
+POLLS = metrics.counter(
+    "adaptive_polls_total", "自適應輪詢的查詢次數", ("market", "status")
+)
+POLL_INTERVAL = metrics.histogram(
+    "adaptive_poll_interval_seconds",
+    "自適應輪詢排定的更新間隔（秒，含額度延展）",
+    ("market",),
+    buckets=(30, 60, 120, 300, 600, 900, 1800, 3600, 7200),
+)
+POLL_SYMBOLS = metrics.gauge("adaptive_poll_symbols", "自適應輪詢中的股票數")
+POLL_STRETCH = metrics.gauge(
+    "adaptive_poll_quota_stretch", "為符合 FinMind 額度而延長更新間隔的倍數"
+)
+
+# 價格變動的指數移動平均權重
+MOVE_SMOOTHING = 0.3
+# 市場未開盤時多久後再檢查一次（秒）
+CLOSED_RECHECK_SECONDS = 60
+# 多久重新同步一次股票列表（列表本身依 STOCK_LIST_TTL 快取）
+SYNC_INTERVAL_SECONDS = 60
+
+
+class SymbolState:
+    """單一股票的輪詢狀態
+
+    以股票列表項目的 _id 區分，同一股票代碼在列表中出現多次時各自輪詢與寫回；
+    股票代碼只用於查詢價格。
+    """
+
+    __slots__ = (
+        "stock",
+        "key",
+        "symbol",
+        "market",
+        "importance",
+        "cost",
+        "interval",
+        "due",
+        "last_price",
+        "move",
+        "version",
+    )
+
+    def __init__(self, stock: Dict, market: str, importance: float, cost: int):
+        self.stock = stock
+        self.key = stock["_id"]
+        self.symbol = stock["name"].split(":")[0]
+        self.market = market
+        self.importance = importance
+        self.cost = cost  # 每次查詢消耗的 FinMind 請求數
+        self.interval = POLL_BASE_INTERVAL
+        self.due = 0.0
+        self.last_price: Optional[float] = None
+        self.move: Optional[float] = None  # 每次查詢之間價格變動比例的移動平均
+        self.version = 0
+
+
+class AdaptivePoller:
+    """依每支股票各自的到期時間持續輪詢價格
+
+    取代固定每 UPDATE_INTERVAL 更新全部股票的排程：每支股票完成查詢後，
+    依近期價格變動、股票列表的 priority 欄位重新計算下次更新時間，
+    放入以到期時間排序的 heap。變動大或重要的股票更新得較頻繁，
+    長時間沒有變動的股票逐漸放慢到 POLL_MAX_INTERVAL。
+
+    所有股票的預估請求量超過 POLL_QUOTA_SHARE 的 FinMind 額度時，
+    全部間隔依比例延長；到期時間最早（最久未更新）的股票永遠先被查詢。
+    """
+
+    def __init__(
+        self,
+        updater_factory: Callable[[], "StockPriceUpdater"],
+        coordinator: Optional[Coordinator] = None,
+        workers: int = FETCH_WORKERS,
+        base_interval: float = POLL_BASE_INTERVAL,
+        min_interval: float = POLL_MIN_INTERVAL,
+        max_interval: float = POLL_MAX_INTERVAL,
+        target_move: float = POLL_TARGET_MOVE,
+        quota_share: float = POLL_QUOTA_SHARE,
+    ):
+        self.updater_factory = updater_factory
+        self.coordinator = coordinator
+        self.workers = max(workers, 1)
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_move = target_move
+        self.quota_share = quota_share
+
+        self._states: Dict[str, SymbolState] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._sequence = itertools.count()
+        # 以基準間隔估計的每秒請求量（未延展）
+        self._demand = 0.0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._tw_snapshot_due = 0.0
+        # 更新器在第一次同步時才建立
+        self._updater: Optional["StockPriceUpdater"] = None
+
+        POLL_SYMBOLS.set_function(lambda: len(self._states))
+        POLL_STRETCH.set_function(self.stretch)
+
+    def start(self) -> None:
+        """在背景執行緒開始輪詢"""
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="adaptive-poll"
+        )
+        self._thread = threading.Thread(
+            target=self._run, name="adaptive-poller", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"自適應輪詢已啟動，間隔 {self.min_interval:.0f}-{self.max_interval:.0f} 秒"
+        )
+
+    def stop(self) -> None:
+        """停止輪詢，等待進行中的查詢完成"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        logger.info("自適應輪詢已停止")
+
+    def stretch(self) -> float:
+        """目前的間隔延展倍數，預估請求量在額度內時為 1"""
+        if self._updater is None:
+            return 1.0
+        budget = self._updater.api.rate_limiter.refill_rate * self.quota_share
+        with self._lock:
+            demand = self._demand
+        if budget <= 0:
+            return float("inf") if demand else 1.0
+        return max(demand / budget, 1.0)
+
+    def _run(self) -> None:
+        next_sync = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if self.coordinator is not None and not self.coordinator.is_active():
+                # 其他行程負責排程，或尚未取得分片
+                self._stop.wait(CLOSED_RECHECK_SECONDS)
+                continue
+
+            try:
+                if now >= next_sync:
+                    self._sync()
+                    next_sync = now + SYNC_INTERVAL_SECONDS
+                self._dispatch_due(now)
+            except Exception as e:
+                logger.error(f"自適應輪詢發生錯誤: {e}")
+
+            self._wakeup.wait(max(min(self._next_due(), next_sync) - now, 0.05))
+            self._wakeup.clear()
+
+    def _sync(self) -> None:
+        """依最新的股票列表新增或移除輪詢中的股票"""
+        if self._updater is None:
+            self._updater = self.updater_factory()
+        updater = self._updater
+        updater.price_cache.save()
+
+        universe = updater.api.get_stock_universe()
+        if universe is None:
+            return
+
+        shard = self.coordinator.shard() if self.coordinator is not None else None
+        # 以 _id 為鍵，同一股票代碼出現多次時各自保留
+        stocks = {}
+        for market in (MARKET_TW, MARKET_US):
+            for stock in universe.for_market(market):
+                if in_shard(stock["name"].split(":")[0], shard):
+                    stocks[stock["_id"]] = (stock, market)
+
+        now = time.monotonic()
+        with self._lock:
+            removed = [k for k in self._states if k not in stocks]
+            for key in removed:
+                state = self._states.pop(key)
+                self._demand -= state.cost / state.interval
+
+            added = [k for k in stocks if k not in self._states]
+            # 新加入的股票在最短間隔內分散送出，避免同時湧入
+            spacing = self.min_interval / max(len(added), 1)
+            for offset, key in enumerate(added):
+                stock, market = stocks[key]
+                cost = 0 if market == MARKET_TW and TW_BULK_FETCH else 1
+                state = SymbolState(stock, market, updater._importance(stock), cost)
+                self._states[key] = state
+                self._demand += state.cost / state.interval
+                self._push(state, now + offset * spacing)
+
+            for key, (stock, _) in stocks.items():
+                self._states[key].stock = stock
+
+        if added or removed:
+            logger.info(
+                f"自適應輪詢股票數 {len(stocks)}（新增 {len(added)}，移除 {len(removed)}）"
+            )
+
+    def _push(self, state: SymbolState, due: float) -> None:
+        """排入 heap，舊的項目以 version 判斷失效（呼叫端需持有鎖）"""
+        state.version += 1
+        state.due = due
+        heapq.heappush(
+            self._heap, (due, next(self._sequence), state.key, state.version)
+        )
+
+    def _next_due(self) -> float:
+        with self._lock:
+            return self._heap[0][0] if self._heap else time.monotonic() + 1
+
+    def _dispatch_due(self, now: float) -> None:
+        """送出已到期的股票，同時進行中的查詢不超過 workers"""
+        open_markets = {
+            market
+            for market in (MARKET_TW, MARKET_US)
+            if trading_calendar.is_open(market)
+        }
+        if MARKET_TW in open_markets and TW_BULK_FETCH and now >= self._tw_snapshot_due:
+            self._refresh_tw_snapshot()
+            self._tw_snapshot_due = now + self.base_interval
+
+        due: List[SymbolState] = []
+        with self._lock:
+            while self._heap and self._in_flight + len(due) < self.workers:
+                due_at, _, key, version = self._heap[0]
+                if due_at > now:
+                    break
+                heapq.heappop(self._heap)
+                state = self._states.get(key)
+                if state is None or state.version != version:
+                    continue
+                if state.market not in open_markets:
+                    self._push(state, now + CLOSED_RECHECK_SECONDS)
+                    continue
+                due.append(state)
+            self._in_flight += len(due)
+
+        for state in due:
+            self._pool.submit(self._poll, state)
+
+    def _refresh_tw_snapshot(self) -> None:
+        """重新載入台股全市場快照，之後的台股查詢直接使用快照"""
+        with use_priority(PRIORITY_SCHEDULED):
+            self._updater.api.load_taiwan_price_snapshot()
+
+    def _poll(self, state: SymbolState) -> None:
+        """查詢並寫回單一股票，完成後排定下次更新時間"""
+        try:
+            result = self._updater.process_single_stock(state.stock)
+        except Exception as e:
+            logger.error(f"輪詢 {state.symbol} 時發生錯誤: {e}")
+            result = None
+
+        if result is None:
+            status = "no_data"
+        elif result.status == UPDATE_STATUS_QUOTA_SKIPPED:
+            status = "quota_skipped"
+        elif result.status == UPDATE_STATUS_STALE:
+            status = "stale"  # FinMind 斷路中，沿用原本的間隔
+        else:
+            status = "ok"
+        POLLS.inc(market=state.market, status=status)
+
+        now = time.monotonic()
+        stretch = self.stretch()
+        with self._lock:
+            self._in_flight -= 1
+            if self._states.get(state.key) is not state:
+                return  # 已從股票列表移除
+
+            old_interval = state.interval
+            if status == "ok":
+                state.interval = self._observe_price(state, result.close_price)
+            elif status == "no_data":
+                # 查無資料或查詢失敗時逐步放慢，避免反覆消耗額度
+                state.interval = min(state.interval * 2, self.max_interval)
+            self._demand += state.cost / state.interval - state.cost / old_interval
+
+            if status == "quota_skipped":
+                # 等待額度回補後再試
+                delay = max(stretch, 1.0) / max(
+                    self._updater.api.rate_limiter.refill_rate, 1e-6
+                )
+            else:
+                # 不消耗額度的股票（例如使用台股全市場快照）不需延展
+                delay = state.interval * (stretch if state.cost else 1.0)
+            self._push(state, now + delay)
+
+        POLL_INTERVAL.observe(delay, market=state.market)
+        self._wakeup.set()
+
+    def _observe_price(self, state: SymbolState, price: Optional[float]) -> float:
+        """記錄最新價格並計算下一次的更新間隔"""
+        if price is None:
+            return state.interval
+
+        price = float(price)
+        if state.last_price:
+            move = abs(price - state.last_price) / abs(state.last_price)
+            if state.move is None:
+                state.move = move
+            else:
+                state.move += MOVE_SMOOTHING * (move - state.move)
+        state.last_price = price
+
+        if state.move is None:
+            activity = 1.0
+        else:
+            activity = state.move / self.target_move
+        # priority 欄位越大更新越頻繁
+        activity *= 1 + max(state.importance, 0.0)
+        interval = self.base_interval / max(activity, 1e-9)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def status(self) -> Dict:
+        """輪詢狀態與各股票的下次更新時間"""
+        now = time.monotonic()
+        with self._lock:
+            symbols = [
+                {
+                    "id": state.key,
+                    "symbol": state.symbol,
+                    "market": state.market,
+                    "interval_seconds": round(state.interval, 1),
+                    "due_in_seconds": round(max(state.due - now, 0.0), 1),
+                    "recent_move": state.move,
+                }
+                for state in self._states.values()
+            ]
+        symbols.sort(key=lambda s: s["due_in_seconds"])
+        return {
+            "symbols": len(symbols),
+            "quota_stretch": self.stretch(),
+            "schedule": symbols,
+        }
@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+from typing import Dict, Optional
+from config.settings import PRICE_CACHE_PATH, WRITE_SKIP_EPSILON
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LastWrittenPriceCache:
+    """記錄最後一次成功寫回 API 的價格，用來略過沒有變動的寫入"""
+
+    def __init__(
+        self,
+        path: Optional[str] = PRICE_CACHE_PATH,
+        epsilon: float = WRITE_SKIP_EPSILON,
+    ):
+        self.path = path
+        self.epsilon = epsilon
+        self._prices: Dict[str, float] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def get(self, stock_id: str) -> Optional[float]:
+        """取得股票最後寫入的價格"""
+        with self._lock:
+            return self._prices.get(stock_id)
+
+    def is_unchanged(self, stock_id: str, price: float) -> bool:
+        """判斷價格與最後寫入的價格相比是否沒有超過 epsilon 的變動"""
+        last_price = self.get(stock_id)
+        return last_price is not None and abs(price - last_price) <= self.epsilon
+
+    def record(self, stock_id: str, price: float) -> None:
+        """記錄成功寫入的價格"""
+        with self._lock:
+            self._prices[stock_id] = float(price)
+            self._dirty = True
+
+    def load(self) -> None:
+        """從檔案載入快取"""
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                prices = json.load(f)
+            with self._lock:
+                self._prices = {k: float(v) for k, v in prices.items()}
+            logger.info(f"已載入 {len(prices)} 筆最後寫入價格快取")
+        except Exception as e:
+            logger.error(f"載入價格快取失敗: {e}")
+
+    def save(self) -> None:
+        """將快取寫入檔案（未設定路徑或沒有變動時略過）"""
+        if not self.path:
+            return
+
+        with self._lock:
+            if not self._dirty:
+                return
+            prices = dict(self._prices)
+            self._dirty = False
+
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(prices, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"儲存價格快取失敗: {e}")
+            with self._lock:
+                self._dirty = True
@@ -0,0 +1,138 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from config.constants import PRIORITY_SCHEDULED, QUOTA_RESERVE_RATIOS
+from config.settings import FINMIND_HOURLY_QUOTA
+from utils.logger import get_logger
+from utils.metrics import metrics
+
+logger = get_logger(__name__)
+
+QUOTA_CONSUMED = metrics.counter(
+    "finmind_quota_consumed_total", "已消耗的 FinMind 請求額度", ("priority",)
+)
+QUOTA_REJECTED = metrics.counter(
+    "finmind_quota_rejected_total", "因額度不足而未送出的 FinMind 請求", ("priority",)
+)
+QUOTA_AVAILABLE = metrics.gauge(
+    "finmind_quota_available", "排程更新目前可使用的 FinMind 請求額度"
+)
+
+# 目前執行緒/協程發出 FinMind 請求時使用的優先等級
+_current_priority: ContextVar[int] = ContextVar(
+    "finmind_priority", default=PRIORITY_SCHEDULED
+)
+
+
+class QuotaExceededError(Exception):
+    """FinMind 額度不足，請求未送出"""
+
+
+@contextmanager
+def use_priority(priority: int) -> Iterator[None]:
+    """在區塊內以指定優先等級消耗 FinMind 額度"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    """取得目前的優先等級"""
+    return _current_priority.get()
+
+
+class TokenBucketRateLimiter:
+    """以每小時額度為容量的 token bucket
+
+    token 依額度平均回補；較低優先等級只能使用超過保留比例的部分，
+    額度吃緊時仍會留給排程更新使用。
+    """
+
+    def __init__(
+        self,
+        hourly_budget: int = FINMIND_HOURLY_QUOTA,
+        reserve_ratios: Optional[Dict[int, float]] = None,
+    ):
+        self.capacity = float(hourly_budget)
+        self.refill_rate = hourly_budget / 3600.0
+        self.reserve_ratios = reserve_ratios or QUOTA_RESERVE_RATIOS
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._consumed = 0
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_rate)
+        self._updated_at = now
+
+    def _reserve(self, priority: int) -> float:
+        return self.capacity * self.reserve_ratios.get(priority, 0.0)
+
+    def try_acquire(self, priority: Optional[int] = None, cost: int = 1) -> bool:
+        """嘗試消耗額度
+
+        Args:
+            priority: 優先等級，未指定時使用 use_priority 設定的等級
+            cost: 消耗的請求數
+
+        Returns:
+            bool: 是否取得額度
+        """
+        if priority is None:
+            priority = current_priority()
+
+        with self._lock:
+            self._refill()
+            if self._tokens - cost < self._reserve(priority):
+                return False
+            self._tokens -= cost
+            self._consumed += cost
+        QUOTA_CONSUMED.inc(cost, priority=priority)
+        return True
+
+    def acquire(self, label: str = "", priority: Optional[int] = None) -> None:
+        """消耗一次請求額度，不足時拋出 QuotaExceededError"""
+        if priority is None:
+            priority = current_priority()
+
+        if not self.try_acquire(priority):
+            QUOTA_REJECTED.inc(priority=priority)
+            logger.warning(f"FinMind 額度不足（優先等級 {priority}），略過 {label}")
+            raise QuotaExceededError(f"FinMind 額度不足，略過 {label}")
+
+    def available(self, priority: int = PRIORITY_SCHEDULED) -> int:
+        """指定優先等級目前可使用的請求數"""
+        with self._lock:
+            self._refill()
+            return max(int(self._tokens - self._reserve(priority)), 0)
+
+    def wait_time(self, priority: Optional[int] = None, cost: int = 1) -> float:
+        """距離指定優先等級可取得額度的秒數，目前即可取得時為 0"""
+        if priority is None:
+            priority = current_priority()
+
+        with self._lock:
+            self._refill()
+            missing = self._reserve(priority) + cost - self._tokens
+        if missing <= 0:
+            return 0.0
+        if self.refill_rate <= 0:
+            return float("inf")
+        return missing / self.refill_rate
+
+    @property
+    def consumed(self) -> int:
+        """啟動以來已消耗的請求數"""
+        with self._lock:
+            return self._consumed
+
+
+# 所有 FinMind 請求共用的額度限制器
+finmind_rate_limiter = TokenBucketRateLimiter()
+QUOTA_AVAILABLE.set_function(finmind_rate_limiter.available)
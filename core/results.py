@@ -0,0 +1,225 @@
+import bisect
+from typing import Dict, Iterable, List, Optional
+from config.constants import (
+    MARKET_TW,
+    MARKET_US,
+    UPDATE_STATUS_FAILED,
+    UPDATE_STATUS_QUOTA_SKIPPED,
+    UPDATE_STATUS_STALE,
+    UPDATE_STATUS_SUCCESS,
+    UPDATE_STATUS_UNCHANGED,
+)
+
+# 價格更新狀態對應的統計與指標標籤，沒有結果（查無資料或查詢錯誤）記為 no_data
+STATUS_LABELS = {
+    UPDATE_STATUS_SUCCESS: "updated",
+    UPDATE_STATUS_FAILED: "failed",
+    UPDATE_STATUS_UNCHANGED: "unchanged",
+    UPDATE_STATUS_QUOTA_SKIPPED: "quota_skipped",
+    UPDATE_STATUS_STALE: "stale",
+}
+STATUS_NO_DATA = "no_data"
+STATUS_UNKNOWN = "unknown"
+
+# 統計的欄位順序
+STATUS_COLUMNS = (
+    "updated",
+    "unchanged",
+    "failed",
+    "quota_skipped",
+    "stale",
+    STATUS_NO_DATA,
+    STATUS_UNKNOWN,
+)
+_STATUS_INDEX = {label: i for i, label in enumerate(STATUS_COLUMNS)}
+
+# FinMind 查詢耗時的統計區間（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 輸出表格的欄位: (標題, 屬性)
+TABLE_COLUMNS = (
+    ("股票代碼", "stock_id"),
+    ("名稱", "name"),
+    ("市場", "market"),
+    ("日期", "date"),
+    ("收盤價", "close_price"),
+    ("價格更新狀態", "status"),
+)
+
+
+class StockResult:
+    """單一股票的更新結果
+
+    API 與串流輸出沿用原本的中文欄位，需要時以 to_dict 轉換。
+    """
+
+    __slots__ = (
+        "stock_id",
+        "name",
+        "market",
+        "date",
+        "close_price",
+        "status",
+        "fetch_seconds",
+    )
+
+    def __init__(
+        self,
+        stock_id: str,
+        name: str,
+        market: str,
+        date: str,
+        close_price: Optional[float],
+        status: str,
+        fetch_seconds: Optional[float] = None,
+    ):
+        self.stock_id = stock_id
+        self.name = name
+        self.market = market
+        self.date = date
+        self.close_price = close_price
+        self.status = status
+        self.fetch_seconds = fetch_seconds
+
+    @property
+    def label(self) -> str:
+        """更新狀態的統計標籤"""
+        return STATUS_LABELS.get(self.status, STATUS_UNKNOWN)
+
+    def to_dict(self) -> Dict:
+        """轉為 API 回應格式"""
+        return {title: getattr(self, attr) for title, attr in TABLE_COLUMNS}
+
+    def __repr__(self) -> str:
+        return (
+            f"StockResult({self.stock_id!r}, {self.market!r}, "
+            f"{self.close_price!r}, {self.status!r})"
+        )
+
+
+class _LatencyStats:
+    """單一市場的查詢耗時統計，記憶體用量固定"""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def quantile(self, q: float) -> float:
+        """以區間上界估計分位數，落在最後一個區間時取最大值"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2),
+            "p95_ms": round(self.quantile(0.95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class RunSummary:
+    """單次更新的彙總統計
+
+    依市場記錄各狀態的股票數與 FinMind 查詢耗時，不保留個別結果，
+    股票數再多記憶體用量也不會增加。
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, List[int]] = {}
+        self._latency: Dict[str, _LatencyStats] = {}
+
+    def add(
+        self,
+        market: str,
+        result: Optional[StockResult],
+        fetch_seconds: Optional[float] = None,
+    ) -> str:
+        """記錄一支股票的結果，返回狀態標籤"""
+        label = result.label if result is not None else STATUS_NO_DATA
+        counts = self._counts.get(market)
+        if counts is None:
+            counts = self._counts[market] = [0] * len(STATUS_COLUMNS)
+        counts[_STATUS_INDEX[label]] += 1
+
+        if result is not None and fetch_seconds is None:
+            fetch_seconds = result.fetch_seconds
+        if fetch_seconds is not None:
+            latency = self._latency.get(market)
+            if latency is None:
+                latency = self._latency[market] = _LatencyStats()
+            latency.observe(fetch_seconds)
+        return label
+
+    @property
+    def total(self) -> int:
+        return sum(sum(counts) for counts in self._counts.values())
+
+    def counts(self, market: Optional[str] = None) -> Dict[str, int]:
+        """各狀態的股票數，未指定市場時合計全部市場"""
+        rows = [self._counts[market]] if market else list(self._counts.values())
+        totals = [sum(column) for column in zip(*rows)] if rows else []
+        return {label: n for label, n in zip(STATUS_COLUMNS, totals) if n}
+
+    def to_dict(self) -> Dict:
+        """轉為 API 回應格式"""
+        markets = [m for m in (MARKET_TW, MARKET_US) if m in self._counts]
+        markets += sorted(m for m in self._counts if m not in markets)
+        return {
+            "total": self.total,
+            "counts": self.counts(),
+            "markets": {
+                market: {
+                    "counts": self.counts(market),
+                    "fetch_latency": (
+                        self._latency.get(market) or _LatencyStats()
+                    ).to_dict(),
+                }
+                for market in markets
+            },
+        }
+
+    def format_line(self) -> str:
+        """單行摘要，例如 TW updated=10 unchanged=3 (p95 120ms) | US ..."""
+        parts = []
+        for market, data in self.to_dict()["markets"].items():
+            counts = " ".join(f"{k}={v}" for k, v in data["counts"].items())
+            latency = data["fetch_latency"]
+            if latency["count"]:
+                counts += f" (p95 {latency['p95_ms']}ms)"
+            parts.append(f"{market} {counts}")
+        return " | ".join(parts) or "無結果"
+
+
+def format_results_table(results: Iterable[StockResult]) -> str:
+    """將結果輸出為純文字表格"""
+    rows = [
+        [
+            f"{value:.2f}" if isinstance(value, float) else str(value)
+            for value in (getattr(result, attr) for _, attr in TABLE_COLUMNS)
+        ]
+        for result in results
+    ]
+    header = [title for title, _ in TABLE_COLUMNS]
+    widths = [max(len(cell) for cell in column) for column in zip(header, *rows)]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths))
+        for row in [header] + rows
+    )
@@ -0,0 +1,337 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from config.constants import RUN_STATUS_RUNNING
+from config.settings import (
+    RUN_HISTORY_MAX_RUNS,
+    RUN_HISTORY_PATH,
+    RUN_HISTORY_RETENTION_DAYS,
+)
+from utils.logger import get_logger
+from utils.time_utils import DEFAULT_TIMEZONE
+
+logger = get_logger(__name__)
+
+# (股票列表項目 _id, 股票代碼, 市場, 狀態標籤, 收盤價, 查詢耗時毫秒)
+Outcome = Tuple[str, str, str, str, Optional[float], Optional[float]]
+
+_RUN_COLUMNS = (
+    "seq, run_id, trigger, market, status, started_at, finished_at, quota, summary, "
+    "error, (SELECT COUNT(*) FROM run_outcomes o WHERE o.run_seq = seq)"
+)
+
+
+def _format_timestamp(value: Optional[float]) -> Optional[str]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, DEFAULT_TIMEZONE).strftime(
+        "%Y-%m-%d %H:%M:%S %Z"
+    )
+
+
+def outcome_to_dict(outcome: Outcome) -> Dict:
+    """將單一股票結果轉為 API 回應格式"""
+    item_id, stock_id, market, status, close, fetch_ms = outcome
+    return {
+        "id": item_id,
+        "stock_id": stock_id,
+        "market": market,
+        "status": status,
+        "close_price": close,
+        "fetch_ms": fetch_ms,
+    }
+
+
+def run_to_dict(
+    run_id: str,
+    trigger: str,
+    market: str,
+    status: str,
+    started_at: Optional[float],
+    finished_at: Optional[float],
+    quota: Optional[int],
+    summary: Optional[Dict],
+    error: Optional[str],
+    processed: int,
+    total: Optional[int],
+    outcomes: Optional[Iterable[Outcome]] = None,
+    counts: Optional[Dict[str, int]] = None,
+) -> Dict:
+    """單次執行的 API 回應格式
+
+    記憶體中的執行紀錄與執行歷史都經由這裡輸出，兩者的欄位相同；
+    outcomes 為 None 時不包含 results，counts 為 None 時取自彙總統計。
+    """
+    if counts is None:
+        counts = summary["counts"] if summary else {}
+    duration = None
+    if started_at is not None:
+        duration = round((finished_at or time.time()) - started_at, 3)
+    data = {
+        "run_id": run_id,
+        "trigger": trigger,
+        "market": market,
+        "status": status,
+        "started_at": _format_timestamp(started_at),
+        "finished_at": _format_timestamp(finished_at),
+        "duration_seconds": duration,
+        "progress": {"processed": processed, "total": total},
+        "counts": counts,
+        "quota_consumed": quota,
+        "summary": summary,
+        "error": error,
+    }
+    if outcomes is not None:
+        data["results"] = [outcome_to_dict(outcome) for outcome in outcomes]
+    return data
+
+
+class RunHistoryStore:
+    """以 SQLite 保存每次更新的耗時與各股票結果
+
+    超過 max_runs 筆或 retention_days 天的舊紀錄在每次更新結束時刪除，
+    持續每 5 分鐘更新也不會無限成長。寫入失敗只記錄錯誤，不影響更新本身。
+    """
+
+    def __init__(
+        self,
+        path: str = RUN_HISTORY_PATH,
+        max_runs: int = RUN_HISTORY_MAX_RUNS,
+        retention_days: float = RUN_HISTORY_RETENTION_DAYS,
+    ):
+        self.path = path
+        self.max_runs = max(max_runs, 1)
+        self.retention_days = retention_days
+        if path != ":memory:":
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT NOT NULL UNIQUE,
+                    trigger TEXT NOT NULL,
+                    market TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    finished_at REAL,
+                    quota INTEGER,
+                    summary TEXT,
+                    error TEXT
+                )
+                """
+            )
+            run_columns = {
+                row[1] for row in self._conn.execute("PRAGMA table_info(runs)")
+            }
+            if "error" not in run_columns:
+                self._conn.execute("ALTER TABLE runs ADD COLUMN error TEXT")
+            columns = {
+                row[1] for row in self._conn.execute("PRAGMA table_info(run_outcomes)")
+            }
+            if columns and "item_id" not in columns:
+                # 舊版以股票代碼為鍵，重複列出的股票會互相覆蓋，捨棄後重建
+                self._conn.execute("DROP TABLE run_outcomes")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS run_outcomes (
+                    run_seq INTEGER NOT NULL,
+                    item_id TEXT NOT NULL,
+                    stock_id TEXT NOT NULL,
+                    market TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    close REAL,
+                    fetch_ms REAL,
+                    PRIMARY KEY (run_seq, item_id)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS run_outcomes_stock "
+                "ON run_outcomes (stock_id, run_seq)"
+            )
+        logger.info(f"執行歷史資料庫已開啟: {path}")
+
+    def start_run(
+        self, run_id: str, trigger: str, market: str, started_at: float
+    ) -> Optional[int]:
+        """新增一筆執行中的紀錄，返回之後寫入結果用的序號，寫入失敗時為 None"""
+        try:
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO runs (run_id, trigger, market, status, started_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (run_id, trigger, market, RUN_STATUS_RUNNING, started_at),
+                )
+                return cursor.lastrowid
+        except sqlite3.Error as e:
+            logger.error(f"寫入執行歷史 {run_id} 失敗: {e}")
+            return None
+
+    def add_outcomes(self, seq: int, outcomes: Sequence[Outcome]) -> None:
+        """寫入一批股票結果，同一支股票在股票列表中出現多次時各自保存一筆"""
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO run_outcomes "
+                    "(run_seq, item_id, stock_id, market, status, close, fetch_ms) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(seq, *outcome) for outcome in outcomes],
+                )
+        except sqlite3.Error as e:
+            logger.error(f"寫入執行歷史的股票結果失敗: {e}")
+
+    def finish_run(
+        self,
+        seq: int,
+        status: str,
+        finished_at: float,
+        quota: int,
+        summary: Dict,
+        error: Optional[str] = None,
+    ) -> None:
+        """記錄執行結束，並刪除超過保留上限的舊紀錄"""
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE runs SET status = ?, finished_at = ?, quota = ?, "
+                    "summary = ?, error = ? WHERE seq = ?",
+                    (status, finished_at, quota, json.dumps(summary), error, seq),
+                )
+            self.prune()
+        except sqlite3.Error as e:
+            logger.error(f"寫入執行歷史失敗: {e}")
+
+    def prune(self) -> int:
+        """刪除超過 max_runs 筆或 retention_days 天的紀錄，返回刪除的執行數"""
+        expired_before = time.time() - self.retention_days * 86400
+        with self._lock, self._conn:
+            by_age = self._conn.execute(
+                "SELECT MAX(seq) FROM runs WHERE started_at < ?", (expired_before,)
+            ).fetchone()[0]
+            by_count = self._conn.execute(
+                "SELECT seq FROM runs ORDER BY seq DESC LIMIT 1 OFFSET ?",
+                (self.max_runs,),
+            ).fetchone()
+            cutoffs = [by_age, by_count[0] if by_count else None]
+            cutoff = max((seq for seq in cutoffs if seq is not None), default=None)
+            if cutoff is None:
+                return 0
+
+            self._conn.execute("DELETE FROM run_outcomes WHERE run_seq <= ?", (cutoff,))
+            return self._conn.execute(
+                "DELETE FROM runs WHERE seq <= ?", (cutoff,)
+            ).rowcount
+
+    def get_run(self, run_id: str, include_results: bool = True) -> Optional[Dict]:
+        """取得單次執行，include_results 時包含所有股票結果"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_RUN_COLUMNS} FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        if not include_results:
+            return self._run_to_dict(row)
+        return self._run_to_dict(row, self._outcomes([row[0]]).get(row[0], []))
+
+    def list_runs(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        market: Optional[str] = None,
+        symbol: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> Dict:
+        """依新到舊分頁列出執行紀錄
+
+        指定 market、symbol 或 status 時只列出有符合股票結果的執行；
+        指定 symbol 或 status 時，每筆執行另外附上符合條件的股票結果。
+        """
+        filters = {"market": market, "stock_id": symbol, "status": status}
+        conditions = [f"o.{column} = ?" for column, v in filters.items() if v]
+        params = [v for v in filters.values() if v]
+        where = ""
+        if conditions:
+            where = (
+                "WHERE EXISTS (SELECT 1 FROM run_outcomes o WHERE o.run_seq = r.seq "
+                f"AND {' AND '.join(conditions)})"
+            )
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM runs r {where}", params
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {_RUN_COLUMNS} FROM runs r {where} "
+                "ORDER BY seq DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+
+        outcomes: Dict[int, List[Outcome]] = {}
+        if rows and (symbol or status):
+            outcomes = self._outcomes([row[0] for row in rows], filters)
+        runs = [
+            self._run_to_dict(
+                row, outcomes.get(row[0], []) if symbol or status else None
+            )
+            for row in rows
+        ]
+        return {"total": total, "limit": limit, "offset": offset, "runs": runs}
+
+    def _outcomes(
+        self, seqs: List[int], filters: Optional[Dict[str, Optional[str]]] = None
+    ) -> Dict[int, List[Outcome]]:
+        """取得多次執行的股票結果: {序號: [結果]}"""
+        filters = {column: v for column, v in (filters or {}).items() if v}
+        conditions = "".join(f" AND {column} = ?" for column in filters)
+        placeholders = ", ".join("?" * len(seqs))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_seq, item_id, stock_id, market, status, close, fetch_ms "
+                f"FROM run_outcomes WHERE run_seq IN ({placeholders}){conditions} "
+                "ORDER BY run_seq, stock_id, item_id",
+                list(seqs) + list(filters.values()),
+            ).fetchall()
+
+        outcomes: Dict[int, List[Outcome]] = {}
+        for seq, *outcome in rows:
+            outcomes.setdefault(seq, []).append(tuple(outcome))
+        return outcomes
+
+    @staticmethod
+    def _run_to_dict(row: Tuple, outcomes: Optional[List[Outcome]] = None) -> Dict:
+        (_, run_id, trigger, market, status, started_at, finished_at, quota) = row[:8]
+        summary, error, processed = row[8:]
+        summary = json.loads(summary) if summary else None
+        return run_to_dict(
+            run_id,
+            trigger,
+            market,
+            status,
+            started_at,
+            finished_at,
+            quota,
+            summary,
+            error,
+            processed,
+            summary.get("total") if summary else None,
+            outcomes,
+        )
+
+    def close(self) -> None:
+        """關閉資料庫連線"""
+        with self._lock:
+            self._conn.close()
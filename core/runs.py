@@ -0,0 +1,185 @@
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from config.constants import (
+    RUN_STATUS_PENDING,
+    RUN_STATUS_RUNNING,
+    RUN_STATUS_COMPLETED,
+    RUN_STATUS_FAILED,
+)
+from core.results import STATUS_COLUMNS, StockResult
+from core.run_history import Outcome, run_to_dict
+from utils.logger import get_logger
+from utils.time_utils import get_current_time
+
+logger = get_logger(__name__)
+
+# 記憶體中保留的已完成執行紀錄數量
+MAX_RUN_RECORDS = 50
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value else None
+
+
+class RunRecord:
+    """單次更新執行的狀態與結果
+
+    以執行歷史相同的格式保存各股票結果，/runs/{run_id} 不論從記憶體或執行歷史
+    讀取都是相同的欄位。
+    """
+
+    def __init__(self, trigger: str, market: Optional[str] = None):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.trigger = trigger
+        self.market = market or "all"
+        self.status = RUN_STATUS_PENDING
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.processed = 0
+        self.total: Optional[int] = None
+        self.outcomes: List[Outcome] = []
+        self.quota: Optional[int] = None
+        self.summary: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (RUN_STATUS_COMPLETED, RUN_STATUS_FAILED)
+
+    def update_progress(self, processed: int, total: int) -> None:
+        """更新處理進度"""
+        with self._lock:
+            self.processed = processed
+            self.total = total
+
+    def add_outcome(self, outcome: Outcome) -> None:
+        """記錄一支股票的結果"""
+        with self._lock:
+            self.outcomes.append(outcome)
+
+    def finish(self, quota: int, summary: Dict) -> None:
+        """記錄消耗的額度與彙總統計"""
+        with self._lock:
+            self.quota = quota
+            self.summary = summary
+
+    def to_dict(self, include_results: bool = True) -> Dict:
+        """轉為 API 回應格式（與執行歷史的格式相同）"""
+        with self._lock:
+            counts = None
+            if self.summary is None:
+                # 執行中：由目前已完成的結果計算各狀態股票數
+                labels = Counter(outcome[3] for outcome in self.outcomes)
+                counts = {
+                    label: labels[label] for label in STATUS_COLUMNS if labels[label]
+                }
+            return run_to_dict(
+                self.run_id,
+                self.trigger,
+                self.market,
+                self.status,
+                _timestamp(self.started_at),
+                _timestamp(self.finished_at),
+                self.quota,
+                self.summary,
+                self.error,
+                self.processed,
+                self.total,
+                list(self.outcomes) if include_results else None,
+                counts,
+            )
+
+
+class RunManager:
+    """在背景執行緒中執行更新，並保留最近的執行紀錄供查詢
+
+    同一時間只會有一次執行，執行中再次提交時會回傳進行中的那一次。
+    """
+
+    def __init__(self, max_records: int = MAX_RUN_RECORDS):
+        self.max_records = max_records
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="run")
+        self._records: "OrderedDict[str, RunRecord]" = OrderedDict()
+        self._active: Optional[RunRecord] = None
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        job_function: Callable[..., Optional[List[StockResult]]],
+        trigger: str,
+        **kwargs,
+    ) -> Tuple[RunRecord, bool]:
+        """提交一次更新
+
+        Args:
+            job_function: 更新函式，需接受 progress_callback、on_outcome、on_finish、
+                run_id 與 trigger 參數
+            trigger: 觸發來源，例如 "manual"
+            **kwargs: 傳給更新函式的參數
+
+        Returns:
+            Tuple[RunRecord, bool]: 執行紀錄，以及是否為新建立的執行
+        """
+        with self._lock:
+            if self._active is not None and not self._active.is_finished:
+                logger.info(f"已有執行中的更新 {self._active.run_id}，直接沿用")
+                return self._active, False
+
+            record = RunRecord(trigger, kwargs.get("market"))
+            self._records[record.run_id] = record
+            while len(self._records) > self.max_records:
+                self._records.popitem(last=False)
+            self._active = record
+            record.future = self._executor.submit(
+                self._execute, record, job_function, kwargs
+            )
+
+        logger.info(f"已提交更新 {record.run_id}（{trigger}）")
+        return record, True
+
+    def active(self) -> Optional[RunRecord]:
+        """取得執行中的更新，沒有時為 None"""
+        with self._lock:
+            if self._active is not None and not self._active.is_finished:
+                return self._active
+            return None
+
+    def get(self, run_id: str) -> Optional[RunRecord]:
+        """取得執行紀錄"""
+        with self._lock:
+            return self._records.get(run_id)
+
+    def _execute(
+        self, record: RunRecord, job_function: Callable, kwargs: Dict
+    ) -> Optional[List[StockResult]]:
+        record.status = RUN_STATUS_RUNNING
+        record.started_at = get_current_time()
+        try:
+            results = job_function(
+                progress_callback=record.update_progress,
+                on_outcome=record.add_outcome,
+                on_finish=record.finish,
+                run_id=record.run_id,
+                trigger=record.trigger,
+                **kwargs,
+            )
+            record.status = RUN_STATUS_COMPLETED
+            return results
+        except Exception as e:
+            logger.error(f"更新 {record.run_id} 執行失敗: {e}")
+            logger.exception("詳細錯誤資訊:")
+            record.error = str(e)
+            record.status = RUN_STATUS_FAILED
+            return None
+        finally:
+            record.finished_at = get_current_time()
+
+    def shutdown(self) -> None:
+        """停止接受新的執行"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,16 +1,140 @@
+import functools
+import threading
+from typing import Dict, Optional, Tuple
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.background import BackgroundScheduler
-from config.constants import SCHEDULER_TIMEZONE, UPDATE_INTERVAL
+from config.constants import (
+    SCHEDULER_TIMEZONE,
+    UPDATE_INTERVAL,
+    MARKET_TW,
+    MARKET_US,
+    US_MARKET_SUMMER_START,
+    US_MARKET_SUMMER_END,
+    US_MARKET_WINTER_START,
+    US_MARKET_WINTER_END,
+)
+from core.coordination import Coordinator
+from core.polling import AdaptivePoller
+from core.trading_calendar import trading_calendar
 from utils.logger import get_logger
+from utils.metrics import metrics
+from utils.time_utils import get_current_time
 
 logger = get_logger(__name__)
 
+SCHEDULER_LAG = metrics.histogram(
+    "scheduler_lag_seconds",
+    "排程預定觸發時間與實際送出執行之間的延遲（秒）",
+    ("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 15, 30, 60, 300),
+)
+SCHEDULER_MISSED = metrics.counter(
+    "scheduler_missed_total", "錯過觸發時間而未執行的排程", ("job",)
+)
+SCHEDULER_SKIPPED = metrics.counter(
+    "scheduler_skipped_total", "被略過或合併的排程觸發", ("market", "reason")
+)
+
 
 class StockScheduler:
-    def __init__(self):
+    def __init__(self, coordinator: Optional[Coordinator] = None):
         self.scheduler = BackgroundScheduler()
+        # 多個 worker 或副本同時運行時，決定本行程是否執行排程與負責的分片
+        self.coordinator = coordinator
+        self.poller: Optional[AdaptivePoller] = None
+        self.scheduler.add_listener(
+            self._observe_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED
+        )
+        # 每個市場同一時間只執行一次更新
+        self._market_locks = {MARKET_TW: threading.Lock(), MARKET_US: threading.Lock()}
+        self._last_ticks: Dict[str, object] = {}
+
+    @staticmethod
+    def _observe_job_event(event) -> None:
+        """記錄排程觸發延遲與錯過的排程"""
+        if event.code == EVENT_JOB_MISSED:
+            SCHEDULER_MISSED.inc(job=event.job_id)
+            logger.warning(
+                f"排程 {event.job_id} 錯過觸發時間 {event.scheduled_run_time}"
+            )
+            return
+
+        now = get_current_time()
+        for run_time in event.scheduled_run_times:
+            SCHEDULER_LAG.observe(
+                max((now - run_time).total_seconds(), 0.0), job=event.job_id
+            )
+
+    @staticmethod
+    def _skip_when_closed(market: str, job_function):
+        """包裝排程工作，休市日或非交易時段直接略過，不發出任何 FinMind 請求"""
+
+        @functools.wraps(job_function)
+        def job(*args, **kwargs):
+            if not trading_calendar.is_open(market):
+                logger.info(f"{market} 市場未開盤（休市日或非交易時段），略過本次排程")
+                SCHEDULER_SKIPPED.inc(market=market, reason="closed")
+                return None
+            return job_function(*args, **kwargs)
+
+        return job
+
+    def _coordinate(self, market: str, job_function):
+        """包裝排程工作，待命中的行程略過，分片模式下只處理本行程的分片"""
+
+        @functools.wraps(job_function)
+        def job(*args, **kwargs):
+            if self.coordinator is None:
+                return job_function(*args, **kwargs)
+            if not self.coordinator.is_active():
+                logger.info(f"{market} 市場排程由其他行程執行，本行程待命")
+                SCHEDULER_SKIPPED.inc(market=market, reason="standby")
+                return None
+            return job_function(*args, shard=self.coordinator.shard(), **kwargs)
+
+        return job
+
+    def _coalesce(self, market: str, job_function):
+        """合併同一市場重疊的排程
+
+        同一分鐘內觸發的多個工作（例如 13:30 的收盤排程與整點排程）只執行一次，
+        上一次更新仍在執行時也直接略過本次觸發。
+        """
+
+        @functools.wraps(job_function)
+        def job(*args, **kwargs):
+            lock = self._market_locks[market]
+            if not lock.acquire(blocking=False):
+                logger.info(f"{market} 市場上一次更新仍在執行，合併本次排程")
+                SCHEDULER_SKIPPED.inc(market=market, reason="running")
+                return None
+
+            try:
+                tick = get_current_time().replace(second=0, microsecond=0)
+                if self._last_ticks.get(market) == tick:
+                    logger.info(f"{market} 市場 {tick:%H:%M} 已更新過，合併本次排程")
+                    SCHEDULER_SKIPPED.inc(market=market, reason="duplicate")
+                    return None
+                self._last_ticks[market] = tick
+                return job_function(*args, **kwargs)
+            finally:
+                lock.release()
+
+        return job
+
+    def _market_job(self, market: str, job_function):
+        """建立只處理單一市場的排程工作"""
+        job = functools.partial(job_function, market=market)
+        job = self._skip_when_closed(market, self._coordinate(market, job))
+        return self._coalesce(market, job)
 
     def setup_tw_market_jobs(self, job_function):
-        """設置台股市場的排程工作"""
+        """設置台股市場的排程工作
+
+        Args:
+            job_function: 更新函式，會以 market=MARKET_TW 呼叫
+        """
+        job_function = self._market_job(MARKET_TW, job_function)
         # 台股交易時段 (9:00-13:35)
         self.scheduler.add_job(
             job_function,
@@ -20,6 +144,8 @@ class StockScheduler:
             minute=UPDATE_INTERVAL,
             timezone=SCHEDULER_TIMEZONE,
             id="tw_market_job",
+            coalesce=True,
+            max_instances=1,
         )
 
         # 台股收盤時段
@@ -31,14 +157,28 @@ class StockScheduler:
             minute="30-35/5",
             timezone=SCHEDULER_TIMEZONE,
             id="tw_market_closing_job",
+            coalesce=True,
+            max_instances=1,
         )
         logger.info("已設置台股市場排程工作")
 
-    def setup_us_market_jobs(self, job_function, market_hours):
-        """設置美股市場的排程工作"""
-        start_time, end_time = market_hours
+    def setup_us_market_jobs(
+        self, job_function, market_hours: Optional[Tuple[str, str]] = None
+    ):
+        """設置美股市場的排程工作
+
+        Args:
+            job_function: 更新函式，會以 market=MARKET_US 呼叫
+            market_hours: 美股交易時間（台北時間），未指定時涵蓋夏令與冬令時段，
+                實際是否開盤由交易日曆判斷，因此日光節約切換時不需要重啟
+        """
+        job_function = self._market_job(MARKET_US, job_function)
+        if market_hours is None:
+            start_time = min(US_MARKET_SUMMER_START, US_MARKET_WINTER_START)
+            end_time = max(US_MARKET_SUMMER_END, US_MARKET_WINTER_END)
+        else:
+            start_time, end_time = market_hours
         start_hour = int(start_time.split(":")[0])
-        start_minute = int(start_time.split(":")[1])
         end_hour = int(end_time.split(":")[0])
 
         # 美股晚間排程
@@ -48,9 +188,11 @@ class StockScheduler:
                 "cron",
                 day_of_week="mon-fri",
                 hour=f"{start_hour}-23",
-                minute=f"{start_minute}/5",
+                minute=UPDATE_INTERVAL,
                 timezone=SCHEDULER_TIMEZONE,
                 id="us_market_evening_job",
+                coalesce=True,
+                max_instances=1,
             )
 
         # 美股凌晨排程
@@ -63,15 +205,34 @@ class StockScheduler:
                 minute=UPDATE_INTERVAL,
                 timezone=SCHEDULER_TIMEZONE,
                 id="us_market_morning_job",
+                coalesce=True,
+                max_instances=1,
             )
         logger.info("已設置美股市場排程工作")
 
+    def setup_adaptive_polling(self, updater_factory):
+        """以自適應輪詢取代固定間隔的市場排程
+
+        Args:
+            updater_factory: 回傳 StockPriceUpdater 的函式，第一次輪詢時才呼叫
+        """
+        self.poller = AdaptivePoller(updater_factory, self.coordinator)
+        logger.info("已設置自適應輪詢")
+
     def start(self):
         """啟動排程器"""
+        if self.coordinator is not None:
+            self.coordinator.start()
         self.scheduler.start()
+        if self.poller is not None:
+            self.poller.start()
         logger.info("排程器已啟動")
 
     def shutdown(self):
-        """關閉排程器"""
+        """關閉排程器，並釋放持有的 lease 讓其他行程立即接手"""
+        if self.poller is not None:
+            self.poller.stop()
         self.scheduler.shutdown()
+        if self.coordinator is not None:
+            self.coordinator.stop()
         logger.info("排程器已關閉")
@@ -0,0 +1,140 @@
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Dict, FrozenSet, Optional, Tuple
+from zoneinfo import ZoneInfo
+from config.constants import (
+    DATE_FORMAT,
+    TIME_FORMAT,
+    MARKET_TW,
+    MARKET_US,
+    TW_MARKET_START,
+    TW_MARKET_END,
+    US_MARKET_LOCAL_OPEN,
+    US_MARKET_LOCAL_CLOSE,
+    US_MARKET_LOCAL_HALF_DAY_CLOSE,
+    TW_TIMEZONE,
+    US_TIMEZONE,
+    TW_HOLIDAYS,
+    US_HOLIDAYS,
+    US_HALF_DAYS,
+)
+from utils.time_utils import get_current_time
+
+Session = Tuple[datetime, datetime]
+
+# 往前尋找交易日時最多回溯的天數
+MAX_LOOKBACK_DAYS = 30
+
+
+def _parse_time(value: str) -> time:
+    return datetime.strptime(value, TIME_FORMAT).time()
+
+
+def _parse_dates(values) -> FrozenSet[date]:
+    return frozenset(datetime.strptime(v, DATE_FORMAT).date() for v in values)
+
+
+class TradingCalendar:
+    """台股與美股的交易日曆
+
+    交易時段以各交易所當地時間定義，每個日期只計算一次開收盤時間並快取，
+    之後查詢是否開盤或最近交易日都只需要查表。
+    """
+
+    def __init__(self):
+        self._timezones = {
+            MARKET_TW: ZoneInfo(TW_TIMEZONE),
+            MARKET_US: ZoneInfo(US_TIMEZONE),
+        }
+        self._hours = {
+            MARKET_TW: (_parse_time(TW_MARKET_START), _parse_time(TW_MARKET_END)),
+            MARKET_US: (
+                _parse_time(US_MARKET_LOCAL_OPEN),
+                _parse_time(US_MARKET_LOCAL_CLOSE),
+            ),
+        }
+        self._holidays = {
+            MARKET_TW: _parse_dates(TW_HOLIDAYS),
+            MARKET_US: _parse_dates(US_HOLIDAYS),
+        }
+        self._half_days = {
+            MARKET_TW: frozenset(),
+            MARKET_US: _parse_dates(US_HALF_DAYS),
+        }
+        self._half_day_close = {MARKET_US: _parse_time(US_MARKET_LOCAL_HALF_DAY_CLOSE)}
+        self._sessions: Dict[Tuple[str, date], Optional[Session]] = {}
+        self._lock = threading.Lock()
+
+    def local_date(self, market: str, at: Optional[datetime] = None) -> date:
+        """取得指定時間在交易所當地的日期"""
+        at = at or get_current_time()
+        return at.astimezone(self._timezones[market]).date()
+
+    def is_trading_day(self, market: str, day: date) -> bool:
+        """是否為交易日（交易所當地日期）"""
+        return self.session(market, day) is not None
+
+    def session(self, market: str, day: date) -> Optional[Session]:
+        """取得交易日的開盤與收盤時間，休市日為 None"""
+        key = (market, day)
+        try:
+            return self._sessions[key]
+        except KeyError:
+            pass
+
+        session = self._build_session(market, day)
+        with self._lock:
+            self._sessions[key] = session
+        return session
+
+    def _build_session(self, market: str, day: date) -> Optional[Session]:
+        if day.weekday() >= 5 or day in self._holidays[market]:
+            return None
+
+        tz = self._timezones[market]
+        open_time, close_time = self._hours[market]
+        if day in self._half_days[market]:
+            close_time = self._half_day_close[market]
+
+        return (
+            datetime.combine(day, open_time, tzinfo=tz),
+            datetime.combine(day, close_time, tzinfo=tz),
+        )
+
+    def is_open(self, market: str, at: Optional[datetime] = None) -> bool:
+        """指定時間是否在交易時段內"""
+        at = at or get_current_time()
+        session = self.session(market, self.local_date(market, at))
+        return session is not None and session[0] <= at <= session[1]
+
+    def last_trade_date(self, market: str, at: Optional[datetime] = None) -> date:
+        """最近一個已開盤的交易日（今日尚未開盤時為前一個交易日）"""
+        at = at or get_current_time()
+        day = self.local_date(market, at)
+        session = self.session(market, day)
+        if session is not None and at >= session[0]:
+            return day
+        return self.previous_trade_date(market, day)
+
+    def last_closed_trade_date(
+        self, market: str, at: Optional[datetime] = None
+    ) -> date:
+        """最近一個已收盤的交易日，用來判斷日線資料應更新到哪一天"""
+        at = at or get_current_time()
+        day = self.local_date(market, at)
+        session = self.session(market, day)
+        if session is not None and at > session[1]:
+            return day
+        return self.previous_trade_date(market, day)
+
+    def previous_trade_date(self, market: str, day: date) -> date:
+        """指定日期之前的最近一個交易日"""
+        for offset in range(1, MAX_LOOKBACK_DAYS + 1):
+            candidate = day - timedelta(days=offset)
+            if self.is_trading_day(market, candidate):
+                return candidate
+        return day - timedelta(days=1)
+
+
+# 全域共用的交易日曆
+trading_calendar = TradingCalendar()
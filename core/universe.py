@@ -0,0 +1,43 @@
+import time
+from typing import Dict, List, Optional
+from config.constants import MARKET_TW, MARKET_US, TPE_SUFFIX, TWO_SUFFIX
+
+
+class StockUniverse:
+    """快取的股票列表，建立時即完成台股/美股分類"""
+
+    def __init__(
+        self,
+        stocks: List[Dict],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        self.tw_stocks = [
+            s for s in stocks if s["name"].endswith((TPE_SUFFIX, TWO_SUFFIX))
+        ]
+        self.us_stocks = [
+            s for s in stocks if not s["name"].endswith((TPE_SUFFIX, TWO_SUFFIX))
+        ]
+        self.all_stocks = self.tw_stocks + self.us_stocks
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.all_stocks)
+
+    def is_fresh(self, ttl: float) -> bool:
+        """是否仍在有效期限內"""
+        return time.monotonic() - self.fetched_at < ttl
+
+    def touch(self) -> None:
+        """伺服器確認列表未變動時，重新計算有效期限"""
+        self.fetched_at = time.monotonic()
+
+    def for_market(self, market: str) -> List[Dict]:
+        """取得指定市場的股票"""
+        if market == MARKET_TW:
+            return self.tw_stocks
+        if market == MARKET_US:
+            return self.us_stocks
+        return self.all_stocks
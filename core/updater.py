@@ -1,164 +1,690 @@
-from typing import List, Dict, Optional
-import pandas as pd
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from core.market import MarketTimeChecker
 from core.api import StockAPI
-from config.constants import TPE_SUFFIX, TWO_SUFFIX
-from utils.logger import get_logger
+from core.circuit_breaker import CircuitOpenError
+from core.coordination import Shard, in_shard
+from core.price_cache import LastWrittenPriceCache
+from core.universe import StockUniverse
+from core.rate_limiter import QuotaExceededError, use_priority
+from core.results import RunSummary, StockResult, format_results_table
+from core.run_history import Outcome, RunHistoryStore
+from config.constants import (
+    TPE_SUFFIX,
+    TWO_SUFFIX,
+    MARKET_TW,
+    MARKET_US,
+    UPDATE_STATUS_SUCCESS,
+    UPDATE_STATUS_FAILED,
+    UPDATE_STATUS_UNCHANGED,
+    UPDATE_STATUS_QUOTA_SKIPPED,
+    UPDATE_STATUS_STALE,
+    PRIORITY_SCHEDULED,
+    PRIORITY_MANUAL,
+)
+from config.settings import (
+    FETCH_WORKERS,
+    WRITE_WORKERS,
+    TW_BULK_FETCH,
+    PRICE_BATCH_SIZE,
+    RUN_HISTORY_PATH,
+    STREAM_BATCH_DELAY,
+    STREAM_BATCH_SIZE,
+)
+from utils.logger import dropped_stock_logs, get_logger
+from utils.metrics import metrics
 
 # 在所有需要使用時間的模組中
 from utils.time_utils import get_current_time
 
 logger = get_logger(__name__)
 
+RUN_DURATION = metrics.histogram(
+    "update_run_duration_seconds",
+    "單次更新執行的耗時（秒）",
+    ("market",),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200),
+)
+RUNS = metrics.counter("update_runs_total", "更新執行次數", ("market", "outcome"))
+RUN_QUOTA = metrics.counter(
+    "update_run_quota_consumed_total", "更新執行消耗的 FinMind 額度", ("market",)
+)
+LAST_RUN_QUOTA = metrics.gauge(
+    "update_last_run_quota_consumed", "最近一次更新消耗的 FinMind 額度", ("market",)
+)
+STOCKS_PROCESSED = metrics.counter(
+    "update_stocks_total", "各更新狀態的股票數", ("market", "status")
+)
+
+# 累積多少筆股票結果後寫入一次執行歷史
+HISTORY_FLUSH_SIZE = 500
+
 
 class StockPriceUpdater:
     def __init__(self):
         self.api = StockAPI()
         self.market_checker = MarketTimeChecker()
+        self.price_cache = LastWrittenPriceCache()
+        self.run_history = RunHistoryStore() if RUN_HISTORY_PATH else None
 
-    def process_single_stock(self, stock: Dict) -> Optional[Dict]:
+    def process_single_stock(
+        self, stock: Dict, priority: int = PRIORITY_SCHEDULED
+    ) -> Optional[StockResult]:
         """處理單一股票的價格更新"""
-        stock_name = stock["name"]
-        stock_id = stock_name.split(":")[0]
-        is_us_stock = not any(
-            stock_name.endswith(suffix) for suffix in (TPE_SUFFIX, TWO_SUFFIX)
-        )
+        try:
+            close_price, fetch_seconds = self._timed_fetch(stock, priority)
+        except QuotaExceededError:
+            return self._build_result(stock, None, UPDATE_STATUS_QUOTA_SKIPPED)
+        except CircuitOpenError:
+            return self._stale_result(stock)
+        if close_price is None:
+            return None
+        if self._is_unchanged(stock, close_price):
+            result = self._build_result(stock, close_price, UPDATE_STATUS_UNCHANGED)
+        else:
+            result = self._write_stock_price(stock, close_price)
+        if result is not None:
+            result.fetch_seconds = fetch_seconds
+        return result
+
+    @staticmethod
+    def _is_us_stock(stock: Dict) -> bool:
+        """判斷是否為美股"""
+        return not stock["name"].endswith((TPE_SUFFIX, TWO_SUFFIX))
+
+    def _fetch_stock_price(
+        self, stock: Dict, priority: int = PRIORITY_SCHEDULED
+    ) -> Optional[float]:
+        """從 FinMind 獲取單一股票的最新價格
+
+        Raises:
+            QuotaExceededError: FinMind 額度不足，未送出請求
+            CircuitOpenError: FinMind 斷路中，未送出請求
+        """
+        stock_id = stock["name"].split(":")[0]
 
         try:
             # 根據市場類型獲取價格
-            if is_us_stock:
-                close_price = self.api.get_us_stock_price(stock_id)
-            else:
-                close_price = self.api.get_taiwan_stock_price(stock_id)
-
-            if close_price is not None:
-                logger.info(
-                    f"準備更新股票 {stock_id} ({stock['alias']}) 的價格到 {close_price}"
-                )
-                update_success = self.api.update_stock_price(stock["_id"], close_price)
-                update_status = "更新成功" if update_success else "更新失敗"
-                logger.info(
-                    f"{'[成功]' if update_success else '[失敗]'} {update_status}：{stock_id} 價格 {close_price}"
+            with use_priority(priority):
+                if self._is_us_stock(stock):
+                    close_price = self.api.get_us_stock_price(stock_id)
+                else:
+                    close_price = self.api.get_taiwan_stock_price(stock_id)
+
+            if close_price is None:
+                logger.warning(
+                    "沒有找到 %s 的資料", stock_id, extra={"stock": stock_id}
                 )
+            return close_price
 
-                current_time = get_current_time()
-                return {
-                    "股票代碼": stock_id,
-                    "名稱": stock["alias"],
-                    "市場": "US" if is_us_stock else "TW",
-                    "日期": current_time.strftime("%Y-%m-%d"),
-                    "收盤價": close_price,
-                    "價格更新狀態": update_status,
-                }
-            else:
-                logger.warning(f"沒有找到 {stock_id} 的資料")
-                return None
+        except (QuotaExceededError, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"處理 {stock_id} 時發生錯誤: {e}")
+            return None
+
+    def _timed_fetch(
+        self, stock: Dict, priority: int = PRIORITY_SCHEDULED
+    ) -> Tuple[Optional[float], float]:
+        """查詢價格並量測耗時，返回 (收盤價, 秒數)"""
+        started = time.perf_counter()
+        close_price = self._fetch_stock_price(stock, priority)
+        return close_price, time.perf_counter() - started
+
+    def _stale_result(self, stock: Dict) -> Optional[StockResult]:
+        """FinMind 斷路時沿用最後寫入的價格，不再寫回 API"""
+        close_price = self.price_cache.get(stock["_id"])
+        if close_price is None:
+            return None
+
+        logger.info(
+            "[沿用] FinMind 斷路中，%s 沿用最後寫入價格 %s",
+            stock["name"],
+            close_price,
+            extra={"stock": stock["name"].split(":")[0]},
+        )
+        return self._build_result(stock, close_price, UPDATE_STATUS_STALE)
+
+    def _write_stock_price(
+        self, stock: Dict, close_price: float
+    ) -> Optional[StockResult]:
+        """將價格寫回 API 並組成結果"""
+        stock_id = stock["name"].split(":")[0]
+
+        try:
+            logger.info(
+                "準備更新股票 %s (%s) 的價格到 %s",
+                stock_id,
+                stock["alias"],
+                close_price,
+                extra={"stock": stock_id},
+            )
+            update_success = self.api.update_stock_price(stock["_id"], close_price)
+            return self._complete_write(stock, close_price, update_success)
 
         except Exception as e:
             logger.error(f"處理 {stock_id} 時發生錯誤: {e}")
             return None
 
+    def _write_price_batch(
+        self, batch: List[Tuple[Dict, float]]
+    ) -> List[Optional[StockResult]]:
+        """將一批價格寫回 API 並組成結果，後端不支援批次時逐筆更新"""
+        if len(batch) == 1 and not self.api.price_batch_available:
+            stock, close_price = batch[0]
+            return [self._write_stock_price(stock, close_price)]
+
+        logger.info(f"準備批次更新 {len(batch)} 支股票的價格")
+        prices = {stock["_id"]: close_price for stock, close_price in batch}
+        outcomes = self.api.update_stock_prices(prices)
+        return [
+            self._complete_write(stock, close_price, outcomes.get(stock["_id"], False))
+            for stock, close_price in batch
+        ]
+
+    def _is_unchanged(self, stock: Dict, close_price: float) -> bool:
+        """判斷價格是否與上次寫入相同，相同時不需要再寫回"""
+        if not self.price_cache.is_unchanged(stock["_id"], close_price):
+            return False
+
+        logger.info(
+            "[略過] %s 價格 %s 與上次寫入相同",
+            stock["name"],
+            close_price,
+            extra={"stock": stock["name"].split(":")[0]},
+        )
+        return True
+
+    def _complete_write(
+        self, stock: Dict, close_price: float, update_success: bool
+    ) -> StockResult:
+        """記錄寫回結果，成功時更新最後寫入價格快取"""
+        stock_id = stock["name"].split(":")[0]
+        if update_success:
+            self.price_cache.record(stock["_id"], close_price)
+            update_status = UPDATE_STATUS_SUCCESS
+        else:
+            update_status = UPDATE_STATUS_FAILED
+        logger.info(
+            "%s %s：%s 價格 %s",
+            "[成功]" if update_success else "[失敗]",
+            update_status,
+            stock_id,
+            close_price,
+            extra={"stock": stock_id},
+        )
+        return self._build_result(stock, close_price, update_status)
+
+    def _build_result(
+        self, stock: Dict, close_price: Optional[float], update_status: str
+    ) -> StockResult:
+        """組成單一股票的更新結果"""
+        return StockResult(
+            stock["name"].split(":")[0],
+            stock["alias"],
+            MARKET_US if self._is_us_stock(stock) else MARKET_TW,
+            get_current_time().strftime("%Y-%m-%d"),
+            close_price,
+            update_status,
+        )
+
     def get_stock_prices(
-        self, ignore_market_hours: bool = False
-    ) -> Optional[List[Dict]]:
+        self,
+        ignore_market_hours: bool = False,
+        market: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        shard: Optional[Shard] = None,
+        run_id: Optional[str] = None,
+        trigger: Optional[str] = None,
+        on_outcome: Optional[Callable[[Outcome], None]] = None,
+        on_finish: Optional[Callable[[int, Dict], None]] = None,
+    ) -> Optional[List[StockResult]]:
         """獲取所有股票的最新價格並更新到 API
 
         Args:
             ignore_market_hours (bool): 是否忽略市場交易時間檢查，手動觸發時設為 True
+            market (str): 只處理指定市場（MARKET_TW / MARKET_US），None 表示全部市場
+            progress_callback: 每處理完股票時以 (已處理數, 總數) 呼叫
+            shard: 只處理屬於 (分片編號, 分片數) 的股票，None 表示全部股票
+            run_id: 執行歷史中的執行編號，None 時自動產生
+            trigger: 觸發來源，None 時依 ignore_market_hours 記為 manual 或 scheduled
+            on_outcome: 每支股票完成時以執行歷史格式的結果呼叫
+            on_finish: 更新結束時以 (消耗的額度, 彙總統計) 呼叫
         """
         self._log_task_start()
 
-        stock_list = self._get_validated_stock_list()
-        if not stock_list:
-            return None
+        if trigger is None:
+            trigger = "manual" if ignore_market_hours else "scheduled"
+        with self._track_run(market, run_id, trigger, on_outcome, on_finish) as run:
+            stock_list = self._prepare_stock_list(ignore_market_hours, market, shard)
+            if stock_list is None:
+                return None
 
-        all_stock_data = self._process_all_stocks(stock_list, ignore_market_hours)
+            all_stock_data = self._process_all_stocks(
+                stock_list, run, ignore_market_hours, progress_callback
+            )
+            self.price_cache.save()
+            run["outcome"] = "completed"
 
-        self._log_task_completion(all_stock_data)
+        self._log_task_completion(all_stock_data, run)
         return all_stock_data
 
+    def iter_stock_prices(
+        self,
+        ignore_market_hours: bool = False,
+        market: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        run_id: Optional[str] = None,
+        trigger: str = "stream",
+        on_outcome: Optional[Callable[[Outcome], None]] = None,
+        on_finish: Optional[Callable[[int, Dict], None]] = None,
+    ) -> Iterator[StockResult]:
+        """逐支產生股票價格更新結果
+
+        與 get_stock_prices 相同的更新流程，但每支股票完成時立即產生結果
+        （依完成順序），不會保留整份結果列表。提早關閉產生器時會取消尚未開始的工作。
+        價格寫回改用 STREAM_BATCH_SIZE 的小批次，累積超過 STREAM_BATCH_DELAY 秒
+        也會先送出，結果不會因為等待批次湊滿而延遲。
+
+        Args:
+            ignore_market_hours (bool): 是否忽略市場交易時間檢查，手動觸發時設為 True
+            market (str): 只處理指定市場（MARKET_TW / MARKET_US），None 表示全部市場
+            其餘參數與 get_stock_prices 相同
+        """
+        self._log_task_start()
+
+        with self._track_run(market, run_id, trigger, on_outcome, on_finish) as run:
+            stock_list = self._prepare_stock_list(ignore_market_hours, market)
+            if stock_list is None:
+                return
+
+            summary = run["summary"]
+            try:
+                for index, result, fetch_seconds in self._iter_all_stocks(
+                    stock_list,
+                    ignore_market_hours,
+                    batch_size=STREAM_BATCH_SIZE,
+                    max_batch_delay=STREAM_BATCH_DELAY,
+                ):
+                    self._record_result(run, stock_list[index], result, fetch_seconds)
+                    if progress_callback:
+                        progress_callback(summary.total, len(stock_list))
+                    yield result
+                run["outcome"] = "completed"
+            finally:
+                self.price_cache.save()
+                logger.info(f"串流更新結束，共產生 {summary.total} 筆結果")
+                self._log_run_summary(run)
+                logger.info(f"任務完成時間: {get_current_time()}")
+
+    @contextmanager
+    def _track_run(
+        self,
+        market: Optional[str],
+        run_id: Optional[str] = None,
+        trigger: str = "scheduled",
+        on_outcome: Optional[Callable[[Outcome], None]] = None,
+        on_finish: Optional[Callable[[int, Dict], None]] = None,
+    ) -> Iterator[Dict]:
+        """記錄單次更新的耗時、結果與消耗的 FinMind 額度
+
+        區塊內將 outcome 設為 "completed" 表示正常完成，否則記為 failed；
+        各股票的結果累計在 run["summary"]，並分批寫入執行歷史。
+        """
+        label = market or "all"
+        run = {
+            "outcome": "failed",
+            "error": None,
+            "summary": RunSummary(),
+            "outcomes": [],
+            "on_outcome": on_outcome,
+            # 開始時已略過的個股日誌數，彙總時只報告本次執行期間增加的部分
+            "dropped_logs_at_start": dropped_stock_logs(),
+        }
+        started = time.perf_counter()
+        consumed = self.api.rate_limiter.consumed
+        if self.run_history is not None:
+            run["history_seq"] = self.run_history.start_run(
+                run_id or uuid.uuid4().hex[:12], trigger, label, time.time()
+            )
+        try:
+            yield run
+        except Exception as e:
+            run["error"] = str(e)
+            raise
+        finally:
+            quota = self.api.rate_limiter.consumed - consumed
+            RUN_DURATION.observe(time.perf_counter() - started, market=label)
+            RUNS.inc(market=label, outcome=run["outcome"])
+            RUN_QUOTA.inc(quota, market=label)
+            LAST_RUN_QUOTA.set(quota, market=label)
+            summary = run["summary"].to_dict()
+            if run.get("history_seq") is not None:
+                self._flush_outcomes(run)
+                self.run_history.finish_run(
+                    run["history_seq"],
+                    run["outcome"],
+                    time.time(),
+                    quota,
+                    summary,
+                    run["error"],
+                )
+            if on_finish is not None:
+                on_finish(quota, summary)
+
+    def _record_result(
+        self,
+        run: Dict,
+        stock: Dict,
+        result: Optional[StockResult],
+        fetch_seconds: Optional[float] = None,
+    ) -> None:
+        """依市場與更新狀態累計股票數與查詢耗時，並暫存寫入執行歷史的結果"""
+        market = MARKET_US if self._is_us_stock(stock) else MARKET_TW
+        status = run["summary"].add(market, result, fetch_seconds)
+        STOCKS_PROCESSED.inc(market=market, status=status)
+
+        if run.get("history_seq") is None and run["on_outcome"] is None:
+            return
+        outcome = (
+            stock["_id"],
+            stock["name"].split(":")[0],
+            market,
+            status,
+            result.close_price if result is not None else None,
+            None if fetch_seconds is None else round(fetch_seconds * 1000, 2),
+        )
+        if run["on_outcome"] is not None:
+            run["on_outcome"](outcome)
+        if run.get("history_seq") is None:
+            return
+        run["outcomes"].append(outcome)
+        if len(run["outcomes"]) >= HISTORY_FLUSH_SIZE:
+            self._flush_outcomes(run)
+
+    def _flush_outcomes(self, run: Dict) -> None:
+        """將暫存的股票結果寫入執行歷史"""
+        if run["outcomes"]:
+            self.run_history.add_outcomes(run["history_seq"], run["outcomes"])
+            run["outcomes"] = []
+
+    def _prepare_stock_list(
+        self,
+        ignore_market_hours: bool,
+        market: Optional[str],
+        shard: Optional[Shard] = None,
+    ) -> Optional[List[Dict]]:
+        """取得本次要處理的股票，無法取得股票列表時為 None"""
+        universe = self._get_validated_stock_universe()
+        if universe is None:
+            return None
+        stock_list = self._select_stocks(universe, ignore_market_hours, market)
+        if shard is None or len(shard[0]) >= shard[1]:
+            return stock_list
+
+        selected = [s for s in stock_list if in_shard(s["name"].split(":")[0], shard)]
+        logger.info(
+            f"分片 {list(shard[0])}/{shard[1]} 負責 {len(selected)} / {len(stock_list)} 支股票"
+        )
+        return selected
+
     def _log_task_start(self) -> None:
         """記錄任務開始時間"""
         current_time = get_current_time()
         logger.info(f"開始執行股票價格更新任務: {current_time}")
 
-    def _get_validated_stock_list(self) -> Optional[List[Dict]]:
-        """獲取並驗證股票列表"""
-        stock_list = self.api.get_stock_list()
-        if not stock_list:
+    def _get_validated_stock_universe(self) -> Optional[StockUniverse]:
+        """獲取並驗證已分類的股票列表"""
+        universe = self.api.get_stock_universe()
+        if not universe:
             logger.warning("沒有找到符合條件的股票")
             return None
-        return stock_list
+        return universe
+
+    def _select_stocks(
+        self,
+        universe: StockUniverse,
+        ignore_market_hours: bool,
+        market: Optional[str] = None,
+    ) -> List[Dict]:
+        """依市場開盤狀態選出本次要處理的股票
 
-    def _should_process_stock(self, stock: Dict, ignore_market_hours: bool) -> bool:
-        """判斷是否應該處理該股票
+        開盤狀態每次執行只判斷一次，並直接取用預先分類好的市場列表。
 
         Args:
-            stock: 股票資訊
+            universe: 已分類的股票列表
             ignore_market_hours: 是否忽略市場交易時間檢查
+            market: 只處理指定市場，None 表示全部市場
 
         Returns:
-            bool: 是否應該處理此股票
+            List[Dict]: 需要處理的股票
         """
+        markets = [market] if market else [MARKET_TW, MARKET_US]
+
         if ignore_market_hours:
             logger.info("手動觸發更新，忽略市場交易時間檢查")
-            return True
+        else:
+            market_open = {
+                MARKET_TW: self.market_checker.is_tw_market_hours(),
+                MARKET_US: self.market_checker.is_us_market_hours(),
+            }
+            markets = [m for m in markets if market_open[m]]
+
+        stock_list = [stock for m in markets for stock in universe.for_market(m)]
+        for m in markets:
+            logger.info(f"{m} 市場處理 {len(universe.for_market(m))} 支股票")
+        return stock_list
 
-        stock_name = stock["name"]
-        is_us_stock = not any(
-            stock_name.endswith(suffix) for suffix in (TPE_SUFFIX, TWO_SUFFIX)
+    def _process_all_stocks(
+        self,
+        stock_list: List[Dict],
+        run: Dict,
+        ignore_market_hours: bool = False,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> List[StockResult]:
+        """處理所有股票數據，結果依原股票列表順序返回"""
+        results: List[Optional[StockResult]] = [None] * len(stock_list)
+        processed = 0
+        for index, result, fetch_seconds in self._iter_all_stocks(
+            stock_list, ignore_market_hours
+        ):
+            self._record_result(run, stock_list[index], result, fetch_seconds)
+            results[index] = result
+            processed += 1
+            if progress_callback:
+                progress_callback(processed, len(stock_list))
+        return [result for result in results if result]
+
+    def _iter_all_stocks(
+        self,
+        stock_list: List[Dict],
+        ignore_market_hours: bool = False,
+        batch_size: int = PRICE_BATCH_SIZE,
+        max_batch_delay: Optional[float] = None,
+    ) -> Iterator[Tuple[int, Optional[StockResult], Optional[float]]]:
+        """處理所有股票數據，依完成順序產生 (股票索引, 結果, 查詢耗時)
+
+        FinMind 查詢與價格寫回分別在兩個有上限的執行緒池中進行。
+        後端支援批次更新時，查詢完成的價格累積至 batch_size 筆後一次寫回，
+        有設定 max_batch_delay 時，最早的一筆等待超過該秒數也會先送出；
+        否則每支股票查詢完成後立即送出單筆寫回。
+        查詢依股票重要性排序送出，FinMind 額度不足時只會略過較不重要的股票。
+        每支股票都會產生一次，沒有資料或發生錯誤時結果為 None，
+        未送出查詢（額度不足或斷路）時查詢耗時為 None。
+        """
+        targets = stock_list
+        if not targets:
+            return
+
+        # 手動觸發的更新使用較低的額度優先等級，保留額度給排程更新
+        priority = PRIORITY_MANUAL if ignore_market_hours else PRIORITY_SCHEDULED
+
+        if TW_BULK_FETCH and not all(self._is_us_stock(stock) for stock in targets):
+            with use_priority(priority):
+                self.api.load_taiwan_price_snapshot()
+
+        fetch_order = sorted(
+            range(len(targets)), key=lambda index: -self._importance(targets[index])
         )
+        quota_skipped = 0
+        circuit_skipped = 0
 
-        is_us_market_open = self.market_checker.is_us_market_hours()
-        is_tw_market_open = self.market_checker.is_tw_market_hours()
+        fetch_pool = ThreadPoolExecutor(
+            max_workers=max(FETCH_WORKERS, 1), thread_name_prefix="finmind-fetch"
+        )
+        write_pool = ThreadPoolExecutor(
+            max_workers=max(WRITE_WORKERS, 1), thread_name_prefix="price-write"
+        )
+        try:
+            fetch_futures = {
+                fetch_pool.submit(self._timed_fetch, targets[index], priority): index
+                for index in fetch_order
+            }
+            write_futures: Dict[Future, List[int]] = {}
+            in_flight = set(fetch_futures)
+            fetches_left = len(fetch_futures)
+            pending: List[int] = []
+            pending_since = 0.0
+            prices: Dict[int, float] = {}
+            fetch_seconds: Dict[int, float] = {}
 
-        # 美股交易時段只更新美股
-        if is_us_market_open and is_us_stock:
-            logger.info(f"美股交易時段，處理美股 {stock['name']}")
-            return True
+            def submit_writes(indexes: List[int]) -> None:
+                batch = [(targets[index], prices[index]) for index in indexes]
+                future = write_pool.submit(self._write_price_batch, batch)
+                write_futures[future] = indexes
+                in_flight.add(future)
 
-        # 台股交易時段只更新台股
-        if is_tw_market_open and not is_us_stock:
-            logger.info(f"台股交易時段，處理台股 {stock['name']}")
-            return True
+            while in_flight:
+                timeout = None
+                if pending and max_batch_delay is not None:
+                    timeout = max(pending_since + max_batch_delay - time.monotonic(), 0)
+                done, in_flight = wait(
+                    in_flight, timeout=timeout, return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    if future in write_futures:
+                        indexes = write_futures.pop(future)
+                        label = ", ".join(targets[index]["name"] for index in indexes)
+                        batch_results = self._safe_result(future, label) or []
+                        batch_results += [None] * (len(indexes) - len(batch_results))
+                        for index, result in zip(indexes, batch_results):
+                            elapsed = fetch_seconds.pop(index)
+                            if result is not None:
+                                result.fetch_seconds = elapsed
+                            yield index, result, elapsed
+                        continue
 
-        return False
+                    index = fetch_futures[future]
+                    fetches_left -= 1
+                    try:
+                        close_price, elapsed = future.result()
+                    except QuotaExceededError:
+                        quota_skipped += 1
+                        yield index, self._build_result(
+                            targets[index], None, UPDATE_STATUS_QUOTA_SKIPPED
+                        ), None
+                        continue
+                    except CircuitOpenError:
+                        circuit_skipped += 1
+                        yield index, self._stale_result(targets[index]), None
+                        continue
+                    except Exception as e:
+                        logger.error(f"處理 {targets[index]['name']} 時發生錯誤: {e}")
+                        yield index, None, None
+                        continue
 
-    def _process_all_stocks(
-        self, stock_list: List[Dict], ignore_market_hours: bool
-    ) -> List[Dict]:
-        """處理所有股票數據"""
-        all_stock_data = []
+                    if close_price is None:
+                        yield index, None, elapsed
+                        continue
 
-        for stock in stock_list:
-            if self._should_process_stock(stock, ignore_market_hours):
-                result = self.process_single_stock(stock)
-                if result:
-                    all_stock_data.append(result)
+                    if self._is_unchanged(targets[index], close_price):
+                        result = self._build_result(
+                            targets[index], close_price, UPDATE_STATUS_UNCHANGED
+                        )
+                        result.fetch_seconds = elapsed
+                        yield index, result, elapsed
+                        continue
 
-        return all_stock_data
+                    prices[index] = close_price
+                    fetch_seconds[index] = elapsed
+                    if not self.api.price_batch_available:
+                        submit_writes([index])
+                        continue
 
-    def _log_task_completion(self, all_stock_data: List[Dict]) -> None:
-        """記錄任務完成情況"""
-        self.display_results(all_stock_data)
-        logger.info(f"任務完成時間: {get_current_time()}")
+                    if not pending:
+                        pending_since = time.monotonic()
+                    pending.append(index)
+                    if len(pending) >= batch_size:
+                        submit_writes(pending)
+                        pending = []
+
+                # 所有查詢完成或等待過久時送出累積的一批
+                overdue = max_batch_delay is not None and (
+                    time.monotonic() - pending_since >= max_batch_delay
+                )
+                if pending and (fetches_left == 0 or overdue):
+                    submit_writes(pending)
+                    pending = []
+        finally:
+            fetch_pool.shutdown(wait=True, cancel_futures=True)
+            write_pool.shutdown(wait=True, cancel_futures=True)
+
+        if circuit_skipped:
+            logger.warning(
+                f"FinMind 斷路中，{circuit_skipped} 支股票未查詢，有最後寫入價格者以"
+                f"「{UPDATE_STATUS_STALE}」回報"
+            )
+        if quota_skipped:
+            logger.warning(
+                f"FinMind 額度不足，{quota_skipped} 支較不重要的股票未更新，"
+                f"剩餘額度: {self.api.rate_limiter.available(priority)}"
+            )
 
     @staticmethod
-    @staticmethod
-    def display_results(stock_data: List[Dict]):
-        """顯示更新結果"""
-        if not stock_data:
-            logger.warning("沒有獲取到任何股票資料")
-            return
+    def _importance(stock: Dict) -> float:
+        """股票重要性，取自股票列表的 priority 欄位（越大越重要）"""
+        try:
+            return float(stock.get("priority") or 0)
+        except (TypeError, ValueError):
+            return 0.0
 
+    @staticmethod
+    def _safe_result(future: Future, label: str):
+        """取出 future 結果，單一股票的例外不影響其他股票"""
         try:
-            logger.info("\n股票最新報價:")
-            logger.info("-" * 80)
-            df_all = pd.DataFrame(stock_data)
-            pd.set_option("display.float_format", lambda x: "%.2f" % x)
-            pd.set_option("display.width", None)
-            pd.set_option("display.max_rows", None)
-            logger.info("\n" + df_all.to_string(index=False))
-            logger.info("-" * 80)
+            return future.result()
         except Exception as e:
-            logger.error(f"顯示結果時發生錯誤: {e}")
+            logger.error(f"處理 {label} 時發生錯誤: {e}")
+            return None
+
+    def _log_task_completion(
+        self, all_stock_data: List[StockResult], run: Dict
+    ) -> None:
+        """記錄任務完成情況
+
+        每次只輸出一行統計；完整的結果表格只在開啟 DEBUG 日誌時產生。
+        """
+        if not all_stock_data:
+            logger.warning("沒有獲取到任何股票資料")
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("股票最新報價:\n%s", format_results_table(all_stock_data))
+        self._log_run_summary(run)
+        logger.info(f"任務完成時間: {get_current_time()}")
+
+    @staticmethod
+    def _log_run_summary(run: Dict) -> None:
+        """以一行彙總本次更新各市場、各狀態的股票數與查詢耗時
+
+        dropped_stock_logs 為本次執行期間因抽樣略過的個股日誌數，
+        同時執行的其他市場更新略過的日誌也會計入。
+        """
+        dropped = dropped_stock_logs() - run["dropped_logs_at_start"]
+        logger.info(
+            "本次更新統計: %s",
+            run["summary"].format_line(),
+            extra={"dropped_stock_logs": dropped},
+        )
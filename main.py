@@ -1,21 +1,37 @@
-from fastapi import FastAPI
+from utils.startup import startup_report
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
+import asyncio
+import json
+import queue
 import uvicorn
+from core.coordination import Coordinator
 from core.scheduler import StockScheduler
 from core.updater import StockPriceUpdater
-from core.market import MarketTimeChecker
-from config.settings import HOST, PORT
+from core.runs import RunManager
+from core.rate_limiter import use_priority
+from config.constants import MARKET_TW, MARKET_US, POLLING_ADAPTIVE, PRIORITY_ADHOC
+from core.results import STATUS_COLUMNS
+from config.settings import HOST, POLLING_MODE, PORT
 from utils.logger import get_logger
+from utils.metrics import metrics
 from utils.time_utils import get_current_time
+from typing import Optional
 import os
+import threading
 import time
 from datetime import datetime  # 添加這個導入
 
+startup_report.mark("imports")
 logger = get_logger(__name__)
 
-# 初始化服務
-updater = StockPriceUpdater()
-scheduler = StockScheduler()
+# 初始化服務，更新器在第一次使用時才建立
+_updater: Optional[StockPriceUpdater] = None
+_updater_lock = threading.Lock()
+coordinator = Coordinator()
+scheduler = StockScheduler(coordinator)
+run_manager = RunManager()
 
 # 驗證時區設定
 current_time = get_current_time()
@@ -26,20 +42,42 @@ logger.info(f"設定後的台北時間: {current_time}")
 logger.info(f"環境變數TZ: {os.getenv('TZ')}")
 
 
+def get_updater() -> StockPriceUpdater:
+    """取得共用的更新器，第一次呼叫時才建立"""
+    global _updater
+    if _updater is None:
+        with _updater_lock:
+            if _updater is None:
+                _updater = StockPriceUpdater()
+                startup_report.mark("updater_ready")
+    return _updater
+
+
+def scheduled_update(**kwargs):
+    """排程工作，執行時才建立更新器"""
+    return get_updater().get_stock_prices(**kwargs)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """處理應用程式的生命週期事件"""
     # 啟動時執行
-    market_hours = MarketTimeChecker.get_market_hours()
-    scheduler.setup_tw_market_jobs(updater.get_stock_prices)
-    scheduler.setup_us_market_jobs(updater.get_stock_prices, market_hours)
+    if POLLING_MODE == POLLING_ADAPTIVE:
+        # 每支股票依波動度與重要性各自排定更新時間
+        scheduler.setup_adaptive_polling(get_updater)
+    else:
+        # 台股與美股各自只處理自己的市場，美股排程涵蓋夏令與冬令時段
+        scheduler.setup_tw_market_jobs(scheduled_update)
+        scheduler.setup_us_market_jobs(scheduled_update)
     scheduler.start()
+    startup_report.mark("app_ready")
     logger.info(f"應用程式啟動完成，當前時間: {get_current_time()}")
 
     yield
 
     # 關閉時執行
     scheduler.shutdown()
+    run_manager.shutdown()
     logger.info("應用程式已關閉")
 
 
@@ -49,6 +87,7 @@ app = FastAPI(lifespan=lifespan)
 @app.get("/")
 async def root():
     """健康檢查端點"""
+    startup_report.mark("first_healthy")
     current_time = get_current_time()
     return {
         "status": "running",
@@ -58,17 +97,226 @@ async def root():
 
 
 @app.get("/trigger")
-async def trigger_update():
-    """手動觸發更新的端點"""
+async def trigger_update(refresh_stocks: bool = False, wait: bool = False):
+    """手動觸發更新的端點
+
+    更新在背景執行緒中執行，立即回傳 run_id，可透過 /runs/{run_id} 查詢進度。
+    已有更新執行中時會沿用該次執行，不會重複啟動。
+
+    Args:
+        refresh_stocks: 是否強制重新下載股票列表
+        wait: 是否等待更新完成後才回應（等待期間不會阻塞其他請求）
+    """
     logger.info(f"手動觸發更新開始，當前時間: {get_current_time()}")
-    data = updater.get_stock_prices(ignore_market_hours=True)  # 修改這裡
-    return {"message": "更新完成", "data": data}
+    if refresh_stocks:
+        get_updater().api.invalidate_stock_list()
+
+    record, created = run_manager.submit(
+        get_updater().get_stock_prices, trigger="manual", ignore_market_hours=True
+    )
+
+    if wait:
+        data = await asyncio.wrap_future(record.future)
+        data = [result.to_dict() for result in data] if data is not None else None
+        return {"message": "更新完成", "run_id": record.run_id, "data": data}
+
+    return {
+        "message": "已提交更新" if created else "已有更新執行中，沿用該次執行",
+        "run_id": record.run_id,
+        "status": record.status,
+        "status_url": f"/runs/{record.run_id}",
+    }
+
+
+# 串流更新結束時放入結果佇列的標記
+_STREAM_END = object()
+
+
+def _stream_update(sink: queue.Queue, cancelled: threading.Event, **kwargs) -> None:
+    """在 RunManager 的執行緒中執行串流更新，將每支股票的結果放入佇列"""
+    results = get_updater().iter_stock_prices(ignore_market_hours=True, **kwargs)
+    try:
+        for result in results:
+            if cancelled.is_set():
+                raise RuntimeError("用戶端已中斷連線，停止串流更新")
+            if result:
+                sink.put(result)
+    finally:
+        results.close()
+        sink.put(_STREAM_END)
+
+
+def _run_conflict(record) -> HTTPException:
+    """已有手動更新執行中時的 409 回應"""
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": "已有更新執行中",
+            "run_id": record.run_id,
+            "status_url": f"/runs/{record.run_id}",
+        },
+    )
+
+
+@app.get("/trigger/stream")
+def trigger_stream(refresh_stocks: bool = False, format: str = "ndjson"):
+    """手動觸發更新並以串流逐支回傳結果
+
+    每支股票完成時立即送出一筆結果（依完成順序），不等待整批更新結束。
+    與 /trigger 共用同一個執行佇列，已有手動更新執行中時回應 409。
+    用戶端中斷連線時會取消尚未開始的查詢與寫回。
+
+    Args:
+        refresh_stocks: 是否強制重新下載股票列表
+        format: "ndjson"（每行一筆 JSON）或 "sse"（Server-Sent Events）
+    """
+    if format not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail=f"不支援的串流格式 {format}")
+
+    logger.info(f"手動觸發串流更新開始，當前時間: {get_current_time()}")
+    active = run_manager.active()
+    if active is not None:
+        raise _run_conflict(active)
+    if refresh_stocks:
+        get_updater().api.invalidate_stock_list()
+
+    sink: queue.Queue = queue.Queue()
+    cancelled = threading.Event()
+    record, created = run_manager.submit(
+        _stream_update, trigger="stream", sink=sink, cancelled=cancelled
+    )
+    if not created:
+        raise _run_conflict(record)  # 檢查後才被其他請求搶先提交
+
+    def encode(result) -> str:
+        line = json.dumps(result.to_dict(), ensure_ascii=False, default=float)
+        return f"data: {line}\n\n" if format == "sse" else f"{line}\n"
+
+    def stream():
+        try:
+            while True:
+                result = sink.get()
+                if result is _STREAM_END:
+                    break
+                yield encode(result)
+        finally:
+            cancelled.set()
+        if format == "sse":
+            yield "event: end\ndata: {}\n\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        stream(), media_type=media_type, headers={"X-Run-Id": record.run_id}
+    )
+
+
+@app.get("/runs")
+def list_runs(
+    market: Optional[str] = None,
+    symbol: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+):
+    """依新到舊分頁查詢執行歷史
+
+    指定條件時只列出有符合股票結果的執行；指定 symbol 或 status 時，
+    每筆執行另外附上符合條件的股票結果，可用來追蹤特定股票跨日的失敗或延遲。
+
+    Args:
+        market: 只列出包含此市場（TW / US）股票的執行
+        symbol: 股票代碼，例如 2330 或 AAPL
+        status: 狀態標籤，例如 failed、quota_skipped、stale、no_data
+        limit: 每頁筆數（1-100）
+        offset: 略過的筆數
+    """
+    history = get_updater().run_history
+    if history is None:
+        raise HTTPException(status_code=404, detail="未啟用執行歷史")
+    if market is not None:
+        market = market.upper()
+        if market not in (MARKET_TW, MARKET_US):
+            raise HTTPException(status_code=400, detail=f"不支援的市場 {market}")
+    if status is not None and status not in STATUS_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"不支援的狀態 {status}")
+    if not 1 <= limit <= 100 or offset < 0:
+        raise HTTPException(
+            status_code=400, detail="limit 需介於 1-100，offset 不可為負"
+        )
+    return history.list_runs(limit, offset, market, symbol, status)
+
+
+@app.get("/runs/{run_id}")
+def get_run(run_id: str, include_results: bool = True):
+    """查詢更新執行的進度與結果
+
+    最近的手動觸發保留在記憶體中，其他執行（包含排程更新與重啟前的執行）由執行歷史查詢，
+    兩者的回應格式相同。
+
+    Args:
+        run_id: /trigger 回傳的執行編號，或 /runs 列出的執行編號
+        include_results: 是否包含每支股票的結果
+    """
+    record = run_manager.get(run_id)
+    if record is not None:
+        return record.to_dict(include_results=include_results)
+
+    history = get_updater().run_history
+    run = history.get_run(run_id, include_results) if history is not None else None
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"找不到執行紀錄 {run_id}")
+    return run
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus 格式的指標
+
+    包含 FinMind 與價格寫回的請求耗時、每次更新的耗時與各狀態股票數、
+    FinMind 額度使用量，以及排程觸發延遲。
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/coordination")
+async def coordination_status():
+    """多 worker 協調狀態
+
+    包含協調模式、本行程識別、是否執行排程、負責的分片，以及目前未到期的 lease。
+    """
+    return coordinator.status()
+
+
+@app.get("/polling")
+async def polling_status():
+    """自適應輪詢狀態（POLLING_MODE=adaptive）
+
+    包含輪詢中的股票數、為符合額度的間隔延展倍數，以及各股票的更新間隔與下次更新時間。
+    """
+    if scheduler.poller is None:
+        raise HTTPException(status_code=404, detail="未啟用自適應輪詢")
+    return scheduler.poller.status()
+
+
+@app.get("/startup")
+async def startup_timing():
+    """啟動時間報告
+
+    各階段為自 main 開始匯入起算的秒數：imports（模組匯入完成）、
+    app_ready（排程啟動完成）、first_healthy（第一次健康檢查回應）、
+    updater_ready（第一次使用時建立更新器）。
+    imports 為較重模組各自的累計匯入時間（含其匯入的子模組，與 python -X importtime 的 cumulative 相同）。
+    """
+    return startup_report.to_dict()
 
 
 @app.get("/test_minute/{stock_id}")
-async def test_minute_data(stock_id: str):
+def test_minute_data(stock_id: str):
     """測試美股分鐘數據的端點
 
+    查詢 FinMind 為阻塞呼叫，以一般函式定義，由 FastAPI 在執行緒池中執行，
+    不會佔住事件迴圈。
+
     Args:
         stock_id: 股票代碼，例如 "NVDA"
 
@@ -78,7 +326,8 @@ async def test_minute_data(stock_id: str):
     logger.info(f"收到測試分鐘數據請求，股票代碼: {stock_id}")
 
     try:
-        data = updater.api.get_us_stock_minute_price(stock_id)
+        with use_priority(PRIORITY_ADHOC):
+            data = get_updater().api.get_us_stock_minute_price(stock_id)
         if not data:
             return {"status": "error", "message": "無法獲取數據"}
 
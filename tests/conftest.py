@@ -0,0 +1,6 @@
+import os
+
+# 設定需在匯入 config 之前完成，測試不寫入 data/ 目錄
+os.environ.setdefault("BAR_STORE_PATH", ":memory:")
+os.environ.setdefault("RUN_HISTORY_PATH", "")
+os.environ.setdefault("FINMIND_TOKEN", "mock")
@@ -0,0 +1,69 @@
+import json
+from types import SimpleNamespace
+from core.backfill import BackfillManifest, Chunk, HistoryBackfill
+
+
+class FakeAPI:
+    def __init__(self, broken_symbol):
+        self.broken_symbol = broken_symbol
+        self.rate_limiter = SimpleNamespace(wait_time=lambda: 0)
+        self.bar_store = SimpleNamespace(upsert=lambda dataset, symbol, bars: None)
+
+    def fetch_daily_bars(self, market, symbol, start_date, end_date):
+        if symbol == self.broken_symbol:
+            raise ValueError("unexpected payload")
+        return [(start_date, 1.0, 1.0, 1.0, 1.0, 100)]
+
+
+def test_unexpected_chunk_error_is_recorded_and_retried(tmp_path):
+    path = str(tmp_path / "manifest.jsonl")
+    chunks = [
+        Chunk("US", symbol, "2024-01-01", "2024-01-31")
+        for symbol in ("AAPL", "BAD", "NVDA")
+    ]
+
+    backfill = HistoryBackfill(
+        api=FakeAPI("BAD"), manifest=BackfillManifest(path), workers=2
+    )
+    summary = backfill.run(chunks)
+
+    assert summary == {"done": 2, "failed": 1, "bars": 2}
+    with open(path, encoding="utf-8") as f:
+        failed = [entry for entry in map(json.loads, f) if entry.get("failed")]
+    assert [entry["key"] for entry in failed] == [chunks[1].key]
+    assert "ValueError" in failed[0]["error"]
+
+    # 重新載入後只剩失敗的區段需要重試，成功後不再視為失敗
+    manifest = BackfillManifest(path)
+    assert [c for c in chunks if not manifest.is_done(c)] == [chunks[1]]
+    assert manifest.has_failed(chunks[1])
+
+    retry = HistoryBackfill(api=FakeAPI(None), manifest=manifest, workers=1)
+    assert retry.run([chunks[1]])["done"] == 1
+    manifest = BackfillManifest(path)
+    assert manifest.is_done(chunks[1]) and not manifest.has_failed(chunks[1])
+
+
+def test_current_month_is_extended_instead_of_downloaded_again(tmp_path):
+    path = str(tmp_path / "manifest.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        # 舊版以區段起訖日為鍵的紀錄
+        key = "USStockPrice|AAPL|2024-01-01|2024-01-15"
+        f.write(json.dumps({"key": key, "bars": 10}) + "\n")
+
+    manifest = BackfillManifest(path)
+    next_day = Chunk("US", "AAPL", "2024-01-01", "2024-01-16")
+    remaining = manifest.remaining(next_day)
+    assert (remaining.start_date, remaining.end_date) == ("2024-01-16", "2024-01-16")
+
+    manifest.mark_done(remaining, 1)
+    assert manifest.is_done(next_day)
+
+    # 重新載入後被取代的舊行會被移除，每月每支股票只剩一行
+    manifest = BackfillManifest(path)
+    assert manifest.is_done(next_day)
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert entries == [
+        {"key": next_day.key, "start": "2024-01-01", "end": "2024-01-16"}
+    ]
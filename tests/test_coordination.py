@@ -0,0 +1,39 @@
+from core.coordination import Coordinator
+from utils.metrics import metrics
+
+
+def _coordinator(tmp_path):
+    return Coordinator(
+        mode="shard", path=str(tmp_path / "leases.sqlite3"), ttl=30, shard_count=3
+    )
+
+
+def test_single_worker_covers_every_shard(tmp_path):
+    coordinator = _coordinator(tmp_path)
+    coordinator.start()
+    try:
+        assert coordinator.shard() == ((0, 1, 2), 3)
+        assert "coordination_unowned_shards 0" in metrics.render().splitlines()
+    finally:
+        coordinator.stop()
+
+
+def test_shards_are_rebalanced_when_workers_join_and_leave(tmp_path):
+    a = _coordinator(tmp_path)
+    b = _coordinator(tmp_path)
+    a.start()
+    b.start()
+    try:
+        # b 加入時所有分片都已被 a 持有，a 續約時釋放多出的分片，b 再接手
+        a._renew()
+        b._renew()
+        assert a.shard() == ((0, 1), 3)
+        assert b.shard() == ((2,), 3)
+
+        # b 結束後釋放的分片由 a 接手
+        b.stop()
+        a._renew()
+        assert a.shard() == ((0, 1, 2), 3)
+    finally:
+        b.stop()
+        a.stop()
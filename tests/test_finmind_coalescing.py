@@ -0,0 +1,72 @@
+import threading
+import time
+import pytest
+from config.constants import DATASETS, PRIORITY_ADHOC, PRIORITY_SCHEDULED
+from core.api import StockAPI
+from core.rate_limiter import (
+    QuotaExceededError,
+    TokenBucketRateLimiter,
+    current_priority,
+    use_priority,
+)
+from tools.mock_finmind_server import MockFinMindServer
+
+DATASET = DATASETS["US_DAILY"]
+KEY = (DATASET, "AAPL", "2024-01-02", "2024-01-05")
+
+
+class GatedRateLimiter(TokenBucketRateLimiter):
+    """臨時查詢在等待中的呼叫端加入後才判斷額度，重現兩者同時查詢的情況"""
+
+    def __init__(self, follower_joined: threading.Event):
+        super().__init__(
+            hourly_budget=100,
+            reserve_ratios={PRIORITY_SCHEDULED: 0.0, PRIORITY_ADHOC: 0.5},
+        )
+        self._tokens = 10  # 排程更新仍有額度，臨時查詢已低於保留比例
+        self.follower_joined = follower_joined
+
+    def acquire(self, label="", priority=None):
+        if current_priority() == PRIORITY_ADHOC:
+            self.follower_joined.wait(5)
+            time.sleep(0.2)
+        super().acquire(label, priority)
+
+
+@pytest.fixture
+def finmind():
+    server = MockFinMindServer().start()
+    yield server
+    server.stop()
+
+
+def test_follower_does_not_inherit_leader_quota_error(finmind):
+    follower_joined = threading.Event()
+    api = StockAPI()
+    api.finmind_url = finmind.api_url
+    api.rate_limiter = GatedRateLimiter(follower_joined)
+    outcomes = {}
+
+    def request(name, priority):
+        with use_priority(priority):
+            try:
+                outcomes[name] = api._request_finmind(*KEY)
+            except QuotaExceededError as e:
+                outcomes[name] = e
+
+    leader = threading.Thread(target=request, args=("adhoc", PRIORITY_ADHOC))
+    leader.start()
+    deadline = time.monotonic() + 5
+    while KEY not in api._finmind_responses._calls:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    follower = threading.Thread(target=request, args=("scheduled", PRIORITY_SCHEDULED))
+    follower.start()
+    follower_joined.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert isinstance(outcomes["adhoc"], QuotaExceededError)
+    assert outcomes["scheduled"]["data"]
+    assert finmind.snapshot_stats()[DATASET] == 1
@@ -0,0 +1,22 @@
+from config.constants import DATASETS
+from core.api import StockAPI
+from core.rate_limiter import TokenBucketRateLimiter
+from tools.mock_finmind_server import MockFinMindServer
+
+
+def test_finmind_error_responses_are_not_retried_inside_the_session():
+    server = MockFinMindServer(error_rate=1.0).start()
+    try:
+        api = StockAPI()
+        api.finmind_url = server.api_url
+        api.rate_limiter = TokenBucketRateLimiter(hourly_budget=100)
+
+        response = api._request_finmind(
+            DATASETS["US_DAILY"], "AAPL", "2024-01-02", "2024-01-05"
+        )
+
+        assert response is None
+        assert server.snapshot_stats()["errors"] == 1
+        assert api.rate_limiter.consumed == 1
+    finally:
+        server.stop()
@@ -0,0 +1,27 @@
+from core.minute_cache import MinuteBarCache
+
+
+def _bar(date, close):
+    return {
+        "date": date,
+        "open": 1.0,
+        "high": 1.0,
+        "low": 1.0,
+        "close": close,
+        "volume": 10,
+    }
+
+
+def test_latest_skips_missing_close_and_snapshots_are_isolated():
+    cache = MinuteBarCache()
+    series = cache.merge(
+        "NVDA",
+        "2024-01-02",
+        [_bar("2024-01-02 09:30:00", 100.0), _bar("2024-01-02 09:31:00", None)],
+    )
+    assert series.latest() == ("2024-01-02 09:30:00", 100.0)
+
+    cache.merge("NVDA", "2024-01-02", [_bar("2024-01-02 09:32:00", 101.0)])
+    # 先前取得的快照不受之後附加的資料影響
+    assert len(series) == 2 and len(series.to_records()) == 2
+    assert cache.get("NVDA", "2024-01-02").latest() == ("2024-01-02 09:32:00", 101.0)
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+from core.polling import AdaptivePoller
+from core.rate_limiter import TokenBucketRateLimiter
+from core.universe import StockUniverse
+
+
+class FakeUpdater:
+    def __init__(self, stocks):
+        universe = StockUniverse(stocks)
+        self.api = SimpleNamespace(
+            get_stock_universe=lambda: universe,
+            rate_limiter=TokenBucketRateLimiter(hourly_budget=600),
+        )
+        self.price_cache = SimpleNamespace(save=lambda: None)
+
+    @staticmethod
+    def _importance(stock):
+        return 0.0
+
+
+def test_duplicate_tickers_are_polled_separately():
+    stocks = [
+        {"_id": "a1", "name": "AAPL", "alias": "Apple"},
+        {"_id": "a2", "name": "AAPL", "alias": "Apple (IRA)"},
+    ]
+    poller = AdaptivePoller(lambda: FakeUpdater(stocks))
+    poller._sync()
+
+    assert {k: s.stock["_id"] for k, s in poller._states.items()} == {
+        "a1": "a1",
+        "a2": "a2",
+    }
+    assert sorted(key for _, _, key, _ in poller._heap) == ["a1", "a2"]
@@ -0,0 +1,54 @@
+import time
+from datetime import datetime
+from config.constants import RUN_STATUS_COMPLETED
+from core.run_history import RunHistoryStore
+from core.runs import RunRecord
+from utils.time_utils import DEFAULT_TIMEZONE
+
+
+def test_duplicate_tickers_keep_one_outcome_each():
+    store = RunHistoryStore(":memory:")
+    started = time.time()
+    seq = store.start_run("run-1", "scheduled", "all", started)
+    store.add_outcomes(
+        seq,
+        [
+            ("a1", "AAPL", "US", "failed", None, None),
+            ("a2", "AAPL", "US", "updated", 190.5, 12.0),
+        ],
+    )
+    store.finish_run(seq, "completed", started + 1, 2, {"counts": {}})
+
+    results = store.get_run("run-1")["results"]
+    assert [(r["id"], r["status"]) for r in results] == [
+        ("a1", "failed"),
+        ("a2", "updated"),
+    ]
+    failed = store.list_runs(symbol="AAPL", status="failed")["runs"][0]["results"]
+    assert [r["id"] for r in failed] == ["a1"]
+
+
+def test_in_memory_and_stored_runs_have_the_same_shape():
+    started = time.time()
+    outcomes = [
+        ("a1", "AAPL", "US", "failed", None, None),
+        ("a2", "AAPL", "US", "updated", 190.5, 12.0),
+    ]
+    summary = {"total": 2, "counts": {"updated": 1, "failed": 1}}
+
+    record = RunRecord("manual")
+    record.status = RUN_STATUS_COMPLETED
+    record.started_at = datetime.fromtimestamp(started, DEFAULT_TIMEZONE)
+    record.finished_at = datetime.fromtimestamp(started + 1, DEFAULT_TIMEZONE)
+    record.update_progress(2, 2)
+    for outcome in outcomes:
+        record.add_outcome(outcome)
+    record.finish(3, summary)
+
+    store = RunHistoryStore(":memory:")
+    seq = store.start_run(record.run_id, "manual", "all", started)
+    store.add_outcomes(seq, outcomes)
+    store.finish_run(seq, RUN_STATUS_COMPLETED, started + 1, 3, summary)
+
+    assert record.to_dict() == store.get_run(record.run_id)
+    assert record.to_dict(False) == store.get_run(record.run_id, False)
@@ -0,0 +1,3 @@
+"""
+Offline tooling for load-testing the updater without real upstream services.
+"""
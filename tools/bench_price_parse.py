@@ -0,0 +1,139 @@
+"""最新價格解析的微基準測試
+
+以模擬的 USStockPriceMinute 回應比較取得最新收盤價的方式：
+原本以 pandas 建立 DataFrame 排序，以及服務實際使用的分鐘 K 線快取
+（MinuteSeries），分別量測快取為空時載入整個交易日與盤中每個 tick 的增量附加。
+pandas 已不是服務的相依套件，未安裝時略過 pandas 的比較。
+
+使用方式:
+    python -m tools.bench_price_parse --rows 390 --repeat 200
+"""
+
+import argparse
+import importlib.util
+import random
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+from config.constants import DATETIME_FORMAT
+from core.minute_cache import MinuteSeries
+
+TRADE_DATE = "2026-01-02"
+
+
+def build_payload(rows: int, shuffle: bool = False) -> List[Dict]:
+    """產生一個交易日的模擬分鐘資料（09:30 起每分鐘一筆）"""
+    start = datetime.strptime(f"{TRADE_DATE} 09:30:00", DATETIME_FORMAT)
+    price = 100.0
+    records = []
+    for i in range(rows):
+        price += random.uniform(-0.5, 0.5)
+        records.append(
+            {
+                "date": (start + timedelta(minutes=i)).strftime(DATETIME_FORMAT),
+                "stock_id": "NVDA",
+                "open": round(price, 2),
+                "high": round(price + 0.2, 2),
+                "low": round(price - 0.2, 2),
+                "close": round(price, 2),
+                "volume": random.randint(1000, 100000),
+            }
+        )
+    if shuffle:
+        random.shuffle(records)
+    return records
+
+
+def pandas_latest_close(records: List[Dict]) -> float:
+    """原本的做法：DataFrame、to_datetime、整體排序後取第一筆"""
+    import pandas as pd
+
+    df = pd.DataFrame(records)
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.sort_values("date", ascending=False)
+    return df.iloc[0]["close"]
+
+
+def cold_latest_close(records: List[Dict]) -> float:
+    """快取為空時（當日第一次查詢）：載入整個交易日後取最新收盤價"""
+    series = MinuteSeries("NVDA", TRADE_DATE)
+    series.append(records)
+    return series.latest()[1]
+
+
+def cached_tick(records: List[Dict], warm: List[Dict]) -> Callable[[], float]:
+    """模擬盤中每個 tick：快取已有前面的資料，只解析並附加新的 K 線"""
+    series = MinuteSeries("NVDA", TRADE_DATE)
+    series.append(warm)
+    last_date = series.last_date
+
+    def tick() -> float:
+        series.last_date = last_date
+        series.append(records)
+        return series.latest()[1]
+
+    return tick
+
+
+def pandas_import_seconds() -> float:
+    """在新的直譯器中量測 pandas 的匯入時間（本程序可能已經載入過 pandas）"""
+    code = (
+        "import time; started = time.perf_counter(); import pandas; "
+        "print(time.perf_counter() - started)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip())
+
+
+def measure(label: str, func: Callable[[], float], repeat: int) -> float:
+    func()
+    seconds = min(timeit.repeat(func, number=repeat, repeat=3)) / repeat
+    print(f"{label:<28}{seconds * 1e6:>12.1f} µs")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="最新價格解析的微基準測試")
+    parser.add_argument("--rows", type=int, default=390, help="每次回應的分鐘資料筆數")
+    parser.add_argument("--repeat", type=int, default=200, help="每種方式的執行次數")
+    parser.add_argument("--new-bars", type=int, default=5, help="每個 tick 新增的 K 線")
+    args = parser.parse_args()
+
+    has_pandas = importlib.util.find_spec("pandas") is not None
+
+    random.seed(0)
+    records = build_payload(args.rows)
+    shuffled = build_payload(args.rows, shuffle=True)
+    warm = records[: max(args.rows - args.new_bars, 0)]
+
+    expected = cold_latest_close(records)
+    assert cached_tick(records, warm)() == expected
+
+    if not has_pandas:
+        print(f"資料筆數: {args.rows}，未安裝 pandas，略過 pandas 的比較")
+    else:
+        assert pandas_latest_close(records) == expected
+        import_seconds = pandas_import_seconds()
+        print(f"資料筆數: {args.rows}，pandas 匯入時間: {import_seconds * 1e3:.1f} ms")
+        baseline = measure(
+            "pandas DataFrame", lambda: pandas_latest_close(records), args.repeat
+        )
+
+    cold = measure("快取首次載入", lambda: cold_latest_close(records), args.repeat)
+    measure("快取首次載入（未排序）", lambda: cold_latest_close(shuffled), args.repeat)
+    tick = measure(
+        f"快取附加 {args.new_bars} 根", cached_tick(records, warm), args.repeat
+    )
+    if has_pandas:
+        print(
+            f"與 pandas 相比: 首次載入 {baseline / cold:.1f} 倍，"
+            f"盤中 tick {baseline / tick:.0f} 倍"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""更新流程的離線基準測試
+
+在本機啟動模擬的 FinMind 與投資組合 API，依不同股票數量執行
+StockPriceUpdater.get_stock_prices，回報每分鐘可完成的更新次數、
+每支股票查詢耗時的 p50/p99 與峰值記憶體用量。
+每個情境在獨立的子行程中執行，峰值記憶體不會互相影響。
+每次更新前清空股票列表、日線資料庫、最後寫入價格與回應快取，時鐘固定在 --at 指定的時間，
+結果不受前一次更新的快取或執行當下是否為交易時段影響；子行程不寫入執行歷史。
+
+使用方式:
+    python -m tools.bench_update --sizes 10,100,1000 --runs 3
+    python -m tools.bench_update --sizes 100 --latency 0.02 --error-rate 0.01
+    python -m tools.bench_update --sizes 100 --at "2026-01-06 00:00"  # 美股盤中
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+from config.constants import DATETIME_FORMAT
+from tools.mock_finmind_server import MockFinMindServer, tw_stock_ids
+from tools.mock_portfolio_server import MockPortfolioServer, build_universe
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(percent / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 回傳 KB，macOS 回傳 bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _pin_clock(at: datetime) -> None:
+    """將已載入模組中的 get_current_time 固定為指定時間"""
+    from utils import time_utils
+
+    original = time_utils.get_current_time
+    for name, module in list(sys.modules.items()):
+        if name.startswith(("core.", "utils.")) and (
+            getattr(module, "get_current_time", None) is original
+        ):
+            module.get_current_time = lambda: at
+
+
+def _reset_caches(updater) -> None:
+    """清空前一次更新留下的資料，每次更新都從相同的冷狀態開始"""
+    from core.bar_store import BarStore
+    from core.minute_cache import MinuteBarCache
+    from core.price_cache import LastWrittenPriceCache
+
+    updater.api.bar_store.close()
+    updater.api.bar_store = BarStore(":memory:")
+    updater.api.minute_cache = MinuteBarCache()
+    updater.api._finmind_responses.clear()
+    updater.api.invalidate_stock_list()
+    updater.price_cache = LastWrittenPriceCache(path=None)
+
+
+def run_worker(size: int, runs: int, at: datetime) -> Dict:
+    """子行程：實際執行更新並量測（環境變數需在匯入 core 之前設定）"""
+    from core.updater import StockPriceUpdater
+    from utils.time_utils import DEFAULT_TIMEZONE
+
+    _pin_clock(at.replace(tzinfo=DEFAULT_TIMEZONE))
+
+    fetch_seconds: List[float] = []
+
+    class TimedUpdater(StockPriceUpdater):
+        def _fetch_stock_price(self, stock, priority):
+            started = time.perf_counter()
+            try:
+                return super()._fetch_stock_price(stock, priority)
+            finally:
+                fetch_seconds.append(time.perf_counter() - started)
+
+    updater = TimedUpdater()
+    durations = []
+    statuses: Dict[str, int] = {}
+    for _ in range(runs):
+        _reset_caches(updater)
+        started = time.perf_counter()
+        results = updater.get_stock_prices(ignore_market_hours=True) or []
+        durations.append(time.perf_counter() - started)
+        for result in results:
+            statuses[result.status] = statuses.get(result.status, 0) + 1
+
+    mean_duration = sum(durations) / len(durations)
+    return {
+        "size": size,
+        "runs": runs,
+        "first_run_seconds": round(durations[0], 3),
+        "mean_run_seconds": round(mean_duration, 3),
+        "runs_per_minute": round(60 / mean_duration, 1) if mean_duration else None,
+        "fetch_p50_ms": round(_percentile(fetch_seconds, 50) * 1000, 2),
+        "fetch_p99_ms": round(_percentile(fetch_seconds, 99) * 1000, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "statuses": statuses,
+    }
+
+
+def run_scenario(size: int, args) -> Dict:
+    """啟動模擬伺服器，並在子行程中執行一個情境"""
+    universe = build_universe(size, args.tw_ratio)
+    portfolio = MockPortfolioServer(
+        stocks=universe,
+        latency=args.latency,
+        batch_enabled=not args.no_batch,
+        error_rate=args.error_rate,
+    ).start()
+    finmind = MockFinMindServer(
+        tw_stock_ids=tw_stock_ids(universe),
+        latency=args.latency,
+        error_rate=args.error_rate,
+    ).start()
+
+    env = dict(os.environ)
+    env.update(
+        {
+            "API_BASE_URL": portfolio.base_url,
+            "FINMIND_API_URL": finmind.api_url,
+            "FINMIND_TOKEN": "mock",
+            "FINMIND_HOURLY_QUOTA": str(10**9),
+            "BAR_STORE_PATH": ":memory:",
+            "RUN_HISTORY_PATH": "",
+            "LOG_LEVEL": args.log_level,
+        }
+    )
+    env.pop("PRICE_CACHE_PATH", None)
+
+    try:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "tools.bench_update",
+                "--worker",
+                "--sizes",
+                str(size),
+                "--runs",
+                str(args.runs),
+                "--at",
+                args.at,
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        sys.stderr.write(e.stderr)
+        raise
+    finally:
+        portfolio.stop()
+        finmind.stop()
+
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    result["finmind_requests"] = finmind.snapshot_stats()
+    result["portfolio_requests"] = portfolio.snapshot_stats()
+    return result
+
+
+def print_table(results: List[Dict]) -> None:
+    header = (
+        f"{'stocks':>8}{'runs/min':>10}{'first(s)':>10}{'mean(s)':>10}"
+        f"{'p50(ms)':>10}{'p99(ms)':>10}{'RSS(MB)':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['size']:>8}{r['runs_per_minute']:>10}{r['first_run_seconds']:>10}"
+            f"{r['mean_run_seconds']:>10}{r['fetch_p50_ms']:>10}"
+            f"{r['fetch_p99_ms']:>10}{r['peak_rss_mb']:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="更新流程的離線基準測試")
+    parser.add_argument("--sizes", default="10,100,1000", help="股票數量，以逗號分隔")
+    parser.add_argument("--runs", type=int, default=3, help="每個情境的更新次數")
+    parser.add_argument("--tw-ratio", type=float, default=0.5, help="台股比例")
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求延遲秒數")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="隨機回應 500 的比例"
+    )
+    parser.add_argument("--no-batch", action="store_true", help="停用批次更新端點")
+    parser.add_argument("--log-level", default="WARNING", help="子行程的日誌等級")
+    parser.add_argument(
+        "--at",
+        default="2026-01-05 10:00",
+        help="固定的台北時間 (YYYY-MM-DD HH:MM)，預設為台股盤中、美股休市",
+    )
+    parser.add_argument("--json", action="store_true", help="以 JSON 輸出結果")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    if args.worker:
+        at = datetime.strptime(f"{args.at}:00", DATETIME_FORMAT)
+        print(json.dumps(run_worker(sizes[0], args.runs, at)))
+        return
+
+    results = [run_scenario(size, args) for size in sizes]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""本機模擬的 FinMind API
+
+提供 /api/v4/data 的 TaiwanStockPrice（含全市場查詢）、USStockPrice 與
+USStockPriceMinute 資料集，價格依股票代碼產生並在每次查詢時小幅隨機變動，
+讓更新流程可以在不消耗 FinMind 額度的情況下進行壓力測試。
+
+使用方式:
+    python -m tools.mock_finmind_server --port 8200 --stocks 500
+    FINMIND_API_URL=http://127.0.0.1:8200/api/v4/data FINMIND_TOKEN=mock python main.py
+"""
+
+import argparse
+import random
+import zlib
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import ParseResult, parse_qs
+from zoneinfo import ZoneInfo
+from config.constants import (
+    DATASETS,
+    DATE_FORMAT,
+    DATETIME_FORMAT,
+    TPE_SUFFIX,
+    TWO_SUFFIX,
+    US_TIMEZONE,
+)
+from tools.mock_http import MockHandler, MockHTTPServer
+from tools.mock_portfolio_server import build_universe
+
+DATA_PATH = "/api/v4/data"
+
+# 美股一般交易日的分鐘 K 線數量（09:30-16:00）
+US_SESSION_MINUTES = 390
+
+
+def _base_price(symbol: str) -> float:
+    """依股票代碼產生固定的基準價格"""
+    return 10 + zlib.crc32(symbol.encode("utf-8")) % 990
+
+
+def _weekdays(start_date: str, end_date: str) -> Iterator[date]:
+    day = datetime.strptime(start_date, DATE_FORMAT).date()
+    end = datetime.strptime(end_date, DATE_FORMAT).date()
+    while day <= end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+class MockFinMindServer(MockHTTPServer):
+    """在背景執行緒中運行的模擬 FinMind API"""
+
+    name = "mock-finmind"
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        tw_stock_ids: Optional[List[str]] = None,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        volatility: float = 0.01,
+    ):
+        super().__init__(host, port, latency, error_rate)
+        self.tw_stock_ids = tw_stock_ids or []
+        self.volatility = volatility
+        self.stats.update({dataset: 0 for dataset in DATASETS.values()})
+
+    @property
+    def api_url(self) -> str:
+        """給 FINMIND_API_URL 使用的完整網址"""
+        return f"{self.base_url}{DATA_PATH}"
+
+    def _price(self, symbol: str) -> float:
+        change = random.uniform(-self.volatility, self.volatility)
+        return round(_base_price(symbol) * (1 + change), 2)
+
+    def handle_get(self, handler: MockHandler, url: ParseResult) -> None:
+        if url.path != DATA_PATH:
+            handler.send_json(404, {"message": "not found"})
+            return
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        dataset = params.get("dataset")
+        data_id = params.get("data_id", "")
+        start_date = params.get("start_date", "")
+        end_date = params.get("end_date") or start_date
+
+        if dataset == DATASETS["TW_DAILY"]:
+            stock_ids = [data_id] if data_id else self.tw_stock_ids
+            data = self._tw_daily(stock_ids, start_date, end_date)
+        elif dataset == DATASETS["US_DAILY"]:
+            data = self._us_daily(data_id, start_date, end_date)
+        elif dataset == DATASETS["US_MINUTE"]:
+            data = self._us_minute(data_id, start_date)
+        else:
+            handler.send_json(400, {"msg": f"unknown dataset {dataset}", "status": 400})
+            return
+
+        self._record(dataset)
+        handler.send_json(200, {"msg": "success", "status": 200, "data": data})
+
+    def _tw_daily(
+        self, stock_ids: List[str], start_date: str, end_date: str
+    ) -> List[Dict]:
+        records = []
+        for day in _weekdays(start_date, end_date):
+            for stock_id in stock_ids:
+                close = self._price(stock_id)
+                records.append(
+                    {
+                        "date": day.strftime(DATE_FORMAT),
+                        "stock_id": stock_id,
+                        "Trading_Volume": random.randint(1000, 10_000_000),
+                        "Trading_money": random.randint(10_000, 1_000_000_000),
+                        "open": close,
+                        "max": round(close * 1.01, 2),
+                        "min": round(close * 0.99, 2),
+                        "close": close,
+                        "spread": 0.0,
+                        "Trading_turnover": random.randint(10, 10_000),
+                    }
+                )
+        return records
+
+    def _us_daily(self, symbol: str, start_date: str, end_date: str) -> List[Dict]:
+        records = []
+        for day in _weekdays(start_date, end_date):
+            close = self._price(symbol)
+            records.append(
+                {
+                    "date": day.strftime(DATE_FORMAT),
+                    "stock_id": symbol,
+                    "Adj_Close": close,
+                    "Close": close,
+                    "High": round(close * 1.01, 2),
+                    "Low": round(close * 0.99, 2),
+                    "Open": close,
+                    "Volume": random.randint(1000, 10_000_000),
+                }
+            )
+        return records
+
+    def _us_minute(self, symbol: str, trade_date: str) -> List[Dict]:
+        """當日尚未收盤時只回傳到目前這一分鐘的 K 線"""
+        tz = ZoneInfo(US_TIMEZONE)
+        day = datetime.strptime(trade_date, DATE_FORMAT)
+        session_open = day.replace(hour=9, minute=30, tzinfo=tz)
+        elapsed = (datetime.now(tz) - session_open).total_seconds() // 60 + 1
+        minutes = int(min(max(elapsed, 0), US_SESSION_MINUTES))
+
+        records = []
+        price = _base_price(symbol)
+        for i in range(minutes):
+            price = round(price * (1 + random.uniform(-0.001, 0.001)), 2)
+            records.append(
+                {
+                    "date": (session_open + timedelta(minutes=i)).strftime(
+                        DATETIME_FORMAT
+                    ),
+                    "stock_id": symbol,
+                    "open": price,
+                    "high": round(price * 1.001, 2),
+                    "low": round(price * 0.999, 2),
+                    "close": price,
+                    "volume": random.randint(100, 100_000),
+                }
+            )
+        return records
+
+
+def tw_stock_ids(stocks: List[Dict]) -> List[str]:
+    """從股票列表取出台股代碼（全市場查詢時回傳這些股票）"""
+    return [
+        stock["name"].split(":")[0]
+        for stock in stocks
+        if stock["name"].endswith((TPE_SUFFIX, TWO_SUFFIX))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機模擬的 FinMind API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--stocks", type=int, default=100, help="模擬股票數量")
+    parser.add_argument("--tw-ratio", type=float, default=0.5, help="台股比例")
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求延遲秒數")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="隨機回應 500 的比例"
+    )
+    args = parser.parse_args()
+
+    universe = build_universe(args.stocks, args.tw_ratio)
+    server = MockFinMindServer(
+        host=args.host,
+        port=args.port,
+        tw_stock_ids=tw_stock_ids(universe),
+        latency=args.latency,
+        error_rate=args.error_rate,
+    )
+    print(f"模擬 FinMind API 已啟動: {server.api_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""模擬伺服器的共用部分
+
+在背景執行緒中提供 HTTP 服務，並支援固定延遲與隨機錯誤率。
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import ParseResult, urlparse
+
+
+class MockHTTPServer:
+    """模擬伺服器基底類別，子類別實作 handle_get / handle_put"""
+
+    name = "mock"
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stats: Dict[str, int] = {"errors": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockHTTPServer":
+        """在背景執行緒啟動伺服器"""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name=self.name, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """在目前執行緒執行伺服器，直到 KeyboardInterrupt"""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        """關閉伺服器"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _record(self, key: str, count: int = 1) -> None:
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + count
+
+    def snapshot_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def handle_get(self, handler: "MockHandler", url: ParseResult) -> None:
+        handler.send_json(404, {"message": "not found"})
+
+    def handle_put(self, handler: "MockHandler", url: ParseResult) -> None:
+        handler.send_json(404, {"message": "not found"})
+
+    def _before_request(self, handler: "MockHandler", url: ParseResult) -> bool:
+        """套用延遲與錯誤率，返回 False 表示已回應模擬的錯誤"""
+        if self.latency:
+            time.sleep(self.latency)
+        if url.path == "/_stats":
+            handler.send_json(200, self.snapshot_stats())
+            return False
+        if self.error_rate and random.random() < self.error_rate:
+            handler.read_body()
+            self._record("errors")
+            handler.send_json(500, {"message": "injected error"})
+            return False
+        return True
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(MockHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if server._before_request(self, url):
+                    server.handle_get(self, url)
+
+            def do_PUT(self):
+                url = urlparse(self.path)
+                if server._before_request(self, url):
+                    server.handle_put(self, url)
+
+        return Handler
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body, headers: Optional[Dict] = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def read_json(self):
+        return json.loads(self.read_body() or b"{}")
@@ -0,0 +1,132 @@
+"""本機模擬的投資組合 API
+
+提供 /api/stocks/minimal、單筆價格更新與批次價格更新端點，
+讓批次寫回流程可以在離線環境下進行壓力測試。
+
+使用方式:
+    python -m tools.mock_portfolio_server --port 8100 --stocks 500
+    API_BASE_URL=http://127.0.0.1:8100 python main.py
+"""
+
+import argparse
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional
+from urllib.parse import ParseResult, parse_qs
+from config.constants import (
+    STOCK_LIST_PATH,
+    PRICE_BATCH_PATH,
+    TPE_SUFFIX,
+    NASDAQ_SUFFIX,
+)
+from tools.mock_http import MockHandler, MockHTTPServer
+
+PRICE_UPDATE_PATTERN = re.compile(r"^/api/stocks/id/(?P<stock_id>[^/]+)/price$")
+
+
+def build_universe(size: int, tw_ratio: float = 0.5) -> List[Dict]:
+    """產生模擬的股票列表"""
+    tw_count = int(size * tw_ratio)
+    stocks = []
+    for i in range(size):
+        if i < tw_count:
+            name = f"{1000 + i}{TPE_SUFFIX}"
+        else:
+            name = f"SYM{i}{NASDAQ_SUFFIX}"
+        stocks.append({"_id": f"mock{i:06d}", "name": name, "alias": f"Mock {i}"})
+    return stocks
+
+
+class MockPortfolioServer(MockHTTPServer):
+    """在背景執行緒中運行的模擬投資組合 API"""
+
+    name = "mock-portfolio"
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        stocks: Optional[List[Dict]] = None,
+        latency: float = 0.0,
+        batch_enabled: bool = True,
+        error_rate: float = 0.0,
+    ):
+        super().__init__(host, port, latency, error_rate)
+        self.stocks = stocks if stocks is not None else build_universe(100)
+        self.batch_enabled = batch_enabled
+        self.prices: Dict[str, float] = {}
+        self.stats.update({"list": 0, "single": 0, "batch": 0, "batch_items": 0})
+        self._known_ids = {stock["_id"] for stock in self.stocks}
+        self.etag = (
+            '"%s"' % hashlib.sha1(json.dumps(self.stocks).encode("utf-8")).hexdigest()
+        )
+
+    def handle_get(self, handler: MockHandler, url: ParseResult) -> None:
+        if url.path != STOCK_LIST_PATH:
+            handler.send_json(404, {"message": "not found"})
+            return
+
+        self._record("list")
+        if handler.headers.get("If-None-Match") == self.etag:
+            handler.send_response(304)
+            handler.send_header("ETag", self.etag)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        handler.send_json(200, self.stocks, {"ETag": self.etag})
+
+    def handle_put(self, handler: MockHandler, url: ParseResult) -> None:
+        if url.path == PRICE_BATCH_PATH:
+            if not self.batch_enabled:
+                handler.read_body()
+                handler.send_json(404, {"message": "not found"})
+                return
+            items = handler.read_json().get("prices", [])
+            with self._lock:
+                for item in items:
+                    self.prices[item["id"]] = float(item["newPrice"])
+            self._record("batch")
+            self._record("batch_items", len(items))
+            handler.send_json(200, {"updated": len(items)})
+            return
+
+        match = PRICE_UPDATE_PATTERN.match(url.path)
+        if not match or match["stock_id"] not in self._known_ids:
+            handler.send_json(404, {"message": "not found"})
+            return
+
+        new_price = float(parse_qs(url.query)["newPrice"][0])
+        with self._lock:
+            self.prices[match["stock_id"]] = new_price
+        self._record("single")
+        handler.send_json(200, {"_id": match["stock_id"], "price": new_price})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機模擬的投資組合 API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--stocks", type=int, default=100, help="模擬股票數量")
+    parser.add_argument("--tw-ratio", type=float, default=0.5, help="台股比例")
+    parser.add_argument("--latency", type=float, default=0.0, help="每個請求延遲秒數")
+    parser.add_argument("--no-batch", action="store_true", help="停用批次更新端點")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="隨機回應 500 的比例"
+    )
+    args = parser.parse_args()
+
+    server = MockPortfolioServer(
+        host=args.host,
+        port=args.port,
+        stocks=build_universe(args.stocks, args.tw_ratio),
+        latency=args.latency,
+        batch_enabled=not args.no_batch,
+        error_rate=args.error_rate,
+    )
+    print(f"模擬投資組合 API 已啟動: {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
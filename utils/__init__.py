@@ -1,4 +1,19 @@
-from .date_utils import TradingDateCalculator
-from .logger import get_logger
+import importlib
 
-__all__ = ["TradingDateCalculator", "get_logger"]
+# 延後到第一次存取時才載入，utils.startup 被匯入時不會先載入 requests 等套件，
+# 啟動時間才能從 main 開始匯入時起算
+_EXPORTS = {
+    "TradingDateCalculator": ".date_utils",
+    "get_logger": ".logger",
+    "create_session": ".http",
+}
+
+__all__ = ["TradingDateCalculator", "get_logger", "create_session"]
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,74 @@
+import random
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config.settings import (
+    HTTP_POOL_SIZE,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_BACKOFF_JITTER,
+)
+
+# 需要重試的 HTTP 狀態碼
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 可安全重送的方法，POST 不具冪等性不重試
+RETRY_METHODS = frozenset(["GET", "PUT"])
+
+
+class JitteredRetry(Retry):
+    """在指數退避時間上加入隨機抖動，避免多個請求同時重試"""
+
+    def __init__(self, *args, jitter: float = 0.0, **kwargs):
+        self.jitter = jitter
+        super().__init__(*args, **kwargs)
+
+    def new(self, **kwargs) -> "JitteredRetry":
+        retry = super().new(**kwargs)
+        retry.jitter = self.jitter
+        return retry
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        if backoff <= 0 or self.jitter <= 0:
+            return backoff
+        return backoff + random.uniform(0, self.jitter)
+
+
+def create_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    max_retries: int = HTTP_MAX_RETRIES,
+    backoff_factor: float = HTTP_BACKOFF_FACTOR,
+    backoff_jitter: float = HTTP_BACKOFF_JITTER,
+    connect_only: bool = False,
+) -> requests.Session:
+    """建立具連線池與重試機制的 HTTP Session
+
+    Args:
+        pool_size: 每個主機保留的連線數
+        max_retries: 429/5xx 與連線錯誤的最大重試次數
+        backoff_factor: 指數退避的基準秒數
+        backoff_jitter: 每次退避額外加入的最大隨機秒數
+        connect_only: 只重試尚未送出請求的連線錯誤。請求已送達伺服器後
+            （429/5xx 或讀取逾時）不在 Session 內重送，由呼叫端自行計算額度與重試
+
+    Returns:
+        requests.Session: 可重複使用 keep-alive 連線的 Session
+    """
+    retry = JitteredRetry(
+        total=max_retries,
+        read=0 if connect_only else None,
+        backoff_factor=backoff_factor,
+        status_forcelist=() if connect_only else RETRY_STATUS_CODES,
+        allowed_methods=RETRY_METHODS,
+        raise_on_status=False,
+        jitter=backoff_jitter,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -1,5 +1,140 @@
+import atexit
 import logging
-from config.settings import LOG_LEVEL, LOG_FORMAT
+import queue
+import threading
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from config.settings import (
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_ASYNC,
+    LOG_STRUCTURED,
+    LOG_STOCK_SAMPLE_RATE,
+)
+
+# LogRecord 的內建屬性，其餘屬性視為以 extra 傳入的結構化欄位
+_RESERVED_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None))
+) | {"message", "asctime"}
+
+_handler: Optional[logging.Handler] = None
+_listener: Optional[QueueListener] = None
+_handler_lock = threading.Lock()
+
+
+def _quote(value) -> str:
+    text = str(value)
+    if not text or any(ch in text for ch in ' ="\n'):
+        text = '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        text = text.replace("\n", "\\n")
+    return text
+
+
+class KeyValueFormatter(logging.Formatter):
+    """以 key=value 輸出日誌，extra 傳入的欄位會附加在訊息之後"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = record.getMessage()
+        fields = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.message,
+        }
+        fields.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in _RESERVED_ATTRS
+        )
+        line = " ".join(f"{key}={_quote(value)}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class StockLogSampler(logging.Filter):
+    """只保留部分股票的個股日誌
+
+    帶有 stock 欄位（extra={"stock": ...}）且低於 WARNING 的紀錄依股票代碼抽樣，
+    同一支股票的日誌會全部保留或全部略過；警告與錯誤一律保留。
+    """
+
+    SCALE = 10000
+
+    def __init__(self, rate: float = LOG_STOCK_SAMPLE_RATE):
+        super().__init__()
+        self.threshold = int(max(min(rate, 1.0), 0.0) * self.SCALE)
+        self.dropped = 0
+        # filter 會在抓取與寫入等多個執行緒中同時呼叫
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        stock = getattr(record, "stock", None)
+        if stock is None or record.levelno >= logging.WARNING:
+            return True
+        if self.threshold >= self.SCALE:
+            return True
+        if zlib.crc32(str(stock).encode("utf-8")) % self.SCALE < self.threshold:
+            return True
+        with self._lock:
+            self.dropped += 1
+        return False
+
+
+class _LazyQueueHandler(QueueHandler):
+    """不在呼叫端格式化訊息，格式化與輸出都交給背景執行緒"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _build_handler() -> logging.Handler:
+    """建立所有 logger 共用的 handler"""
+    global _listener
+
+    stream_handler = logging.StreamHandler()
+    if LOG_STRUCTURED:
+        stream_handler.setFormatter(KeyValueFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    if not LOG_ASYNC:
+        stream_handler.addFilter(StockLogSampler())
+        return stream_handler
+
+    # 呼叫端只把紀錄放進佇列，不會因為寫入 stdout 而阻塞
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _LazyQueueHandler(log_queue)
+    handler.addFilter(StockLogSampler())
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+    return handler
+
+
+def get_shared_handler() -> logging.Handler:
+    """取得共用的 handler，第一次呼叫時建立"""
+    global _handler
+    if _handler is None:
+        with _handler_lock:
+            if _handler is None:
+                _handler = _build_handler()
+    return _handler
+
+
+def stop_logging() -> None:
+    """停止背景輸出執行緒，並輸出佇列中剩餘的紀錄"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
+
+def dropped_stock_logs() -> int:
+    """自行程啟動起因抽樣而略過的個股日誌數"""
+    handler = get_shared_handler()
+    return sum(f.dropped for f in handler.filters if isinstance(f, StockLogSampler))
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -7,10 +142,7 @@ def get_logger(name: str) -> logging.Logger:
     logger = logging.getLogger(name)
 
     if not logger.handlers:
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter(LOG_FORMAT)
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        logger.addHandler(get_shared_handler())
 
     logger.setLevel(LOG_LEVEL)
     return logger
@@ -0,0 +1,27 @@
+from typing import Dict, Iterable, List, Optional
+
+# FinMind 回應的時間欄位為固定格式字串，直接以字串比較即可判斷先後
+
+
+def records_after(
+    records: Iterable[Dict], last_date: Optional[str], date_key: str = "date"
+) -> List[Dict]:
+    """取出時間晚於 last_date 的資料，依時間由舊到新排列
+
+    FinMind 回傳的資料通常已依時間排序，只有順序不一致時才需要排序。
+    """
+    newer = []
+    ordered = True
+    previous = ""
+    for record in records:
+        record_date = record.get(date_key) or ""
+        if last_date is not None and record_date <= last_date:
+            continue
+        if record_date < previous:
+            ordered = False
+        previous = record_date
+        newer.append(record)
+
+    if not ordered:
+        newer.sort(key=lambda record: record.get(date_key) or "")
+    return newer
@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Callable, Dict, Generic, Hashable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+# 回傳值的來源
+SOURCE_LOADED = "loaded"  # 由本次呼叫實際載入
+SOURCE_CACHE = "cache"  # 取自短期快取
+SOURCE_INFLIGHT = "inflight"  # 等待其他呼叫端進行中的載入
+
+
+class _Call:
+    """進行中的一次載入"""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlightCache(Generic[T]):
+    """合併同一個 key 的並行載入，並將結果保留 ttl 秒
+
+    同一時間只有第一個呼叫端會執行 loader，其他呼叫端等待並取得相同的結果
+    （包含拋出的例外）；成功且不為 None 的結果在 ttl 秒內直接重複使用。
+    回傳的物件由所有呼叫端共用，呼叫端不可修改。
+
+    private_errors 是只屬於執行 loader 那個呼叫端的例外（例如依優先等級判斷的額度不足），
+    等待中的呼叫端遇到時不會沿用，而是以自己的 loader 重新載入。
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 1024,
+        private_errors: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.private_errors = private_errors
+        self._cache: Dict[Hashable, Tuple[float, T]] = {}
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], T]) -> Tuple[T, str]:
+        """取得 key 的值，返回 (值, 來源)"""
+        while True:
+            with self._lock:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    if entry[0] > time.monotonic():
+                        return entry[1], SOURCE_CACHE
+                    del self._cache[key]
+
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+
+            if leader:
+                break
+            call.done.wait()
+            if call.error is None:
+                return call.value, SOURCE_INFLIGHT
+            if not isinstance(call.error, self.private_errors):
+                raise call.error
+            # 載入者自己的錯誤不共用，改由這個呼叫端重新載入
+
+        try:
+            call.value = loader()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and call.value is not None and self.ttl > 0:
+                    self._store(key, call.value)
+            call.done.set()
+        return call.value, SOURCE_LOADED
+
+    def _store(self, key: Hashable, value: T) -> None:
+        """寫入快取，超過上限時先清除過期項目，再移除最舊的項目（呼叫端需持有鎖）"""
+        now = time.monotonic()
+        if len(self._cache) >= self.max_entries:
+            for expired in [k for k, (exp, _) in self._cache.items() if exp <= now]:
+                del self._cache[expired]
+            while len(self._cache) >= self.max_entries:
+                del self._cache[next(iter(self._cache))]
+        self._cache[key] = (now + self.ttl, value)
+
+    def clear(self) -> None:
+        """清除快取（進行中的載入不受影響）"""
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,109 @@
+import importlib.abc
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+# 本模組被匯入的時間點，main.py 最先匯入本模組，視為服務開始啟動的時間
+_STARTED_AT = time.perf_counter()
+
+# 記錄匯入時間的模組：啟動時較重的第三方套件，以及會連帶載入大部分元件的核心模組
+TIMED_MODULES = (
+    "fastapi",
+    "uvicorn",
+    "apscheduler.schedulers.background",
+    "requests",
+    "core.api",
+    "core.updater",
+    "core.scheduler",
+)
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """包裝模組的 loader，記錄 exec_module 所花費的時間（含其匯入的子模組）"""
+
+    def __init__(self, loader, report: "StartupReport"):
+        self.loader = loader
+        self.report = report
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        # 模組執行前換回原本的 loader，模組本身與 importlib.resources 看到的仍是原 loader
+        module.__loader__ = self.loader
+        module.__spec__.loader = self.loader
+        started = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.report.record_import(module.__name__, time.perf_counter() - started)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """類似 python -X importtime，只記錄指定模組的累計匯入時間"""
+
+    def __init__(self, modules, report: "StartupReport"):
+        self.modules = frozenset(modules)
+        self.report = report
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname not in self.modules:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self.report)
+        return spec
+
+
+class StartupReport:
+    """記錄服務啟動各階段所花費的時間"""
+
+    def __init__(self, started_at: float = _STARTED_AT):
+        self.started_at = started_at
+        self._phases: List[Tuple[str, float]] = []
+        self._imports: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def watch_imports(self, modules=TIMED_MODULES) -> None:
+        """之後第一次匯入指定模組時記錄其匯入時間"""
+        sys.meta_path.insert(0, _ImportTimer(modules, self))
+
+    def record_import(self, module: str, seconds: float) -> None:
+        """記錄模組的累計匯入時間（含其匯入的子模組）"""
+        with self._lock:
+            self._imports.append((module, seconds))
+
+    def mark(self, phase: str, once: bool = True) -> None:
+        """記錄某個階段完成的時間（自啟動起算的秒數）
+
+        Args:
+            phase: 階段名稱
+            once: 同名階段是否只記錄第一次
+        """
+        elapsed = time.perf_counter() - self.started_at
+        with self._lock:
+            if once and any(name == phase for name, _ in self._phases):
+                return
+            self._phases.append((phase, elapsed))
+
+    def to_dict(self) -> Dict:
+        """轉為 API 回應格式"""
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.perf_counter() - self.started_at, 3),
+                "phases": {name: round(elapsed, 3) for name, elapsed in self._phases},
+                "imports": {name: round(seconds, 3) for name, seconds in self._imports},
+            }
+
+
+# 全域共用的啟動時間紀錄
+startup_report = StartupReport()
+startup_report.watch_imports()